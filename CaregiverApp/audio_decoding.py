@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Audio upload decoding for the Emotion Detection API
+Turns raw PCM, WAV and FLAC request bodies into float/int sample arrays
+"""
+
+import io
+import wave
+import numpy as np
+
+try:
+    import soundfile as sf
+except ImportError:  # WAV still works through the stdlib wave module
+    sf = None
+
+# Raw body sample formats (always little-endian on the wire)
+RAW_DTYPES = {
+    'int16': np.dtype('<i2'),
+    'float32': np.dtype('<f4'),
+}
+
+RAW_CONTENT_TYPES = ('application/octet-stream',)
+WAV_CONTENT_TYPES = ('audio/wav', 'audio/x-wav', 'audio/wave', 'audio/vnd.wave')
+FLAC_CONTENT_TYPES = ('audio/flac', 'audio/x-flac')
+
+class AudioDecodeError(ValueError):
+    """Raised when an uploaded audio body can't be decoded"""
+
+def parse_sample_rate(value):
+    """A sample rate from a header, query param or JSON field as a positive int"""
+    try:
+        sample_rate = int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise AudioDecodeError(f"Invalid sample rate {value!r}")
+    if sample_rate <= 0 or sample_rate != float(value):
+        raise AudioDecodeError(f"Invalid sample rate {value!r} (must be a positive whole number of Hz)")
+    return sample_rate
+
+def parse_channels(value):
+    """A channel count from a header or query param as a positive int"""
+    try:
+        channels = int(value)
+    except (TypeError, ValueError):
+        raise AudioDecodeError(f"Invalid channel count {value!r}")
+    if channels <= 0:
+        raise AudioDecodeError(f"Invalid channel count {value!r} (must be at least 1)")
+    return channels
+
+def pcm_to_float32(audio):
+    """Float32 samples in [-1, 1] from a float array or an integer PCM array
+
+    Integer arrays are scaled by 1 / 2^(bits - 1); anything else (floats,
+    lists of numbers from JSON) is taken to be in [-1, 1] already.
+    """
+    if isinstance(audio, np.ndarray) and audio.dtype.kind == 'i':
+        return audio.astype(np.float32) * np.float32(1.0 / (1 << (8 * audio.dtype.itemsize - 1)))
+    return np.asarray(audio, dtype=np.float32)
+
+def decode_raw(body, dtype='float32', channels=1):
+    """Decode a raw little-endian PCM body to float32 samples in [-1, 1]
+
+    Mono float32 bodies are returned as a view without copying; integer PCM
+    is scaled by 1 / 2^(bits - 1) so every input format reaches voice-activity
+    detection and the model at the same level.
+    """
+    if dtype not in RAW_DTYPES:
+        raise AudioDecodeError(f"Unsupported dtype '{dtype}' (use {', '.join(RAW_DTYPES)})")
+
+    wire_dtype = RAW_DTYPES[dtype]
+    frame_bytes = wire_dtype.itemsize * channels
+    if len(body) % frame_bytes:
+        raise AudioDecodeError(f"Body length {len(body)} is not a multiple of {frame_bytes} bytes")
+
+    audio = pcm_to_float32(np.frombuffer(body, dtype=wire_dtype))
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+    return audio
+
+def decode_file(body):
+    """Decode a WAV or FLAC file body, returning (audio, sample_rate)"""
+    if sf is not None:
+        try:
+            audio, sample_rate = sf.read(io.BytesIO(body), dtype='float32', always_2d=True)
+        except Exception as e:
+            raise AudioDecodeError(f"Could not decode audio file: {e}")
+        audio = audio[:, 0] if audio.shape[1] == 1 else audio.mean(axis=1)
+        return audio, sample_rate
+
+    # PCM WAV fallback when soundfile isn't installed
+    try:
+        with wave.open(io.BytesIO(body)) as wav:
+            sample_rate = wav.getframerate()
+            channels = wav.getnchannels()
+            width = wav.getsampwidth()
+            frames = wav.readframes(wav.getnframes())
+    except Exception as e:
+        raise AudioDecodeError(f"Could not decode audio file (install soundfile for FLAC): {e}")
+
+    if width != 2:
+        raise AudioDecodeError("Only 16-bit PCM WAV is supported without soundfile")
+    return decode_raw(frames, 'int16', channels), sample_rate
+
+def decode_audio(body, content_type, dtype=None, sample_rate=None, channels=1):
+    """Decode an audio request body by content type
+
+    Returns (audio, sample_rate). For raw bodies dtype, sample_rate and channels
+    come from the caller (headers or query string, validated here, so they may
+    be strings); files carry their own sample rate. Raises AudioDecodeError for
+    anything the body or its parameters get wrong.
+    """
+    content_type = (content_type or '').split(';')[0].strip().lower()
+
+    if content_type in RAW_CONTENT_TYPES:
+        if sample_rate is None or sample_rate == '':
+            raise AudioDecodeError("Raw audio needs a sample rate (X-Sample-Rate header or sample_rate query)")
+        sample_rate = parse_sample_rate(sample_rate)
+        return decode_raw(body, dtype or 'float32', parse_channels(channels)), sample_rate
+
+    if content_type in WAV_CONTENT_TYPES or content_type in FLAC_CONTENT_TYPES:
+        return decode_file(body)
+
+    raise AudioDecodeError(f"Unsupported content type '{content_type}'")
+
+class AudioFileReader:
+    """
+    Seekable mono float32 reader for long recordings, a block at a time
+
+    Uses soundfile when installed (WAV, FLAC, OGG, ...), else the stdlib wave
+    module for 16-bit PCM WAV.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if sf is not None:
+            self._file = sf.SoundFile(path)
+            self.sample_rate = self._file.samplerate
+            self.frames = self._file.frames
+            self.channels = self._file.channels
+        else:
+            try:
+                self._file = wave.open(path, 'rb')
+            except Exception as e:
+                raise AudioDecodeError(f"Could not open {path} (install soundfile for non-WAV files): {e}")
+            if self._file.getsampwidth() != 2:
+                raise AudioDecodeError("Only 16-bit PCM WAV is supported without soundfile")
+            self.sample_rate = self._file.getframerate()
+            self.frames = self._file.getnframes()
+            self.channels = self._file.getnchannels()
+
+    @property
+    def duration(self):
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+    def seek(self, frame):
+        if sf is not None:
+            self._file.seek(frame)
+        else:
+            self._file.setpos(frame)
+
+    def read(self, frames):
+        """Next `frames` samples (fewer at the end of the file), mixed to mono"""
+        if sf is not None:
+            audio = self._file.read(frames, dtype='float32', always_2d=True)
+            return audio[:, 0] if audio.shape[1] == 1 else audio.mean(axis=1, dtype=np.float32)
+        return decode_raw(self._file.readframes(frames), 'int16', self.channels)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Audio sources for the recognizers
+Microphone, audio file, raw PCM pipe and in-memory array input behind one interface
+"""
+
+import sys
+import time
+import threading
+import numpy as np
+from audio_decoding import AudioFileReader, decode_raw, RAW_DTYPES
+
+class AudioSource:
+    """
+    Something that produces mono audio at a fixed sample rate
+
+    Recorded sources implement read(frames), returning at most `frames`
+    samples and an empty array at the end. start(callback) then delivers
+    blocks from a thread, paced at real time when `realtime` is set, through
+    the same callback(indata, frames, time, status) signature sounddevice
+    uses, so a recognizer's audio callback works with any source. Live
+    sources (microphones) only support start/stop.
+    """
+
+    live = False
+    dtype = np.dtype(np.float32)
+
+    def __init__(self, sample_rate, blocksize=1024, realtime=True):
+        self.sample_rate = int(sample_rate)
+        self.blocksize = blocksize
+        self.realtime = realtime
+        self.frames_delivered = 0
+        self._thread = None
+        self._running = False
+
+    def read(self, frames):
+        raise NotImplementedError(f"{type(self).__name__} can only be started, not read")
+
+    @property
+    def running(self):
+        """True until stop() or, for recorded sources, the end of the audio"""
+        return self._running
+
+    def start(self, callback):
+        """Deliver blocks to callback(indata, frames, time, status) from a thread"""
+        def feed():
+            start = time.perf_counter()
+            try:
+                while self._running:
+                    block = self.read(self.blocksize)
+                    if len(block) == 0:
+                        break
+                    callback(block[:, np.newaxis], len(block), None, None)
+                    self.frames_delivered += len(block)
+                    if self.realtime:
+                        delay = start + self.frames_delivered / self.sample_rate - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+            finally:
+                self._running = False
+
+        self._running = True
+        self._thread = threading.Thread(target=feed, name=f"{type(self).__name__}-feed")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+
+    def close(self):
+        self.stop()
+
+    def describe(self):
+        return f"{type(self).__name__} ({self.sample_rate} Hz)"
+
+class MicrophoneSource(AudioSource):
+    """A sounddevice input stream"""
+
+    live = True
+
+    def __init__(self, sample_rate=22050, device=None, blocksize=1024, dtype='float32'):
+        super().__init__(sample_rate, blocksize, realtime=True)
+        self.device = device
+        self.dtype = np.dtype(dtype)
+        self._stream = None
+
+    def start(self, callback):
+        import sounddevice as sd
+
+        self._stream = sd.InputStream(device=self.device, channels=1, samplerate=self.sample_rate,
+                                      callback=callback, blocksize=self.blocksize, dtype=self.dtype.name)
+        self._stream.start()
+        self._running = True
+
+    def stop(self):
+        self._running = False
+        if self._stream is not None:
+            self._stream.stop()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+        self._running = False
+
+    def describe(self):
+        device = 'default device' if self.device is None else f"device {self.device}"
+        return f"microphone, {device} ({self.sample_rate} Hz)"
+
+def list_input_devices():
+    """Print the sounddevice devices that can record"""
+    import sounddevice as sd
+
+    print("\nAvailable audio devices:")
+    for i, device in enumerate(sd.query_devices()):
+        if device['max_input_channels'] > 0:
+            print(f"  {i}: {device['name']} (inputs: {device['max_input_channels']})")
+
+class FileSource(AudioSource):
+    """A WAV/FLAC/OGG recording, read a block at a time (see AudioFileReader)"""
+
+    def __init__(self, path, blocksize=1024, realtime=True):
+        self.path = path
+        self._reader = AudioFileReader(path)
+        super().__init__(self._reader.sample_rate, blocksize, realtime)
+
+    def read(self, frames):
+        return self._reader.read(frames)
+
+    def close(self):
+        super().close()
+        self._reader.close()
+
+    def describe(self):
+        return f"{self.path} ({self.sample_rate} Hz, {self._reader.duration:.1f}s)"
+
+class PipeSource(AudioSource):
+    """Raw little-endian PCM from a binary stream such as stdin or a socket file"""
+
+    def __init__(self, stream=None, sample_rate=22050, dtype='int16', channels=1, blocksize=1024,
+                 realtime=False):
+        if dtype not in RAW_DTYPES:
+            raise ValueError(f"Unsupported dtype '{dtype}' (use {', '.join(RAW_DTYPES)})")
+        super().__init__(sample_rate, blocksize, realtime)
+        self.stream = stream if stream is not None else sys.stdin.buffer
+        self.wire_dtype = dtype
+        self.channels = channels
+        self._frame_bytes = RAW_DTYPES[dtype].itemsize * channels
+
+    def read(self, frames):
+        wanted = frames * self._frame_bytes
+        body = b''
+        while len(body) < wanted:
+            data = self.stream.read(wanted - len(body))
+            if not data:
+                break
+            body += data
+        body = body[:len(body) - len(body) % self._frame_bytes]  # Drop a trailing partial frame
+        return decode_raw(body, self.wire_dtype, self.channels)
+
+    def describe(self):
+        return f"raw {self.wire_dtype} pipe ({self.sample_rate} Hz, {self.channels} ch)"
+
+class ArraySource(AudioSource):
+    """Audio already in memory"""
+
+    def __init__(self, audio, sample_rate=22050, blocksize=1024, realtime=False):
+        super().__init__(sample_rate, blocksize, realtime)
+        self.audio = np.asarray(audio, dtype=np.float32)
+        self._position = 0
+
+    def read(self, frames):
+        block = self.audio[self._position:self._position + frames]
+        self._position += len(block)
+        return block
+
+    def describe(self):
+        return f"array ({self.sample_rate} Hz, {len(self.audio) / self.sample_rate:.1f}s)"
+
+def open_source(spec, sample_rate=22050, realtime=True, dtype='int16', channels=1, capture_dtype='float32'):
+    """Source from a CLI-style spec: 'mic' or 'mic:<device>', '-' for raw PCM on stdin, else a file path
+
+    dtype and channels describe raw PCM; capture_dtype is what a microphone records.
+    """
+    if spec == 'mic' or spec.startswith('mic:'):
+        device = spec[4:] or None
+        if device is not None and device.isdigit():
+            device = int(device)
+        return MicrophoneSource(sample_rate, device=device, dtype=capture_dtype)
+    if spec == '-':
+        return PipeSource(sys.stdin.buffer, sample_rate, dtype=dtype, channels=channels, realtime=realtime)
+    return FileSource(spec, realtime=realtime)
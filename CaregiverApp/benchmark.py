@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the emotion feature pipeline, API and real-time loop
+Writes JSON results so runs can be compared between releases
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import threading
+import warnings
+from collections import deque
+import numpy as np
+import librosa
+import joblib
+from scipy.signal import lfilter
+from feature_engine import FeatureEngine
+warnings.filterwarnings("ignore")
+
+EMOTIONS = ['angry', 'disgust', 'fear', 'happy', 'neutral', 'sad', 'surprise']
+
+def synthetic_speech(duration, sample_rate, rng):
+    """Speech-like audio: a glottal pulse train with a drifting pitch through
+    three formant resonators, gated into syllables with short pauses"""
+    n = int(duration * sample_rate)
+    t = np.arange(n) / sample_rate
+
+    # Pitch contour between ~100 and ~250 Hz
+    f0 = 170 + 60 * np.sin(2 * np.pi * rng.uniform(0.2, 0.6) * t + rng.uniform(0, np.pi))
+    phase = np.cumsum(f0) / sample_rate
+    source = (np.diff(np.floor(phase), prepend=0) > 0).astype(np.float64)
+    source += 0.02 * rng.standard_normal(n)
+
+    speech = np.zeros(n)
+    for formant, bandwidth in ((rng.uniform(500, 800), 80), (rng.uniform(1000, 1800), 120), (2500, 200)):
+        r = np.exp(-np.pi * bandwidth / sample_rate)
+        theta = 2 * np.pi * formant / sample_rate
+        speech += lfilter([1 - r], [1, -2 * r * np.cos(theta), r * r], source)
+
+    # ~4 syllables per second with pauses between words
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 0.5
+    envelope *= (np.sin(2 * np.pi * 0.7 * t + rng.uniform(0, np.pi)) > -0.6)
+    speech *= envelope
+    return (0.5 * speech / (np.max(np.abs(speech)) or 1)).astype(np.float32)
+
+def synthetic_clips(seed=0, quick=False):
+    """Deterministic benchmark clips: (name, audio, sample_rate)"""
+    rng = np.random.default_rng(seed)
+    clips = []
+    durations = (1.0, 3.0) if quick else (1.0, 3.0, 5.0)
+    rates = (22050, 16000) if quick else (22050, 16000, 44100)
+    for sample_rate in rates:
+        for duration in durations:
+            n = int(duration * sample_rate)
+            t = np.arange(n) / sample_rate
+            clips.append((f"speech_{duration:g}s_{sample_rate}", synthetic_speech(duration, sample_rate, rng), sample_rate))
+            clips.append((f"tone_{duration:g}s_{sample_rate}",
+                          (0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32), sample_rate))
+            clips.append((f"noise_{duration:g}s_{sample_rate}",
+                          (0.1 * rng.standard_normal(n)).astype(np.float32), sample_rate))
+        clips.append((f"silence_3s_{sample_rate}", np.zeros(3 * sample_rate, dtype=np.float32), sample_rate))
+    return clips
+
+def summarize(samples):
+    """Latency summary in milliseconds"""
+    ms = np.asarray(samples) * 1000
+    if len(ms) == 0:
+        return {"count": 0}
+    return {
+        "count": int(len(ms)),
+        "mean_ms": float(np.mean(ms)),
+        "min_ms": float(np.min(ms)),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def build_stub_model(path, seed=0):
+    """Fit a small RandomForest on synthetic clips and save it like the real model"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(seed)
+    engine = FeatureEngine()
+    rows = []
+    for _ in range(len(EMOTIONS) * 6):
+        features = engine.extract(synthetic_speech(rng.uniform(1.0, 3.0), 22050, rng), 22050)
+        rows.append(features)
+    feature_names = list(rows[0].keys())
+    X = np.array([[row[name] for name in feature_names] for row in rows])
+    y = np.array(EMOTIONS * 6)
+
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=100, random_state=seed).fit(scaler.transform(X), y)
+    joblib.dump({
+        'model': model,
+        'scaler': scaler,
+        'feature_names': feature_names,
+        'emotion_labels': EMOTIONS
+    }, path)
+    return path
+
+def bench_pipeline(api, clips, repeats):
+    """Per-stage timing of extract_features_from_array, plus predict_emotion"""
+    engine = api.feature_engine
+    sr = api.sample_rate
+    stages = {name: [] for name in ('resample', 'prepare', 'stft', 'mel', 'mfcc', 'chroma',
+                                    'spectral', 'tempo', 'extract_total', 'predict')}
+    per_clip = {}
+
+    for name, audio, clip_rate in clips:
+        totals = []
+        for _ in range(repeats):
+            y, elapsed = timed(api.resampler.resample, audio, clip_rate)
+            stages['resample'].append(elapsed)
+            y, elapsed = timed(engine.prepare, y, sr)
+            stages['prepare'].append(elapsed)
+            features, total = timed(api.extract_features_from_array, audio, clip_rate)
+            totals.append(total)
+            stages['extract_total'].append(total)
+            if y is None:
+                continue
+
+            magnitude, elapsed = timed(lambda: np.abs(librosa.stft(y, n_fft=engine.n_fft, hop_length=engine.hop_length)))
+            stages['stft'].append(elapsed)
+            power = magnitude ** 2
+            mel_db, elapsed = timed(lambda: librosa.power_to_db(np.dot(engine.mel_basis(sr), power)))
+            stages['mel'].append(elapsed)
+            _, elapsed = timed(engine._add_mfcc_features, {}, mel_db)
+            stages['mfcc'].append(elapsed)
+            _, elapsed = timed(engine.chroma, power, sr)
+            stages['chroma'].append(elapsed)
+            _, elapsed = timed(lambda: (
+                librosa.feature.spectral_centroid(S=magnitude, sr=sr),
+                librosa.feature.spectral_rolloff(S=magnitude, sr=sr),
+                librosa.feature.spectral_bandwidth(S=magnitude, sr=sr),
+                librosa.feature.zero_crossing_rate(y, hop_length=engine.hop_length),
+                librosa.feature.rms(y=y, hop_length=engine.hop_length)))
+            stages['spectral'].append(elapsed)
+            _, elapsed = timed(engine._tempo, mel_db, sr)
+            stages['tempo'].append(elapsed)
+
+            if features:
+                _, elapsed = timed(api.predict_emotion, features)
+                stages['predict'].append(elapsed)
+        per_clip[name] = summarize(totals)
+
+    return {
+        "stages": {name: summarize(samples) for name, samples in stages.items()},
+        "clips": per_clip
+    }
+
+def bench_api(emotion_api_module, clips, concurrency_levels, requests_per_level):
+    """Load-test /detect_emotion through Flask's test client"""
+    app = emotion_api_module.app
+    usable = [(audio, sr) for name, audio, sr in clips if not name.startswith('silence')]
+    bodies = [{"audio": audio.tolist(), "sample_rate": sr} for audio, sr in usable]
+    results = {}
+
+    for concurrency in concurrency_levels:
+        latencies, errors = [], []
+        lock = threading.Lock()
+        counter = iter(range(requests_per_level))
+
+        def worker():
+            client = app.test_client()
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                start = time.perf_counter()
+                response = client.post('/detect_emotion', json=bodies[i % len(bodies)])
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+        level = summarize(latencies)
+        level.update({
+            "concurrency": concurrency,
+            "errors": len(errors),
+            "throughput_rps": len(latencies) / wall if wall else 0.0
+        })
+        results[str(concurrency)] = level
+        print(f"   concurrency {concurrency:3d}: p50 {level['p50_ms']:.1f} ms, "
+              f"p99 {level['p99_ms']:.1f} ms, {level['throughput_rps']:.1f} req/s")
+    return results
+
+def bench_realtime(model_path, seconds, streaming, seed=0):
+    """Real-time factor of SimpleEmotionRecognizer's processing loop fed by a fake
+    audio source at real-time pace (busy time / wall time; below 1.0 keeps up)"""
+    try:
+        from emotion_recognizer import SimpleEmotionRecognizer
+    except (ImportError, OSError) as e:
+        return {"skipped": f"emotion_recognizer unavailable: {e}"}
+
+    recognizer = SimpleEmotionRecognizer()
+    success, message = recognizer.load_model(model_path)
+    if not success:
+        return {"skipped": message}
+    recognizer.streaming = streaming
+
+    # Time the loop's work without changing it
+    busy = []
+    for method in ('extract_features_from_array', '_extract_streaming_features', '_predict_emotion'):
+        original = getattr(recognizer, method)
+
+        def instrumented(*args, _original=original):
+            start = time.perf_counter()
+            try:
+                return _original(*args)
+            finally:
+                busy.append(time.perf_counter() - start)
+        setattr(recognizer, method, instrumented)
+
+    results = []
+    recognizer.callback = lambda emotion, confidence: results.append(emotion)
+    recognizer.result_history = deque()  # Keep every timestamped result, not just the last 20
+    recognizer.is_recording = True
+    thread = threading.Thread(target=recognizer._processing_loop)
+    thread.daemon = True
+    thread.start()
+
+    # Fake microphone: 1024-sample blocks delivered on the audio clock
+    rng = np.random.default_rng(seed)
+    audio = synthetic_speech(seconds, recognizer.sample_rate, rng)
+    block = 1024
+    start = time.perf_counter()
+    for offset in range(0, len(audio), block):
+        chunk = audio[offset:offset + block]
+        recognizer._audio_callback(chunk[:, np.newaxis], len(chunk), None, None)
+        delay = start + (offset + len(chunk)) / recognizer.sample_rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    wall = time.perf_counter() - start
+
+    recognizer.is_recording = False
+    thread.join(timeout=5.0)
+    analyses = len(results)
+    return {
+        "streaming": streaming,
+        "audio_seconds": seconds,
+        "analyses": analyses,
+        "busy_seconds": float(sum(busy)),
+        "real_time_factor": float(sum(busy) / wall) if wall else 0.0,
+        "mean_analysis_ms": 1000 * float(sum(busy)) / analyses if analyses else 0.0,
+        "window_overruns": recognizer.window_overruns,
+        "skipped_windows": recognizer.skipped_windows,
+        "result_latency": summarize([result["latency"] for result in recognizer.result_history])
+    }
+
+def bench_replay(model_path, seconds, streaming, seed=0):
+    """Throughput of SimpleEmotionRecognizer.replay(): audio seconds scored per wall second"""
+    try:
+        from emotion_recognizer import SimpleEmotionRecognizer
+        from audio_sources import ArraySource
+    except (ImportError, OSError) as e:
+        return {"skipped": f"emotion_recognizer unavailable: {e}"}
+
+    recognizer = SimpleEmotionRecognizer()
+    success, message = recognizer.load_model(model_path)
+    if not success:
+        return {"skipped": message}
+    recognizer.streaming = streaming
+    recognizer.warm_up()
+
+    rng = np.random.default_rng(seed)
+    audio = synthetic_speech(seconds, recognizer.sample_rate, rng)
+    start = time.perf_counter()
+    windows = sum(1 for _ in recognizer.replay(ArraySource(audio, recognizer.sample_rate)))
+    wall = time.perf_counter() - start
+    return {
+        "streaming": streaming,
+        "audio_seconds": seconds,
+        "windows": windows,
+        "wall_seconds": wall,
+        "speed": seconds / wall if wall else 0.0,
+        "skipped_windows": recognizer.skipped_windows
+    }
+
+def compare(results, baseline_path, tolerance):
+    """Print stages and latencies that got slower than baseline by more than tolerance"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    regressions = []
+    def check(label, current, previous):
+        if previous and current > previous * (1 + tolerance):
+            regressions.append(f"{label}: {previous:.2f} -> {current:.2f} ms")
+
+    for stage, summary in results.get("pipeline", {}).get("stages", {}).items():
+        old = baseline.get("pipeline", {}).get("stages", {}).get(stage, {})
+        check(f"pipeline.{stage}.p50", summary.get("p50_ms", 0), old.get("p50_ms"))
+    for level, summary in results.get("api", {}).items():
+        old = baseline.get("api", {}).get(level, {})
+        check(f"api.c{level}.p95", summary.get("p95_ms", 0), old.get("p95_ms"))
+
+    if regressions:
+        print(f"❌ {len(regressions)} regressions beyond {tolerance:.0%}:")
+        for line in regressions:
+            print(f"   {line}")
+    else:
+        print(f"✅ No regressions beyond {tolerance:.0%} against {baseline_path}")
+    return not regressions
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the emotion detection pipeline')
+    parser.add_argument('--output', type=str, default='benchmark_results.json',
+                       help='Where to write JSON results (default: benchmark_results.json)')
+    parser.add_argument('--model-path', type=str, default=None,
+                       help='Model to benchmark (default: fit a stub model)')
+    parser.add_argument('--sections', type=str, default='pipeline,api,realtime,replay',
+                       help='Comma-separated sections to run (default: pipeline,api,realtime,replay)')
+    parser.add_argument('--repeats', type=int, default=3,
+                       help='Timing repeats per clip (default: 3)')
+    parser.add_argument('--concurrency', type=str, default='1,4,8',
+                       help='API concurrency levels (default: 1,4,8)')
+    parser.add_argument('--requests', type=int, default=64,
+                       help='API requests per concurrency level (default: 64)')
+    parser.add_argument('--realtime-seconds', type=float, default=10.0,
+                       help='Seconds of audio fed to the recognizer per mode (default: 10)')
+    parser.add_argument('--quick', action='store_true',
+                       help='Fewer clips, repeats and requests for a fast smoke run')
+    parser.add_argument('--compare', type=str, default=None,
+                       help='Baseline JSON to check for regressions (exit code 1 if any)')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                       help='Allowed slowdown against the baseline (default: 0.2)')
+    args = parser.parse_args()
+
+    sections = set(args.sections.split(','))
+    if args.quick:
+        args.repeats, args.requests, args.realtime_seconds = 1, 16, 5.0
+
+    model_path = args.model_path
+    if model_path is None:
+        model_path = os.path.join(tempfile.mkdtemp(), 'stub_model.joblib')
+        print("🧪 Fitting stub model...")
+        build_stub_model(model_path)
+
+    import emotion_api as emotion_api_module
+    api = emotion_api_module.emotion_api
+    success, message = api.load_model(model_path)
+    if not success:
+        print(f"❌ {message}")
+        return False
+
+    clips = synthetic_clips(quick=args.quick)
+    results = {
+        "meta": {
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "librosa": librosa.__version__,
+            "cpu_count": os.cpu_count(),
+            "model": "stub" if args.model_path is None else args.model_path,
+            "clips": len(clips),
+            "repeats": args.repeats
+        }
+    }
+
+    if 'pipeline' in sections:
+        print("⏱️  Feature pipeline...")
+        results["pipeline"] = bench_pipeline(api, clips, args.repeats)
+        for stage, summary in results["pipeline"]["stages"].items():
+            if summary["count"]:
+                print(f"   {stage:14} p50 {summary['p50_ms']:8.2f} ms")
+
+    if 'api' in sections:
+        print("🌐 /detect_emotion load test...")
+        levels = [int(level) for level in args.concurrency.split(',')]
+        results["api"] = bench_api(emotion_api_module, clips, levels, args.requests)
+
+    if 'realtime' in sections:
+        print("🎤 Real-time loop...")
+        results["realtime"] = {
+            mode: bench_realtime(model_path, args.realtime_seconds, mode == 'streaming')
+            for mode in ('batch', 'streaming')
+        }
+        for mode, summary in results["realtime"].items():
+            if "skipped" in summary:
+                print(f"   {mode}: skipped ({summary['skipped']})")
+            else:
+                print(f"   {mode}: RTF {summary['real_time_factor']:.3f}, "
+                      f"{summary['mean_analysis_ms']:.1f} ms per analysis")
+
+    if 'replay' in sections:
+        print("⏩ Replay...")
+        results["replay"] = {
+            mode: bench_replay(model_path, args.realtime_seconds * 6, mode == 'streaming')
+            for mode in ('batch', 'streaming')
+        }
+        for mode, summary in results["replay"].items():
+            if "skipped" in summary:
+                print(f"   {mode}: skipped ({summary['skipped']})")
+            else:
+                print(f"   {mode}: {summary['speed']:.1f}x real time, {summary['windows']} windows")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results written to {args.output}")
+
+    if args.compare:
+        return compare(results, args.compare, args.tolerance)
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Offline bulk emotion analysis for recorded sessions
+Scores long audio files with the recognizer's sliding window across a process pool
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from audio_decoding import AudioFileReader
+from ring_buffer import AudioRingBuffer
+from startup import configure_numba_cache
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg', '.aiff', '.aif')
+COLUMNS = ['file', 'window', 'start_s', 'end_s', 'emotion', 'confidence']
+
+# Per-process EmotionAPI, created once by the pool initializer
+_api = None
+
+def _init_worker(model_path, mmap_mode='r'):
+    """Load the model once per worker process"""
+    global _api
+    from emotion_api import EmotionAPI
+    _api = EmotionAPI()
+    _api.mmap_mode = mmap_mode
+    ok, message = _api.load_model(model_path)
+    if not ok:
+        raise RuntimeError(message)
+
+def _analyze_segment(segment):
+    """Score windows [first, last) of one file; returns result rows
+
+    Reads the file a hop at a time into a ring buffer one window plus one hop
+    long, so memory doesn't depend on file or segment length.
+    """
+    from feature_engine import StreamingFeatureExtractor
+
+    path, sample_rate, window_size, hop_size, first, last = segment
+    bundle = _api.bundle
+    native = sample_rate == _api.sample_rate
+    extractor = StreamingFeatureExtractor(_api.feature_engine) if native else None
+    ring = AudioRingBuffer(window_size + hop_size)
+
+    windows, features_list = [], []
+    with AudioFileReader(path) as reader:
+        origin = first * hop_size
+        reader.seek(origin)
+        for k in range(first, last):
+            start = k * hop_size
+            needed = start + window_size - (origin + ring.samples_written)
+            while needed > 0:
+                block = reader.read(min(needed, hop_size))
+                if len(block) == 0:
+                    break
+                ring.write(block)
+                needed -= len(block)
+            if needed > 0:
+                break  # File ended early
+
+            window = ring.window(window_size)
+            if native:
+                features = extractor.extract(window, start, sample_rate, bundle.feature_plan)
+            else:
+                features = _api.extract_features_from_array(window, sample_rate, bundle.feature_plan)
+            windows.append((k, start, features))
+            if features:
+                features_list.append(features)
+
+    predictions = iter(_api.predict_batch(features_list, bundle) if features_list else [])
+    rows = []
+    for k, start, features in windows:
+        emotion, confidence = next(predictions, (None, 0.0)) if features else (None, None)
+        rows.append({
+            'file': path,
+            'window': k,
+            'start_s': round(start / sample_rate, 4),
+            'end_s': round((start + window_size) / sample_rate, 4),
+            'emotion': '' if emotion is None else str(emotion),
+            'confidence': '' if confidence is None else round(float(confidence), 6)
+        })
+    return segment, rows
+
+def find_audio_files(inputs):
+    """Expand files and directories (recursively) into a sorted list of audio files"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.extend(os.path.join(root, name) for name in names
+                             if name.lower().endswith(AUDIO_EXTENSIONS))
+        else:
+            files.append(item)
+    return sorted(files)
+
+def plan_segments(path, window_seconds, hop_seconds, segment_seconds, native_rate, frame_hop=512):
+    """Split one file into (path, sr, window, hop, first, last) work items
+
+    At the model's native rate the hop is rounded to whole STFT frames so the
+    streaming extractor can reuse frames between windows.
+    """
+    with AudioFileReader(path) as reader:
+        sample_rate, frames = reader.sample_rate, reader.frames
+
+    window_size = int(round(window_seconds * sample_rate))
+    hop_size = max(1, int(round(hop_seconds * sample_rate)))
+    if sample_rate == native_rate:
+        hop_size = max(frame_hop, int(round(hop_size / frame_hop)) * frame_hop)
+
+    if frames >= window_size:
+        n_windows = 1 + (frames - window_size) // hop_size
+    elif frames >= 0.5 * sample_rate:
+        window_size, n_windows = frames, 1  # Short file: one window over all of it
+    else:
+        return []
+
+    per_segment = max(1, int(segment_seconds * sample_rate) // hop_size)
+    return [(path, sample_rate, window_size, hop_size, first, min(first + per_segment, n_windows))
+            for first in range(0, n_windows, per_segment)]
+
+def input_signature(files):
+    """Digest of the input files' paths and sizes, so a resume can tell the inputs changed"""
+    digest = hashlib.blake2b(digest_size=16)
+    for path in files:
+        digest.update(f"{os.path.abspath(path)}|{os.path.getsize(path)}\n".encode())
+    return digest.hexdigest()
+
+def segment_key(segment):
+    path, sample_rate, window_size, hop_size, first, last = segment
+    return f"{os.path.abspath(path)}|{sample_rate}|{window_size}|{hop_size}|{first}|{last}"
+
+class ResultWriter:
+    """
+    Appends rows to a CSV file, or one Parquet part per segment to a directory,
+    and records finished segments in <output>.progress.jsonl
+
+    On resume the CSV is cut back to its size at the last recorded segment, so
+    rows from a segment that was being written when the run stopped are not
+    duplicated. Starting over removes the CSV or the directory's earlier parts.
+    """
+
+    def __init__(self, output, settings, resume=True):
+        self.output = output
+        self.parquet = output.endswith('.parquet')
+        self.progress_path = output + '.progress.jsonl'
+        self.done = set()
+        self.rows_written = 0
+
+        csv_bytes = 0
+        if resume and os.path.exists(self.progress_path):
+            with open(self.progress_path) as f:
+                lines = [json.loads(line) for line in f if line.strip()]
+            if lines and lines[0].get('settings') != settings:
+                raise ValueError(f"{self.progress_path} was written with different settings "
+                                 f"({lines[0].get('settings')}); use --restart to start over")
+            for entry in lines[1:]:
+                self.done.add(entry['segment'])
+                csv_bytes = entry.get('csv_bytes', csv_bytes)
+        else:
+            with open(self.progress_path, 'w') as f:
+                f.write(json.dumps({'settings': settings}) + '\n')
+            if self.parquet and os.path.isdir(output):
+                # Parts are named by segment, so parts from other settings would never be overwritten
+                for name in os.listdir(output):
+                    if name.startswith('part-') and name.endswith(('.parquet', '.parquet.tmp')):
+                        os.remove(os.path.join(output, name))
+            elif not self.parquet and os.path.exists(output):
+                os.remove(output)
+
+        if self.parquet:
+            os.makedirs(output, exist_ok=True)
+            self._csv = None
+        else:
+            self._csv = open(output, 'a+', newline='')
+            self._csv.truncate(csv_bytes)
+            self._csv.seek(csv_bytes)
+            self._writer = csv.DictWriter(self._csv, fieldnames=COLUMNS)
+            if csv_bytes == 0:
+                self._writer.writeheader()
+        self._progress = open(self.progress_path, 'a')
+
+    def write(self, segment, rows):
+        """Persist one finished segment's rows, then mark it done"""
+        key = segment_key(segment)
+        entry = {'segment': key, 'rows': len(rows)}
+        if self.parquet:
+            import pandas as pd
+            part = os.path.join(self.output, f"part-{hashlib.blake2b(key.encode(), digest_size=8).hexdigest()}.parquet")
+            pd.DataFrame(rows, columns=COLUMNS).to_parquet(part + '.tmp', index=False)
+            os.replace(part + '.tmp', part)
+        else:
+            self._writer.writerows(rows)
+            self._csv.flush()
+            os.fsync(self._csv.fileno())
+            entry['csv_bytes'] = self._csv.tell()
+        self._progress.write(json.dumps(entry) + '\n')
+        self._progress.flush()
+        self.done.add(key)
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self._csv is not None:
+            self._csv.close()
+        self._progress.close()
+
+def run(args):
+    from result_cache import file_version
+    from emotion_api import EmotionAPI
+
+    files = find_audio_files(args.inputs)
+    if not files:
+        print("❌ No audio files found")
+        return False
+
+    # The parent only needs the model's native rate and version
+    api = EmotionAPI()
+    ok, message = api.load_model(args.model_path)
+    if not ok:
+        print(f"❌ {message}")
+        return False
+
+    segments = []
+    total_audio = 0.0
+    for path in files:
+        try:
+            file_segments = plan_segments(path, args.window, args.hop, args.segment_seconds, api.sample_rate)
+        except Exception as e:
+            print(f"⚠️  Skipping {path}: {e}")
+            continue
+        segments.extend(file_segments)
+        for _, sample_rate, window_size, hop_size, first, last in file_segments:
+            total_audio += (last - first) * hop_size / sample_rate
+
+    # Anything that changes segment boundaries or rows must be part of the fingerprint,
+    # otherwise a resume would write a second copy of windows that are already done
+    planned = sorted({segment[0] for segment in segments})
+    settings = {'model_version': file_version(args.model_path), 'window': args.window, 'hop': args.hop,
+                'segment_seconds': args.segment_seconds, 'inputs': input_signature(planned)}
+    try:
+        writer = ResultWriter(args.output, settings, resume=not args.restart)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
+    todo = [segment for segment in segments if segment_key(segment) not in writer.done]
+    print(f"🎧 {len(files)} files, {len(segments)} segments ({total_audio / 3600:.2f} h of audio)")
+    if len(todo) < len(segments):
+        print(f"⏩ Resuming: {len(segments) - len(todo)} segments already done")
+
+    start = time.time()
+    audio_done = 0.0
+    completed = 0
+
+    def report(segment, rows):
+        nonlocal audio_done, completed
+        writer.write(segment, rows)
+        _, sample_rate, _, hop_size, first, last = segment
+        audio_done += (last - first) * hop_size / sample_rate
+        completed += 1
+        elapsed = time.time() - start
+        speed = audio_done / elapsed if elapsed else 0.0
+        print(f"\r📊 {completed}/{len(todo)} segments, {audio_done / 60:.1f} min of audio, "
+              f"{speed:.1f}x real time", end='', flush=True)
+
+    try:
+        if args.workers == 0:
+            _init_worker(args.model_path, api.mmap_mode)
+            for segment in todo:
+                report(*_analyze_segment(segment))
+        else:
+            with ProcessPoolExecutor(max_workers=args.workers,
+                                     mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker,
+                                     initargs=(args.model_path, api.mmap_mode)) as pool:
+                # Keep a bounded number of segments in flight so memory stays flat
+                pending = set()
+                queue = iter(todo)
+                while True:
+                    while len(pending) < args.workers * 2:
+                        segment = next(queue, None)
+                        if segment is None:
+                            break
+                        pending.add(pool.submit(_analyze_segment, segment))
+                    if not pending:
+                        break
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        report(*future.result())
+    except KeyboardInterrupt:
+        print("\n🛑 Interrupted; rerun the same command to resume")
+        return False
+    finally:
+        writer.close()
+
+    print(f"\n✅ Wrote {writer.rows_written} windows to {args.output} in {time.time() - start:.1f}s")
+    return True
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Score recorded audio files offline with the emotion model')
+    parser.add_argument('inputs', nargs='+', help='Audio files or directories (searched recursively)')
+    parser.add_argument('--model-path', type=str, default='Emotion Model.joblib',
+                       help='Path to trained model file')
+    parser.add_argument('--output', type=str, default='emotion_results.csv',
+                       help='Results file: .csv, or .parquet for a directory of Parquet parts '
+                            '(default: emotion_results.csv)')
+    parser.add_argument('--window', type=float, default=3.0,
+                       help='Analysis window in seconds (default: 3.0)')
+    parser.add_argument('--hop', type=float, default=0.5,
+                       help='Hop between windows in seconds (default: 0.5)')
+    parser.add_argument('--segment-seconds', type=float, default=300,
+                       help='Audio per work item handed to a worker (default: 300)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                       help='Worker processes (default: CPU count, 0 runs in this process)')
+    parser.add_argument('--restart', action='store_true',
+                       help='Ignore earlier progress and start over')
+    args = parser.parse_args()
+
+    configure_numba_cache()
+    return run(args)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
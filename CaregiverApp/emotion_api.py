@@ -4,120 +4,312 @@ Emotion Detection API Server for CaregiverApp ChatBot
 Integrates with React Native for real-time emotion analysis
 """
 
-from flask import Flask, request, jsonify
+import os
+import hmac
+import time
+import threading
+from datetime import datetime, timezone
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import numpy as np
-import librosa
-import pandas as pd
-import joblib
 import warnings
+from startup import lazy_import, configure_numba_cache, warm_up_pipeline, warmup_audio
+from feature_engine import FeatureEngine
+from audio_decoding import decode_audio, decode_file, parse_sample_rate, pcm_to_float32, AudioDecodeError
+from worker_pool import InferenceWorkerPool, PoolSaturated
+from micro_batcher import MicroBatcher
+from result_cache import ResultCache, clip_key
+from resampling import Resampler
+from metrics import Registry, StageTimer, CONTENT_TYPE, log_json
+from stream_sessions import SessionManager, SessionLimitReached
+from model_reload import ModelReloader, load_bundle, DEFAULT_EMOTION_LABELS
+from vad import VoiceActivityDetector
+from result_bus import ResultBusReader, DEFAULT_BUS_PATH
+from qos import QualityController, default_levels, check_lite_tier, FULL_TIER, LITE_TIER
+from timeline_store import TimelineStore, RESOLUTIONS, check_patient_id
 warnings.filterwarnings("ignore")
 
+# Heavy imports load on first use so the server can bind and answer /health at once
+pd = lazy_import('pandas')
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React Native
 
 class EmotionAPI:
     def __init__(self):
-        self.model = None
-        self.scaler = None
-        self.feature_names = []
-        self.emotion_labels = ['angry', 'disgust', 'fear', 'happy', 'neutral', 'sad', 'surprise']
-        self.sample_rate = 22050
-
-    def extract_features_from_array(self, audio_data):
-        """Extract features from audio array for emotion prediction"""
-        try:
-            if len(audio_data) < self.sample_rate * 0.5:  # Less than 0.5 seconds
-                return None
-
-            y = np.array(audio_data, dtype=np.float32)
-
-            # Normalize audio
-            if np.max(np.abs(y)) > 0:
-                y = y / np.max(np.abs(y))
-            else:
-                return None
-
-            features = {}
+        self.bundle = None  # Active ModelBundle; replaced as a whole on reload
+        self.mmap_mode = 'r'  # Memory-map model arrays so processes share one copy
+        self.fast_path = True  # Compile supported models to NumPy arrays at load time
+        self.sample_rate = 22050  # Native rate the model was trained at
+        self.feature_engine = FeatureEngine(sample_rate=self.sample_rate)
+        self.resampler = Resampler(target_rate=self.sample_rate)
+        self.batcher = None  # Optional MicroBatcher for concurrent predict_emotion calls
+        self.result_cache = None  # Optional ResultCache keyed by clip content and model version
+        self.stage_timer = None  # Optional metrics.StageTimer for per-stage timings
+        self.vad = None  # Optional VoiceActivityDetector run by check_speech
+        self.qos = None  # Optional QualityController shared by streaming sessions
+        self.lite_bundle = None  # Cheaper ModelBundle sessions switch to under CPU pressure
 
-            # MFCCs
-            mfccs = librosa.feature.mfcc(y=y, sr=self.sample_rate, n_mfcc=13)
-            for i in range(13):
-                features[f'mfcc_mean_{i}'] = np.mean(mfccs[i])
-                features[f'mfcc_std_{i}'] = np.std(mfccs[i])
+    # Read-only views of the active bundle
+    @property
+    def model(self):
+        return self.bundle.model if self.bundle is not None else None
 
-            # Chroma
-            chroma = librosa.feature.chroma_stft(y=y, sr=self.sample_rate)
-            for i in range(12):
-                features[f'chroma_mean_{i}'] = np.mean(chroma[i])
+    @property
+    def scaler(self):
+        return self.bundle.scaler if self.bundle is not None else None
 
-            # Spectral features
-            spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=self.sample_rate)
-            zcr = librosa.feature.zero_crossing_rate(y)
-            rms = librosa.feature.rms(y=y)
+    @property
+    def feature_names(self):
+        return self.bundle.feature_names if self.bundle is not None else []
 
-            features['spectral_centroid_mean'] = np.mean(spectral_centroid)
-            features['spectral_centroid_std'] = np.std(spectral_centroid)
-            features['zcr_mean'] = np.mean(zcr)
-            features['rms_mean'] = np.mean(rms)
-            features['rms_std'] = np.std(rms)
+    @property
+    def feature_plan(self):
+        """Feature families the loaded model uses"""
+        return self.bundle.feature_plan if self.bundle is not None else None
 
-            # Additional features
-            try:
-                rolloff = librosa.feature.spectral_rolloff(y=y, sr=self.sample_rate)
-                features['rolloff_mean'] = np.mean(rolloff)
-                features['rolloff_std'] = np.std(rolloff)
-
-                bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=self.sample_rate)
-                features['bandwidth_mean'] = np.mean(bandwidth)
-                features['bandwidth_std'] = np.std(bandwidth)
+    @property
+    def emotion_labels(self):
+        return self.bundle.emotion_labels if self.bundle is not None else DEFAULT_EMOTION_LABELS
 
-                tempo, _ = librosa.beat.beat_track(y=y, sr=self.sample_rate)
-                features['tempo'] = tempo
-            except:
-                features['rolloff_mean'] = 0
-                features['rolloff_std'] = 0
-                features['bandwidth_mean'] = 0
-                features['bandwidth_std'] = 0
-                features['tempo'] = 0
+    @property
+    def model_version(self):
+        return self.bundle.version if self.bundle is not None else None
 
-            return features
+    def extract_features_from_array(self, audio_data, sample_rate=None, plan=None):
+        """Extract features from audio array for emotion prediction
 
+        Audio at any other rate is resampled to the model's native rate first,
+        so features always match what the model was trained on.
+        """
+        try:
+            mark = time.perf_counter()
+            audio_data = self.resampler.resample(audio_data, sample_rate or self.sample_rate)
+            self.feature_engine.lap('resample', mark)
+            return self.feature_engine.extract(audio_data, self.sample_rate, plan or self.feature_plan)
         except Exception as e:
             print(f"Error extracting features: {e}")
             return None
 
-    def predict_emotion(self, features):
+    def predict_emotion(self, features, bundle=None):
         """Predict emotion from extracted features"""
+        bundle = bundle or self.bundle
+        if self.batcher is not None:
+            return self.batcher.predict((bundle, features))
+        results = self.predict_batch([features], bundle)
+        return results[0] if results else (None, 0.0)
+
+    def _predict_tagged(self, items):
+        """Micro-batch entry point: (bundle, features) items, grouped by bundle"""
+        results = [None] * len(items)
+        groups = {}
+        for i, (bundle, _) in enumerate(items):
+            groups.setdefault(id(bundle), (bundle, []))[1].append(i)
+        for bundle, indices in groups.values():
+            predictions = self.predict_batch([items[i][1] for i in indices], bundle)
+            if len(predictions) != len(indices):
+                predictions = [(None, 0.0)] * len(indices)
+            for i, prediction in zip(indices, predictions):
+                results[i] = prediction
+        return results
+
+    def predict_batch(self, features_list, bundle=None):
+        """Predict emotions for many feature dicts with one scale/predict pass
+
+        Returns a list of (emotion, confidence) tuples in input order, or an
+        empty list if prediction fails.
+        """
+        bundle = bundle or self.bundle
         try:
-            # Convert to DataFrame with same structure as training data
-            feature_df = pd.DataFrame([features])
-            feature_df = feature_df.reindex(columns=self.feature_names, fill_value=0)
+            mark = time.perf_counter()
+            if bundle.compiled is not None:
+                X = bundle.compiled.vectorize(features_list)
+                mark = self.feature_engine.lap('vectorize', mark)
+                predictions = bundle.compiled.predict_batch_matrix(X)
+                self.feature_engine.lap('predict', mark)
+                return predictions
+
+            # Convert to an N x F matrix with same structure as training data
+            feature_df = pd.DataFrame(features_list)
+            feature_df = feature_df.reindex(columns=bundle.feature_names, fill_value=0)
             feature_df = feature_df.fillna(0)
 
             # Scale features
-            features_scaled = self.scaler.transform(feature_df.values)
+            features_scaled = bundle.scaler.transform(feature_df.values)
+            mark = self.feature_engine.lap('scale', mark)
 
-            # Predict
-            prediction = self.model.predict(features_scaled)[0]
-            probabilities = self.model.predict_proba(features_scaled)[0]
-            confidence = np.max(probabilities)
+            # Predict once; labels come from the most probable class
+            probabilities = bundle.model.predict_proba(features_scaled)
+            best = np.argmax(probabilities, axis=1)
+            predictions = bundle.model.classes_[best]
+            confidences = probabilities[np.arange(len(best)), best]
+            self.feature_engine.lap('predict', mark)
 
-            return prediction, confidence
+            return list(zip(predictions, confidences))
 
         except Exception as e:
             print(f"Prediction error: {e}")
-            return None, 0.0
+            return []
+
+    def check_speech(self, audio_data, sample_rate=None):
+        """Run voice-activity detection on a clip before any feature extraction
+
+        Returns None when the clip may contain speech (or no detector is set),
+        otherwise a successful "no speech" result to report instead of an emotion.
+        """
+        if self.vad is None:
+            return None
+        mark = time.perf_counter()
+        is_speech, info = self.vad.detect(audio_data, int(sample_rate or self.sample_rate))
+        self.feature_engine.lap('vad', mark)
+        if is_speech:
+            return None
+        return dict(info, emotion=None, confidence=0.0, speech=False,
+                    message="No speech detected", success=True)
+
+    def analyze(self, audio_data, sample_rate=None):
+        """Extract features and predict one clip, returning a result dict"""
+        bundle = self.bundle
+        if bundle is None:
+            return {"error": "Model not loaded", "success": False}
+        features = self.extract_features_from_array(audio_data, sample_rate, bundle.feature_plan)
+        if not features:
+            return {"error": "Failed to extract features from audio", "success": False}
+
+        emotion, confidence = self.predict_emotion(features, bundle)
+        if emotion is None:
+            return {"error": "Failed to predict emotion", "success": False}
+        return {
+            "emotion": emotion,
+            "confidence": float(confidence),
+            "model_version": bundle.version,
+            "success": True
+        }
+
+    def enable_micro_batching(self, max_batch_size=32, max_wait=0.005):
+        """Route predict_emotion through a MicroBatcher shared by concurrent requests"""
+        if self.batcher is not None:
+            self.batcher.stop()
+        self.batcher = MicroBatcher(self._predict_tagged, max_batch_size=max_batch_size, max_wait=max_wait)
+
+    def analyze_batch(self, clips):
+        """Extract features per (audio, sample_rate) clip, then predict all usable clips as one matrix"""
+        bundle = self.bundle
+        if bundle is None:
+            return [{"error": "Model not loaded", "success": False} for _ in clips]
+        results = [None] * len(clips)
+        features_list, indices = [], []
+        for i, (audio_data, sample_rate) in enumerate(clips):
+            features = self.extract_features_from_array(audio_data, sample_rate, bundle.feature_plan)
+            if features:
+                features_list.append(features)
+                indices.append(i)
+            else:
+                results[i] = {"error": "Failed to extract features from audio", "success": False}
+
+        predictions = self.predict_batch(features_list, bundle) if features_list else []
+        for i, (emotion, confidence) in zip(indices, predictions):
+            results[i] = {
+                "emotion": emotion,
+                "confidence": float(confidence),
+                "model_version": bundle.version,
+                "success": True
+            }
+        for i in indices:
+            if results[i] is None:
+                results[i] = {"error": "Failed to predict emotion", "success": False}
+        return results
+
+    def enable_metrics(self, stage_timer):
+        """Report per-stage timings (resample, feature families, scale, predict) to a StageTimer"""
+        self.stage_timer = stage_timer
+        self.feature_engine.stage_timer = stage_timer
+
+    def warm_up(self):
+        """Run the full pipeline on synthetic audio (numba JIT, filter banks, model)
+
+        Stage timings are left out of the metrics. Returns (success, message, seconds).
+        """
+        timer = self.stage_timer
+        self.enable_metrics(None)
+        try:
+            return warm_up_pipeline(self.extract_features_from_array, self.predict_emotion, self.sample_rate)
+        finally:
+            self.enable_metrics(timer)
+
+    def enable_result_cache(self, max_entries=1024, ttl=300, disk_dir=None):
+        """Cache results by clip content so retries skip extraction"""
+        self.result_cache = ResultCache(max_entries=max_entries, ttl=ttl, disk_dir=disk_dir)
+
+    def load_bundle(self, model_path):
+        """Load a model bundle without activating it"""
+        bundle = load_bundle(model_path, mmap_mode=self.mmap_mode, fast_path=self.fast_path)
+        if self.bundle is None and bundle.sample_rate != self.sample_rate:
+            self.sample_rate = bundle.sample_rate
+            self.feature_engine = FeatureEngine(sample_rate=bundle.sample_rate)
+            self.feature_engine.stage_timer = self.stage_timer
+            self.resampler = Resampler(target_rate=bundle.sample_rate)
+        elif bundle.sample_rate != self.sample_rate:
+            raise ValueError(f"Model expects {bundle.sample_rate} Hz audio but the server runs at "
+                             f"{self.sample_rate} Hz; restart to change the native rate")
+        return bundle
+
+    def validate_bundle(self, bundle):
+        """Canary check: run a synthetic clip through the new bundle
+
+        Returns (success, message); the active model is untouched either way.
+        """
+        try:
+            features = self.extract_features_from_array(warmup_audio(self.sample_rate), self.sample_rate,
+                                                        bundle.feature_plan)
+            if not features:
+                return False, "Canary clip produced no features"
+            predictions = self.predict_batch([features], bundle)
+            if not predictions:
+                return False, "Canary prediction failed"
+            emotion, confidence = predictions[0]
+            if emotion not in list(bundle.model.classes_) or not 0.0 <= float(confidence) <= 1.0:
+                return False, f"Canary prediction looks wrong: {emotion!r} at {confidence}"
+            return True, f"canary predicted {emotion} at {float(confidence):.0%}"
+        except Exception as e:
+            return False, f"Canary check failed: {e}"
+
+    def activate_bundle(self, bundle):
+        """Make a loaded bundle the active model (a single reference swap)"""
+        self.bundle = bundle
+        if self.result_cache is not None:
+            self.result_cache.invalidate()
+
+    def load_lite_model(self, model_path):
+        """Load the lite-tier model streaming sessions may fall back to (after load_model)"""
+        if self.bundle is None:
+            return False, "Load the full model first"
+        try:
+            bundle = self.load_bundle(model_path)
+        except Exception as e:
+            return False, f"Error loading lite model: {e}"
+        ok, message = check_lite_tier(bundle, self.feature_plan, self.model.classes_)
+        if ok:
+            self.lite_bundle = bundle
+            if self.qos is not None:
+                self.qos.set_levels(default_levels(has_lite=True))
+        return ok, message
+
+    def enable_qos(self, **kwargs):
+        """Let streaming sessions shed load (see QualityController)"""
+        self.qos = QualityController(default_levels(has_lite=self.lite_bundle is not None), **kwargs)
+        return self.qos
+
+    def session_tier(self):
+        """(bundle, tier name) streaming sessions should analyse with right now"""
+        if self.qos is not None and self.qos.tier == LITE_TIER and self.lite_bundle is not None:
+            return self.lite_bundle, LITE_TIER
+        return self.bundle, FULL_TIER
 
     def load_model(self, model_path):
         """Load trained model and scaler"""
         try:
-            model_data = joblib.load(model_path)
-            self.model = model_data['model']
-            self.scaler = model_data['scaler']
-            self.feature_names = model_data['feature_names']
-            if 'emotion_labels' in model_data:
-                self.emotion_labels = model_data['emotion_labels']
+            self.activate_bundle(self.load_bundle(model_path))
             return True, "Model loaded successfully"
         except Exception as e:
             return False, f"Error loading model: {e}"
@@ -125,52 +317,479 @@ class EmotionAPI:
 # Initialize emotion API
 emotion_api = EmotionAPI()
 
+# Upper bound on clips per /detect_emotion_batch request
+MAX_BATCH_CLIPS = 64
+
+# Limits on /sessions parameters; a session preallocates its ring buffer
+MAX_SESSION_BUFFER_SECONDS = 30.0
+MAX_SESSION_SAMPLE_RATE = 192000
+
+# Streaming sessions are stateful, so they always run in the server process
+session_manager = SessionManager(emotion_api)
+
+# Optional persistent per-patient emotion timelines (see --timeline-dir)
+timeline_store = None
+
+# Optional multi-process serving (see --workers); None means in-process
+worker_pool = None
+
+# Result bus a local SimpleEmotionRecognizer publishes to (see --live-bus); opened on first /live
+LIVE_BUS_PATH = DEFAULT_BUS_PATH
+live_reader = None
+REQUEST_TIMEOUT = 30  # Seconds a request waits for its worker result
+
+# Metrics exposed on /metrics
+metrics_registry = Registry()
+stage_timer = StageTimer(metrics_registry.histogram(
+    'emotion_stage_seconds', 'Time spent in each pipeline stage', ['stage']))
+emotion_api.enable_metrics(stage_timer)
+REQUESTS = metrics_registry.counter('emotion_http_requests', 'HTTP requests by endpoint and outcome', ['endpoint', 'outcome'])
+REQUEST_SECONDS = metrics_registry.histogram('emotion_http_request_seconds', 'HTTP request latency', ['endpoint'])
+metrics_registry.gauge('emotion_pool_in_flight', 'Requests running or queued in the worker pool',
+              callback=lambda: worker_pool.stats()["in_flight"] if worker_pool is not None else 0)
+metrics_registry.gauge('emotion_pool_queued', 'Requests waiting for a free worker',
+              callback=lambda: worker_pool.stats()["queued"] if worker_pool is not None else 0)
+metrics_registry.gauge('emotion_batcher_queued', 'Predictions waiting for the next micro-batch',
+              callback=lambda: emotion_api.batcher.stats()["queued"] if emotion_api.batcher is not None else 0)
+metrics_registry.gauge('emotion_sessions_active', 'Open streaming sessions',
+              callback=lambda: session_manager.stats()["active"])
+LOG_REQUESTS = False  # One JSON timing line per request (see --log-requests)
+
+def request_outcome(status_code):
+    """Coarse outcome label for a response status"""
+    if status_code < 400:
+        return "success"
+    if status_code == 503:
+        return "rejected"
+    if status_code == 504:
+        return "timeout"
+    return "client_error" if status_code < 500 else "server_error"
+
+@app.before_request
+def start_request_timing():
+    request.start_time = time.perf_counter()
+    stage_timer.begin_request()
+
+@app.after_request
+def record_request_metrics(response):
+    elapsed = time.perf_counter() - getattr(request, "start_time", time.perf_counter())
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    outcome = request_outcome(response.status_code)
+    REQUESTS.inc(endpoint=endpoint, outcome=outcome)
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+    stages = stage_timer.end_request()
+    if LOG_REQUESTS and endpoint != "/metrics":
+        log_json({
+            "time": time.time(),
+            "method": request.method,
+            "endpoint": endpoint,
+            "status": response.status_code,
+            "outcome": outcome,
+            "duration_ms": round(1000 * elapsed, 3),
+            "stages_ms": {stage: round(1000 * seconds, 3) for stage, seconds in stages.items()}
+        })
+    return response
+
+# Readiness: model loaded and pipeline warmed up (see /ready and prepare_server)
+startup_state = {"ready": False, "stage": "starting", "message": None, "warmup_seconds": None}
+
+def saturated_response(error):
+    """503 with Retry-After when the worker pool can't take more requests"""
+    response = jsonify({"error": f"Server busy: {error}", "success": False})
+    response.headers["Retry-After"] = str(worker_pool.retry_after)
+    return response, 503
+
 @app.route("/health", methods=["GET"])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         "status": "healthy",
+        "ready": startup_state["ready"],
         "model_loaded": emotion_api.model is not None,
-        "available_emotions": emotion_api.emotion_labels
+        "available_emotions": emotion_api.emotion_labels,
+        "workers": worker_pool.stats() if worker_pool is not None else None,
+        "micro_batching": emotion_api.batcher.stats() if emotion_api.batcher is not None else None,
+        "result_cache": emotion_api.result_cache.stats() if emotion_api.result_cache is not None else None,
+        "sessions": session_manager.stats(),
+        "timeline": timeline_store.stats() if timeline_store is not None else None,
+        "resampling": emotion_api.resampler.stats(),
+        "voice_activity": emotion_api.vad.stats() if emotion_api.vad is not None else None,
+        "quality": emotion_api.qos.stats() if emotion_api.qos is not None else None
     })
 
+@app.route("/ready", methods=["GET"])
+def readiness_check():
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 until then"""
+    return jsonify(dict(startup_state)), 200 if startup_state["ready"] else 503
+
+@app.route("/live", methods=["GET"])
+def live_emotion():
+    """
+    Latest result of a local recognizer started with --publish
+    Read from shared memory: no audio, no extraction, no locks
+    """
+    global live_reader
+    if live_reader is None:
+        try:
+            live_reader = ResultBusReader(LIVE_BUS_PATH)
+        except (OSError, ValueError):
+            return jsonify({"error": "No live recognizer is publishing", "success": False}), 404
+    live = live_reader.read()
+    if live is None:
+        return jsonify({"error": "No live result published yet", "success": False}), 503
+    live["success"] = True
+    return jsonify(live)
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus text-format metrics"""
+    return Response(metrics_registry.render(), content_type=CONTENT_TYPE)
+
+def analyze_clips(clips):
+    """
+    Analyze (audio, sample_rate) clips through voice-activity detection, the
+    result cache and then the worker pool or the in-process EmotionAPI
+    Returns (results, cached_flags); raises PoolSaturated when the pool is full
+    """
+    cache = emotion_api.result_cache
+    version = emotion_api.model_version
+    # Silence and room noise are answered here, before the cache or a worker sees them
+    results = [emotion_api.check_speech(audio_data, sample_rate) for audio_data, sample_rate in clips]
+    cached = [False] * len(clips)
+    keys = [None] * len(clips)
+    if cache is not None:
+        for i, (audio_data, sample_rate) in enumerate(clips):
+            if results[i] is not None:
+                continue
+            keys[i] = clip_key(audio_data, sample_rate, version)
+            results[i] = cache.get(keys[i])
+            cached[i] = results[i] is not None
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if not missing:
+        return results, cached
+
+    todo = [clips[i] for i in missing]
+    pool = worker_pool  # A reload may swap in a new pool meanwhile
+    if pool is not None:
+        if len(todo) == 1:
+            analyzed = [pool.analyze(*todo[0]).result(timeout=REQUEST_TIMEOUT)]
+        else:
+            analyzed = pool.analyze_batch(todo).result(timeout=REQUEST_TIMEOUT)
+    elif len(todo) == 1:
+        analyzed = [emotion_api.analyze(*todo[0])]
+    else:
+        analyzed = emotion_api.analyze_batch(todo)
+
+    for i, result in zip(missing, analyzed):
+        results[i] = result
+        if cache is not None and result["success"]:
+            # A reload during analysis means another model produced this result
+            key = keys[i]
+            if result.get("model_version") != version:
+                key = clip_key(*clips[i], result.get("model_version"))
+            cache.put(key, result)
+    return results, cached
+
+def read_audio_request(default_sample_rate=22050):
+    """
+    Read (audio, sample_rate) from a /detect_emotion request body
+    Supports JSON float arrays, raw little-endian PCM and WAV/FLAC uploads
+    Raises AudioDecodeError for a body or format parameter that can't be used
+    """
+    with stage_timer.time('decode'):
+        if request.files:
+            upload = request.files.get("audio") or next(iter(request.files.values()))
+            return decode_file(upload.read())
+
+        if request.is_json:
+            data = request.get_json()
+            if not isinstance(data, dict):
+                raise AudioDecodeError("Expected a JSON object with an \"audio\" array")
+            return data.get("audio"), parse_sample_rate(data.get("sample_rate", default_sample_rate))
+
+        # Binary bodies: format details come from headers or the query string
+        dtype = request.headers.get("X-Audio-Dtype") or request.args.get("dtype")
+        sample_rate = (request.headers.get("X-Sample-Rate") or request.args.get("sample_rate")
+                       or default_sample_rate)
+        channels = request.headers.get("X-Channels") or request.args.get("channels") or 1
+        return decode_audio(request.get_data(cache=False), request.content_type,
+                            dtype=dtype, sample_rate=sample_rate, channels=channels)
+
+def request_patient_id():
+    """Patient id sent with a request, or None; ValueError if it can't be recorded"""
+    patient_id = request.args.get("patient_id") or request.headers.get("X-Patient-Id")
+    if patient_id is None and request.is_json:
+        patient_id = (request.get_json(silent=True) or {}).get("patient_id")
+    if patient_id is None:
+        return None
+    if timeline_store is None:
+        raise ValueError("Timeline storage is not enabled on this server")
+    check_patient_id(patient_id)
+    return patient_id
+
 @app.route("/detect_emotion", methods=["POST"])
 def detect_emotion():
     """
     Detect emotion from audio data
     Expects JSON: {"audio": [float array], "sample_rate": 22050}
-    Returns: {"emotion": "happy", "confidence": 0.85, "success": true}
+    or an application/octet-stream body of little-endian int16/float32 samples
+    (X-Sample-Rate / X-Audio-Dtype headers or sample_rate / dtype query params)
+    or a WAV/FLAC upload (audio/wav, audio/flac body or multipart "audio" file)
+    An optional patient_id (JSON field, query param or X-Patient-Id header)
+    records the result in that patient's timeline
+    Returns: {"emotion": "happy", "confidence": 0.85, "speech": true, "success": true}
+    or, when no speech is detected, {"emotion": null, "speech": false, "success": true}
     """
     try:
-        data = request.get_json()
-        audio_array = data.get("audio")
-        sample_rate = data.get("sample_rate", 22050)
+        try:
+            audio_array, sample_rate = read_audio_request()
+        except AudioDecodeError as e:
+            return jsonify({"error": str(e), "success": False}), 400
 
-        if not audio_array:
+        if audio_array is None or len(audio_array) == 0:
             return jsonify({"error": "No audio data provided", "success": False}), 400
 
         if emotion_api.model is None:
             return jsonify({"error": "Model not loaded", "success": False}), 500
 
-        # Update sample rate if provided
-        emotion_api.sample_rate = sample_rate
-
-        # Extract features and predict
-        features = emotion_api.extract_features_from_array(audio_array)
-        if features:
-            emotion, confidence = emotion_api.predict_emotion(features)
-            if emotion:
-                return jsonify({
-                    "emotion": emotion,
-                    "confidence": float(confidence),
-                    "success": True,
-                    "message": f"Detected {emotion} with {confidence:.1%} confidence"
-                })
-            else:
-                return jsonify({"error": "Failed to predict emotion", "success": False}), 500
+        try:
+            patient_id = request_patient_id()
+        except ValueError as e:
+            return jsonify({"error": str(e), "success": False}), 400
+
+        # Extract features and predict, in a worker process when a pool is running
+        audio_array = pcm_to_float32(audio_array)
+        try:
+            results, cached = analyze_clips([(audio_array, sample_rate)])
+        except PoolSaturated as e:
+            return saturated_response(e)
+        result = results[0]
+
+        if result["success"] and result.get("speech") is False:
+            return jsonify(dict(result, cached=False))
+        if result["success"]:
+            emotion, confidence = result["emotion"], result["confidence"]
+            # A cached result is a repeat of a clip already recorded, not a new observation
+            if patient_id is not None and not cached[0]:
+                timeline_store.append(patient_id, emotion, confidence)
+            return jsonify({
+                "emotion": emotion,
+                "confidence": confidence,
+                "success": True,
+                "speech": True,
+                "cached": cached[0],
+                "model_version": result.get("model_version"),
+                "message": f"Detected {emotion} with {confidence:.1%} confidence"
+            })
         else:
-            return jsonify({"error": "Failed to extract features from audio", "success": False}), 500
+            return jsonify(result), 500
 
+    except TimeoutError:
+        return jsonify({"error": "Timed out waiting for a worker", "success": False}), 504
+    except Exception as e:
+        return jsonify({"error": f"Server error: {str(e)}", "success": False}), 500
+
+@app.route("/detect_emotion_batch", methods=["POST"])
+def detect_emotion_batch():
+    """
+    Detect emotions for several clips in one request
+    Expects JSON: {"clips": [{"audio": [float array], "sample_rate": 22050}, ...]}
+    (clips may also be bare float arrays using the top-level "sample_rate")
+    Returns: {"results": [{"emotion": "happy", "confidence": 0.85, "success": true}, ...],
+              "count": 2, "success": true}
+    """
+    try:
+        data = request.get_json()
+        clips = data.get("clips")
+        try:
+            default_rate = parse_sample_rate(data.get("sample_rate", 22050))
+        except AudioDecodeError as e:
+            return jsonify({"error": str(e), "success": False}), 400
+
+        if not clips:
+            return jsonify({"error": "No clips provided", "success": False}), 400
+
+        if len(clips) > MAX_BATCH_CLIPS:
+            return jsonify({"error": f"Too many clips (max {MAX_BATCH_CLIPS})", "success": False}), 400
+
+        if emotion_api.model is None:
+            return jsonify({"error": "Model not loaded", "success": False}), 500
+
+        results = [None] * len(clips)
+        usable, indices = [], []
+        for i, clip in enumerate(clips):
+            if isinstance(clip, dict):
+                audio_array = clip.get("audio")
+                sample_rate = clip.get("sample_rate", default_rate)
+            else:
+                audio_array, sample_rate = clip, default_rate
+
+            if not audio_array:
+                results[i] = {"error": "No audio data provided", "success": False}
+                continue
+            try:
+                sample_rate = parse_sample_rate(sample_rate)
+            except AudioDecodeError as e:
+                results[i] = {"error": str(e), "success": False}
+                continue
+            usable.append((pcm_to_float32(audio_array), sample_rate))
+            indices.append(i)
+
+        if usable:
+            try:
+                analyzed, cached = analyze_clips(usable)
+            except PoolSaturated as e:
+                return saturated_response(e)
+            for i, result, was_cached in zip(indices, analyzed, cached):
+                results[i] = dict(result, cached=was_cached)
+
+        return jsonify({
+            "results": results,
+            "count": len(results),
+            "success": True
+        })
+
+    except TimeoutError:
+        return jsonify({"error": "Timed out waiting for a worker", "success": False}), 504
+    except Exception as e:
+        return jsonify({"error": f"Server error: {str(e)}", "success": False}), 500
+
+def session_parameters(data):
+    """(sample_rate, buffer_duration, hop_duration) from a /sessions body; ValueError if unusable"""
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    sample_rate = parse_sample_rate(data.get("sample_rate", 22050))
+    if sample_rate > MAX_SESSION_SAMPLE_RATE:
+        raise ValueError(f"sample_rate must be at most {MAX_SESSION_SAMPLE_RATE} Hz")
+
+    durations = {}
+    for name, default in (("buffer_duration", 3.0), ("hop_duration", 0.5)):
+        value = data.get(name, default)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not np.isfinite(value):
+            raise ValueError(f"{name} must be a number of seconds")
+        durations[name] = float(value)
+    buffer_duration, hop_duration = durations["buffer_duration"], durations["hop_duration"]
+    if not 0 < buffer_duration <= MAX_SESSION_BUFFER_SECONDS:
+        raise ValueError(f"buffer_duration must be above 0 and at most {MAX_SESSION_BUFFER_SECONDS:g} seconds")
+    if not 0 < hop_duration <= buffer_duration:
+        raise ValueError("hop_duration must be above 0 and at most buffer_duration")
+    return sample_rate, buffer_duration, hop_duration
+
+@app.route("/sessions", methods=["POST"])
+def create_session():
+    """
+    Open a streaming session
+    Optional JSON: {"sample_rate": 22050, "buffer_duration": 3.0, "hop_duration": 0.5,
+                    "patient_id": "..."}
+    Results of sessions with a patient_id are recorded in that patient's timeline
+    Returns: {"session_id": "...", "hop_duration": 0.51, ..., "success": true}
+    """
+    try:
+        if emotion_api.model is None:
+            return jsonify({"error": "Model not loaded", "success": False}), 500
+
+        try:
+            patient_id = request_patient_id()
+        except ValueError as e:
+            return jsonify({"error": str(e), "success": False}), 400
+
+        try:
+            sample_rate, buffer_duration, hop_duration = session_parameters(request.get_json(silent=True) or {})
+        except ValueError as e:
+            return jsonify({"error": str(e), "success": False}), 400
+
+        session = session_manager.create(
+            sample_rate=sample_rate,
+            buffer_duration=buffer_duration,
+            hop_duration=hop_duration,
+            patient_id=patient_id
+        )
+        return jsonify(dict(session.summary(), success=True)), 201
+
+    except SessionLimitReached as e:
+        return jsonify({"error": f"Server busy: {e}", "success": False}), 503
+    except Exception as e:
+        return jsonify({"error": f"Server error: {str(e)}", "success": False}), 500
+
+@app.route("/sessions/<session_id>/audio", methods=["POST"])
+def push_session_audio(session_id):
+    """
+    Push an audio chunk into a streaming session
+    Accepts the same bodies as /detect_emotion; the session's sample rate is the default
+    Returns: {"results": [{"emotion": "happy", "confidence": 0.85, "audio_time": 3.0}, ...],
+              "stats": {...session summary...}, "success": true}
+    """
+    try:
+        session = session_manager.get(session_id)
+        if session is None:
+            return jsonify({"error": "Unknown or expired session", "success": False}), 404
+
+        try:
+            audio_array, sample_rate = read_audio_request(default_sample_rate=session.sample_rate)
+        except AudioDecodeError as e:
+            return jsonify({"error": str(e), "success": False}), 400
+
+        if audio_array is None or len(audio_array) == 0:
+            return jsonify({"error": "No audio data provided", "success": False}), 400
+
+        if sample_rate != session.sample_rate:
+            return jsonify({"error": f"Session expects {session.sample_rate} Hz audio", "success": False}), 400
+
+        results = session.push(audio_array)
+        return jsonify({
+            "results": results,
+            "stats": session.summary(),
+            "success": True
+        })
+
+    except Exception as e:
+        return jsonify({"error": f"Server error: {str(e)}", "success": False}), 500
+
+@app.route("/sessions/<session_id>", methods=["GET", "DELETE"])
+def session_state(session_id):
+    """Get a streaming session's rolling stats, or close it with DELETE"""
+    if request.method == "DELETE":
+        session = session_manager.close(session_id)
+    else:
+        session = session_manager.get(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown or expired session", "success": False}), 404
+    return jsonify(dict(session.summary(), success=True))
+
+def parse_time(value, default):
+    """Unix seconds or an ISO 8601 timestamp (UTC unless it has an offset)"""
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+@app.route("/patients/<patient_id>/timeline", methods=["GET"])
+def patient_timeline(patient_id):
+    """
+    Emotion trend for a patient from the minute/hour/day rollups
+    Query params: start, end (Unix seconds or ISO 8601; default the last 24 h),
+    resolution (minute, hour or day; default picked from the range)
+    Returns: {"summary": {...}, "buckets": [{"start": ..., "dominant_emotion": ..., ...}], "success": true}
+    """
+    if timeline_store is None:
+        return jsonify({"error": "Timeline storage is not enabled on this server", "success": False}), 404
+    try:
+        end = parse_time(request.args.get("end"), time.time())
+        start = parse_time(request.args.get("start"), end - 86400)
+        resolution = request.args.get("resolution")
+        if start >= end:
+            raise ValueError("start must be before end")
+        if resolution is not None and resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+        return jsonify(dict(timeline_store.query(patient_id, start, end, resolution), success=True))
+    except ValueError as e:
+        return jsonify({"error": str(e), "success": False}), 400
     except Exception as e:
         return jsonify({"error": f"Server error: {str(e)}", "success": False}), 500
 
@@ -183,27 +802,280 @@ def get_emotions():
         "description": "Available emotion categories for detection"
     })
 
-if __name__ == "__main__":
-    print("🚀 Starting Emotion Detection API Server for CaregiverApp...")
-    print("📡 Available endpoints:")
-    print("   GET  /health - Health check and status")
-    print("   POST /detect_emotion - Detect emotion from audio array")
-    print("   GET  /emotions - Get available emotion categories")
-    print()
+def replace_worker_pool(bundle):
+    """Bring up workers on a new model file, then retire the old pool
+
+    The old pool finishes its in-flight requests before its processes exit.
+    """
+    global worker_pool
+    old_pool = worker_pool
+    if old_pool is None:
+        return True, "in-process"
+
+    pool = InferenceWorkerPool(bundle.path, workers=old_pool.workers, max_queue=old_pool.max_queue,
+                               retry_after=old_pool.retry_after, warm_up=old_pool.warm_up,
+                               mmap_mode=old_pool.mmap_mode, fast_path=old_pool.fast_path)
+    ok, message = pool.start()
+    if not ok:
+        return False, message
+    worker_pool = pool
+    retire = threading.Thread(target=old_pool.shutdown, kwargs={"wait": True}, name="retire-workers")
+    retire.daemon = True
+    retire.start()
+    return True, message
+
+# Hot reload (POST /admin/reload or --watch-model)
+model_reloader = ModelReloader(emotion_api, before_activate=replace_worker_pool)
+# Admin endpoints are off unless EMOTION_ADMIN_TOKEN is set (environment only, so
+# the token doesn't show up in the process list)
+ADMIN_TOKEN = os.environ.get("EMOTION_ADMIN_TOKEN")
+# /admin/reload only loads model files from here; set from EMOTION_MODELS_DIR or
+# --models-dir, else the directory of --model-path
+MODELS_DIR = os.environ.get("EMOTION_MODELS_DIR")
+
+def admin_check():
+    """None if the request may use /admin, else the error response to return"""
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Admin endpoints are disabled; set EMOTION_ADMIN_TOKEN to enable them",
+                        "success": False}), 404
+    supplied = request.headers.get("X-Admin-Token") or ""
+    auth = request.headers.get("Authorization", "")
+    if auth.startswith("Bearer "):
+        supplied = auth[len("Bearer "):]
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({"error": "Forbidden", "success": False}), 403
+    return None
+
+def resolve_model_path(model_path):
+    """Absolute path of a model file inside MODELS_DIR, or None if it points anywhere else
+
+    Loading a model unpickles it, so a path from a request must never reach
+    files outside the directory the operator set aside for models.
+    """
+    if not MODELS_DIR or not isinstance(model_path, str) or not model_path:
+        return None
+    root = os.path.realpath(MODELS_DIR)
+    path = os.path.realpath(os.path.join(root, model_path))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None
+    return path
+
+@app.route("/admin/model", methods=["GET"])
+def model_status():
+    """Active model and hot reload status"""
+    denied = admin_check()
+    if denied is not None:
+        return denied
+    bundle = emotion_api.bundle
+    return jsonify({
+        "model": bundle.info() if bundle is not None else None,
+        "reload": model_reloader.status(),
+        "models_dir": os.path.realpath(MODELS_DIR) if MODELS_DIR else None,
+        "success": True
+    })
+
+@app.route("/admin/reload", methods=["POST"])
+def reload_model():
+    """
+    Load a model in the background, canary-check it and swap it in
+    Optional JSON: {"model_path": "new.joblib"}, a file in the models directory
+    (default: reload the current file)
+    Returns 202 right away; follow progress on GET /admin/model
+    """
+    denied = admin_check()
+    if denied is not None:
+        return denied
+    data = request.get_json(silent=True) or {}
+    model_path = data.get("model_path")
+    if model_path is not None:
+        model_path = resolve_model_path(model_path)
+        if model_path is None:
+            return jsonify({"error": "model_path must name a model file inside the models directory",
+                            "success": False}), 400
+    elif emotion_api.bundle is None:
+        return jsonify({"error": "No model loaded; give a model_path", "success": False}), 400
+    if not model_reloader.reload_async(model_path):
+        return jsonify({"error": "A reload is already in progress", "success": False}), 409
+    return jsonify({"message": "Reload started", "success": True}), 202
+
+def prepare_server(args):
+    """Load the model, start batching or workers and warm up; then report ready"""
+    global worker_pool
 
-    # Try to load the emotion model
-    model_path = "Emotion Model.joblib"
+    startup_state["stage"] = "loading_model"
+    model_path = args.model_path
     success, message = emotion_api.load_model(model_path)
     if success:
         print(f"✅ {message}")
         print(f"🎭 Available emotions: {', '.join(emotion_api.emotion_labels)}")
         print(f"📊 Feature count: {len(emotion_api.feature_names)}")
+        print(f"⚡ Inference: {emotion_api.bundle.fast_path}")
+        if args.lite_model:
+            lite_ok, lite_message = emotion_api.load_lite_model(args.lite_model)
+            print(f"{'🪶' if lite_ok else '⚠️ '} {lite_message}")
     else:
         print(f"⚠️  {message}")
         print("❗ Emotion detection will not work until model is loaded")
+        startup_state.update(stage="failed", message=message)
+        return
+
+    if args.batch_window_ms > 0 and args.workers == 0:
+        emotion_api.enable_micro_batching(args.max_batch_size, args.batch_window_ms / 1000.0)
+        print(f"📦 Micro-batching up to {args.max_batch_size} predictions per {args.batch_window_ms:g} ms")
+
+    startup_state["stage"] = "warming_up"
+    if args.workers > 0:
+        # Each worker loads and warms up its own copy before start() returns
+        pool = InferenceWorkerPool(model_path, workers=args.workers, max_queue=args.max_queue,
+                                   warm_up=not args.skip_warmup, mmap_mode=emotion_api.mmap_mode,
+                                   fast_path=emotion_api.fast_path)
+        pool_ok, pool_message = pool.start()
+        print(f"{'✅' if pool_ok else '⚠️ '} {pool_message} (queue limit {pool.max_queue})")
+        if not pool_ok:
+            startup_state.update(stage="failed", message=pool_message)
+            return
+        worker_pool = pool
+    elif not args.skip_warmup:
+        warm_ok, warm_message, seconds = emotion_api.warm_up()
+        print(f"{'🔥' if warm_ok else '⚠️ '} {warm_message}")
+        startup_state["warmup_seconds"] = seconds
+        if not warm_ok:
+            startup_state.update(stage="failed", message=warm_message)
+            return
+
+    startup_state.update(ready=True, stage="ready", message="Model loaded and warmed up")
+    print("🟢 Ready for requests")
+
+    if args.watch_model:
+        model_reloader.watch(model_path, args.watch_interval)
+        print(f"👀 Watching {model_path} for changes every {args.watch_interval:g}s")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Emotion Detection API Server for CaregiverApp')
+    parser.add_argument('--model-path', type=str, default='Emotion Model.joblib',
+                       help='Path to trained model file')
+    parser.add_argument('--port', type=int, default=5001,
+                       help='Port to listen on (default: 5001)')
+    parser.add_argument('--workers', type=int, default=0,
+                       help='Inference worker processes (default: 0, run in the server process)')
+    parser.add_argument('--max-queue', type=int, default=None,
+                       help='Requests allowed to wait for a worker before answering 503 (default: 2x workers)')
+    parser.add_argument('--batch-window-ms', type=float, default=0,
+                       help='Collect concurrent predictions for this long and run them as one batch '
+                            '(in-process serving only; default: 0, disabled)')
+    parser.add_argument('--max-batch-size', type=int, default=32,
+                       help='Dispatch a micro-batch early once this many predictions are queued (default: 32)')
+    parser.add_argument('--cache-size', type=int, default=1024,
+                       help='Results kept in the in-memory result cache (default: 1024, 0 disables caching)')
+    parser.add_argument('--cache-ttl', type=float, default=300,
+                       help='Seconds a cached result stays valid (default: 300)')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                       help='Directory for an on-disk result cache tier (default: memory only)')
+    parser.add_argument('--session-idle-timeout', type=float, default=120,
+                       help='Seconds before an idle streaming session is evicted (default: 120)')
+    parser.add_argument('--max-sessions', type=int, default=100,
+                       help='Maximum concurrent streaming sessions (default: 100)')
+    parser.add_argument('--log-requests', action='store_true',
+                       help='Print one JSON line with stage timings per request')
+    parser.add_argument('--skip-warmup', action='store_true',
+                       help='Report ready without running the pipeline on synthetic audio first')
+    parser.add_argument('--numba-cache-dir', type=str, default=None,
+                       help='Where compiled numba functions are cached across restarts '
+                            '(default: NUMBA_CACHE_DIR or ~/.cache/caregiver-emotion/numba)')
+    parser.add_argument('--watch-model', action='store_true',
+                       help='Hot-reload the model whenever the model file changes')
+    parser.add_argument('--watch-interval', type=float, default=5.0,
+                       help='Seconds between model file checks (default: 5)')
+    parser.add_argument('--models-dir', type=str, default=None,
+                       help='Directory /admin/reload may load models from (default: EMOTION_MODELS_DIR, '
+                            'else the directory of --model-path); /admin needs EMOTION_ADMIN_TOKEN set')
+    parser.add_argument('--no-mmap', action='store_true',
+                       help='Load model arrays onto the heap instead of memory-mapping them')
+    parser.add_argument('--no-fast-path', action='store_true',
+                       help='Always predict through pandas and sklearn instead of the compiled NumPy model')
+    parser.add_argument('--timeline-dir', type=str, default=None,
+                       help='Store per-patient emotion timelines here (default: disabled)')
+    parser.add_argument('--timeline-raw-days', type=int, default=7,
+                       help='Days of individual predictions kept before only rollups remain (default: 7)')
+    parser.add_argument('--timeline-minute-days', type=int, default=30,
+                       help='Days of minute rollups kept (default: 30; hour rollups: 400, day: forever)')
+    parser.add_argument('--no-vad', action='store_true',
+                       help='Classify every clip, even silence and background noise')
+    parser.add_argument('--vad-threshold-db', type=float, default=-50.0,
+                       help='Frame level (dBFS) below which audio counts as silence (default: -50)')
+    parser.add_argument('--vad-snr-db', type=float, default=6.0,
+                       help='dB a voiced frame must rise above the clip\'s noise floor (default: 6)')
+    parser.add_argument('--vad-loud-db', type=float, default=-30.0,
+                       help='Frame level (dBFS) counted as voiced whatever the noise floor (default: -30)')
+    parser.add_argument('--vad-max-zcr', type=float, default=0.3,
+                       help='Zero-crossing rate above which a frame counts as noise (default: 0.3)')
+    parser.add_argument('--vad-min-speech', type=float, default=0.1,
+                       help='Fraction of voiced frames a clip needs to be classified (default: 0.1)')
+    parser.add_argument('--live-bus', type=str, default=DEFAULT_BUS_PATH,
+                       help=f'Result bus a local recognizer publishes to, served on /live (default: {DEFAULT_BUS_PATH})')
+    parser.add_argument('--adaptive', action='store_true',
+                       help='Let streaming sessions lengthen their hop and use --lite-model under CPU pressure')
+    parser.add_argument('--lite-model', type=str, default=None,
+                       help='Cheaper model (fewer feature families, same labels) for sessions under pressure')
+    parser.add_argument('--qos-high-water', type=float, default=0.8,
+                       help='Compute time / hop above which session quality is reduced (default: 0.8)')
+    parser.add_argument('--qos-low-water', type=float, default=0.4,
+                       help='Projected compute time / hop below which quality is restored (default: 0.4)')
+    args = parser.parse_args()
+
+    configure_numba_cache(args.numba_cache_dir)
+    MODELS_DIR = args.models_dir or MODELS_DIR or os.path.dirname(os.path.abspath(args.model_path))
+    if args.no_mmap:
+        emotion_api.mmap_mode = None
+    if args.no_fast_path:
+        emotion_api.fast_path = False
+    if not args.no_vad:
+        emotion_api.vad = VoiceActivityDetector(energy_threshold_db=args.vad_threshold_db,
+                                                snr_margin_db=args.vad_snr_db,
+                                                loud_level_db=args.vad_loud_db,
+                                                max_zcr=args.vad_max_zcr,
+                                                min_speech_fraction=args.vad_min_speech)
+
+    LIVE_BUS_PATH = args.live_bus
+    if args.adaptive:
+        emotion_api.enable_qos(high_water=args.qos_high_water, low_water=args.qos_low_water)
+    LOG_REQUESTS = args.log_requests
+    session_manager.idle_timeout = args.session_idle_timeout
+    session_manager.max_sessions = args.max_sessions
+    if args.cache_size > 0:
+        emotion_api.enable_result_cache(args.cache_size, args.cache_ttl, args.cache_dir)
+    if args.timeline_dir:
+        timeline_store = TimelineStore(args.timeline_dir, raw_retention_days=args.timeline_raw_days,
+                                       minute_retention_days=args.timeline_minute_days)
+        timeline_store.start_compaction()
+        session_manager.timeline = timeline_store
+        print(f"🗂️  Recording patient timelines in {args.timeline_dir}")
+
+    print("🚀 Starting Emotion Detection API Server for CaregiverApp...")
+    print("📡 Available endpoints:")
+    print("   GET  /health - Health check and status")
+    print("   GET  /ready - Readiness (503 until the model is loaded and warmed up)")
+    print("   POST /detect_emotion - Detect emotion from audio array")
+    print("   POST /detect_emotion_batch - Detect emotions for several clips at once")
+    print("   POST /sessions - Open a streaming session")
+    print("   POST /sessions/<id>/audio - Push audio to a session and get rolling results")
+    print("   GET  /sessions/<id> - Session stats (DELETE closes it)")
+    print("   GET  /patients/<id>/timeline - Emotion trends for a patient (with --timeline-dir)")
+    print("   GET  /emotions - Get available emotion categories")
+    print("   GET  /live - Latest result of a local recognizer (started with --publish)")
+    print("   GET  /metrics - Prometheus metrics")
+    print("   POST /admin/reload - Hot-reload the model (GET /admin/model for status)")
+    print()
+
+    # The server binds right away; /ready turns 200 once loading and warm-up finish
+    startup_thread = threading.Thread(target=prepare_server, args=(args,), name="startup")
+    startup_thread.daemon = True
+    startup_thread.start()
 
-    print(f"\n🌐 Server starting on http://localhost:5001")
+    print(f"\n🌐 Server starting on http://localhost:{args.port}")
     print("🔗 ChatBot will connect to this API for emotion detection")
     print("Press Ctrl+C to stop\n")
 
-    app.run(host="0.0.0.0", port=5001, debug=False)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=args.port, debug=False, threaded=True)
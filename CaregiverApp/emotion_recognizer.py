@@ -7,17 +7,25 @@ Simplified version that avoids tkinter threading issues on macOS
 import os
 import sys
 import numpy as np
-import pandas as pd
-import librosa
-import joblib
-import sounddevice as sd
 import threading
 import time
-from collections import deque, Counter
-import queue
+from collections import deque
 import warnings
+from feature_engine import FeatureEngine, StreamingFeatureExtractor, compile_feature_plan
+from ring_buffer import AudioRingBuffer
+from emotion_stats import summarize_emotions
+from metrics import Registry, StageTimer, serve_metrics
+from startup import lazy_import, configure_numba_cache, warm_up_pipeline
+from vad import VoiceActivityDetector, NO_SPEECH
+from fast_inference import compile_model
+from audio_sources import MicrophoneSource, list_input_devices
+from result_bus import ResultBusWriter, DEFAULT_BUS_PATH
+from qos import QualityController, default_levels, check_lite_tier, FULL_TIER, LITE_TIER
 warnings.filterwarnings("ignore")
 
+pd = lazy_import('pandas')
+joblib = lazy_import('joblib')
+
 class SimpleEmotionRecognizer:
     """
     Simplified real-time emotion recognizer that works reliably on macOS
@@ -27,6 +35,9 @@ class SimpleEmotionRecognizer:
         self.model = None
         self.scaler = None
         self.feature_names = []
+        self.feature_plan = None  # Feature families the loaded model uses
+        self.fast_path = True  # Compile supported models to NumPy arrays at load time
+        self.compiled_model = None  # CompiledModel used instead of pandas + sklearn when set
         self.emotion_labels = []
         
         # Audio parameters
@@ -34,78 +45,99 @@ class SimpleEmotionRecognizer:
         self.buffer_duration = 3.0
         self.hop_duration = 0.5
         self.buffer_size = int(self.buffer_duration * self.sample_rate)
+        self.feature_engine = FeatureEngine(sample_rate=self.sample_rate)
+        
+        # Streaming mode only computes features for newly arrived frames
+        self.streaming = False
+        self.streaming_extractor = StreamingFeatureExtractor(self.feature_engine)
+        
+        # Seconds of audio after which provisional results from partial windows start,
+        # until the buffer fills and full-window results take over (None disables)
+        self.provisional_window = None
+        
+        # Silence and room noise are skipped before feature extraction (None disables)
+        self.vad = VoiceActivityDetector()
+        
+        # Load shedding: a QualityController (None keeps full quality) and the
+        # optional cheaper model it may switch to (a ModelBundle)
+        self.qos = None
+        self.lite_tier = None
         
         # Processing state
-        self.audio_buffer = deque(maxlen=self.buffer_size)
+        self.capture_dtype = 'float32'
+        self.buffer_slack = 1.0  # Seconds the callback may run ahead of a window being analysed
+        self.audio_buffer = AudioRingBuffer(self._ring_capacity(), dtype=self.capture_dtype)
+        self.window_overruns = 0
+        self._init_metrics()
         self.is_recording = False
         self.processing_thread = None
         
         # Results
         self.emotion_history = deque(maxlen=20)
         self.confidence_history = deque(maxlen=20)
+        self.result_history = deque(maxlen=20)  # Same results with audio timestamps and latency
+        self.latest_result = None
+        self.last_probabilities = None  # Class probabilities behind the last prediction
+        
+        # Optional ResultBusWriter other processes (the API's /live) read results from
+        self.result_bus = None
+        
+        # Optional persistent timeline (a TimelineStore) for patient_id's results
+        self.timeline = None
+        self.patient_id = None
+        
+        # Scheduling: the audio callback wakes the processing loop at _wake_at samples
+        self._audio_ready = threading.Event()
+        self._hop_size = self._hop_samples()
+        self._next_end = self.buffer_size  # Absolute sample at which the next window ends
+        self._wake_at = self.buffer_size
+        self._replay_origin = None  # Wall-clock time of sample 0 while replaying, else None
+        self.skipped_windows = 0
+        self.audio_source = None
         
         # Callback function
         self.callback = None
         
-    def extract_features_from_array(self, audio_data):
+    def _init_metrics(self):
+        """Stage timings, processing lag and audio callback status counters"""
+        self.metrics = Registry()
+        self.stage_timer = StageTimer(self.metrics.histogram(
+            'recognizer_stage_seconds', 'Time spent in each pipeline stage', ['stage']))
+        self.feature_engine.stage_timer = self.stage_timer
+        self.analysis_seconds = self.metrics.histogram(
+            'recognizer_analysis_seconds', 'Extraction plus prediction time per window')
+        self.processing_lag = self.metrics.histogram(
+            'recognizer_processing_lag_seconds', 'Audio that arrived after a window ended, by the time its result was ready')
+        self.lag_ratio = self.metrics.gauge(
+            'recognizer_lag_ratio', 'Last analysis time divided by the effective hop (1 or more cannot keep up)')
+        self.analyses = self.metrics.counter(
+            'recognizer_analyses', 'Analysed windows by outcome', ['outcome'])
+        self.callback_status = self.metrics.counter(
+            'recognizer_audio_status', 'Audio callback status flags reported by the driver', ['flag'])
+        self.result_latency = self.metrics.histogram(
+            'recognizer_result_latency_seconds', 'From capturing the last sample of a window to its result')
+        self.skipped = self.metrics.counter(
+            'recognizer_skipped_windows', 'Windows skipped because processing fell behind the audio')
+        self.metrics.gauge('recognizer_window_overruns', 'Results dropped because the window was overwritten',
+                           callback=lambda: self.window_overruns)
+        self.metrics.gauge('recognizer_quality_level', 'Load-shedding level (0 is full quality)',
+                           callback=lambda: self.qos.level if self.qos else 0)
+
+    def extract_features_from_array(self, audio_data, plan=None):
         """Extract features from audio array for real-time processing"""
         try:
-            if len(audio_data) < self.sample_rate * 0.5:
-                return None
-                
-            y = np.array(audio_data, dtype=np.float32)
-            
-            # Normalize
-            if np.max(np.abs(y)) > 0:
-                y = y / np.max(np.abs(y))
-            else:
-                return None
-            
-            features = {}
-            
-            # MFCCs
-            mfccs = librosa.feature.mfcc(y=y, sr=self.sample_rate, n_mfcc=13)
-            for i in range(13):
-                features[f'mfcc_mean_{i}'] = np.mean(mfccs[i])
-                features[f'mfcc_std_{i}'] = np.std(mfccs[i])
-            
-            # Chroma
-            chroma = librosa.feature.chroma_stft(y=y, sr=self.sample_rate)
-            for i in range(12):
-                features[f'chroma_mean_{i}'] = np.mean(chroma[i])
-            
-            # Spectral features
-            spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=self.sample_rate)
-            zcr = librosa.feature.zero_crossing_rate(y)
-            rms = librosa.feature.rms(y=y)
-            
-            features['spectral_centroid_mean'] = np.mean(spectral_centroid)
-            features['spectral_centroid_std'] = np.std(spectral_centroid)
-            features['zcr_mean'] = np.mean(zcr)
-            features['rms_mean'] = np.mean(rms)
-            features['rms_std'] = np.std(rms)
-            
-            # Additional features matching training
-            try:
-                rolloff = librosa.feature.spectral_rolloff(y=y, sr=self.sample_rate)
-                features['rolloff_mean'] = np.mean(rolloff)
-                features['rolloff_std'] = np.std(rolloff)
-                
-                bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=self.sample_rate)
-                features['bandwidth_mean'] = np.mean(bandwidth)
-                features['bandwidth_std'] = np.std(bandwidth)
-                
-                tempo, _ = librosa.beat.beat_track(y=y, sr=self.sample_rate)
-                features['tempo'] = tempo
-            except:
-                features['rolloff_mean'] = 0
-                features['rolloff_std'] = 0
-                features['bandwidth_mean'] = 0
-                features['bandwidth_std'] = 0
-                features['tempo'] = 0
-            
-            return features
-            
+            return self.feature_engine.extract(audio_data, self.sample_rate, plan or self.feature_plan)
+        except Exception as e:
+            print(f"Error extracting features: {e}")
+            return None
+    
+    def _extract_streaming_features(self, end, audio_data=None, plan=None):
+        """Extract features for the window ending at `end`, reusing frames from earlier hops"""
+        try:
+            if audio_data is None:
+                audio_data = self.audio_buffer.window(self.buffer_size, end)
+            return self.streaming_extractor.extract(audio_data, end - self.buffer_size, self.sample_rate,
+                                                    plan or self.feature_plan)
         except Exception as e:
             print(f"Error extracting features: {e}")
             return None
@@ -118,43 +150,79 @@ class SimpleEmotionRecognizer:
                 
             print(f"Loading model from {model_path}...")
             model_data = joblib.load(model_path)
+            # Fails loudly if the model wants features the engine can't produce
+            feature_plan = compile_feature_plan(model_data['feature_names'])
             self.model = model_data['model']
             self.scaler = model_data['scaler']
             self.feature_names = model_data['feature_names']
             self.emotion_labels = model_data['emotion_labels']
+            self.feature_plan = feature_plan
+            self.compiled_model, inference = (compile_model(self.model, self.scaler, self.feature_names)
+                                              if self.fast_path else (None, "disabled"))
             
             print(f"✅ Model loaded successfully!")
             print(f"Available emotions: {self.emotion_labels}")
             print(f"Feature count: {len(self.feature_names)}")
+            print(f"Feature families: {', '.join(sorted(feature_plan.families))}")
+            print(f"Inference: {inference}")
             return True, "Model loaded successfully"
         except Exception as e:
             return False, f"Error loading model: {e}"
     
-    def start_recognition(self, callback=None):
-        """Start real-time recognition"""
+    def load_lite_model(self, model_path):
+        """Load a cheaper model for the QoS controller's lite tier (call after load_model)"""
+        from model_reload import load_bundle
+        
+        if self.model is None:
+            return False, "Load the full model first"
+        try:
+            bundle = load_bundle(model_path, mmap_mode=None, fast_path=self.fast_path)
+        except Exception as e:
+            return False, f"Error loading lite model: {e}"
+        ok, message = check_lite_tier(bundle, self.feature_plan, self.model.classes_)
+        if not ok:
+            return False, message
+        self.lite_tier = bundle
+        if self.qos is not None:
+            self.qos.set_levels(default_levels(has_lite=True))
+        return True, message
+    
+    def enable_qos(self, **kwargs):
+        """Adapt hop length and feature tier to compute time (see QualityController)"""
+        self.qos = QualityController(default_levels(has_lite=self.lite_tier is not None), **kwargs)
+        return self.qos
+    
+    def start_recognition(self, callback=None, source=None):
+        """Start real-time recognition
+        
+        `source` is any AudioSource at the recognizer's sample rate; the
+        default microphone is used when it is None.
+        """
         if self.model is None:
             return False, "No model loaded"
+        if source is None:
+            source = MicrophoneSource(self.sample_rate, dtype=self.capture_dtype)
+        if source.sample_rate != self.sample_rate:
+            return False, f"Source is {source.sample_rate} Hz but the recognizer runs at {self.sample_rate} Hz"
         
         self.is_recording = True
         self.callback = callback
+        self.audio_source = source
+        
+        self.audio_buffer = AudioRingBuffer(self._ring_capacity(), dtype=source.dtype)
+        self.streaming_extractor.reset()
+        self.window_overruns = 0
+        self.skipped_windows = 0
+        self._reset_schedule()
+        self._audio_ready.clear()
         
         try:
-            # List available audio devices
-            print("\nAvailable audio devices:")
-            devices = sd.query_devices()
-            for i, device in enumerate(devices):
-                if device['max_input_channels'] > 0:
-                    print(f"  {i}: {device['name']} (inputs: {device['max_input_channels']})")
+            if source.live:
+                list_input_devices()
             
             # Start audio stream
-            self.audio_stream = sd.InputStream(
-                channels=1,
-                samplerate=self.sample_rate,
-                callback=self._audio_callback,
-                blocksize=1024
-            )
-            self.audio_stream.start()
-            print(f"🎤 Audio stream started (sample rate: {self.sample_rate})")
+            source.start(self._audio_callback)
+            print(f"🎤 Audio source started: {source.describe()}")
             
             # Start processing thread
             self.processing_thread = threading.Thread(target=self._processing_loop)
@@ -171,74 +239,308 @@ class SimpleEmotionRecognizer:
     def stop_recognition(self):
         """Stop recognition"""
         self.is_recording = False
+        self._audio_ready.set()  # Wake the processing loop so it can exit
         
-        if hasattr(self, 'audio_stream'):
-            self.audio_stream.stop()
-            self.audio_stream.close()
+        if self.audio_source is not None:
+            self.audio_source.close()
+            self.audio_source = None
             print("🔴 Audio stream stopped")
         
         if self.processing_thread and self.processing_thread.is_alive():
             self.processing_thread.join(timeout=2.0)
             print("🛑 Processing thread stopped")
     
+    def replay(self, source, callback=None, start_time=0.0):
+        """Run a recorded source through the live windowing as fast as the CPU allows
+        
+        Audio is written to the ring buffer in chunks that stop at each window
+        end, and every window is analysed before more audio is written, so the
+        same windows are scored as a live run that never falls behind, with no
+        skips or overruns. Results are timestamped from start_time (unix
+        seconds of the first sample) instead of the wall clock, which makes the
+        output deterministic. Yields one dict per analysed window.
+        """
+        if self.model is None:
+            raise RuntimeError("No model loaded")
+        if source.sample_rate != self.sample_rate:
+            raise ValueError(f"Source is {source.sample_rate} Hz but the recognizer runs at {self.sample_rate} Hz")
+        
+        self.callback = callback
+        self.audio_buffer = AudioRingBuffer(self._ring_capacity(), dtype=source.dtype)
+        self.streaming_extractor.reset()
+        self.window_overruns = 0
+        self.skipped_windows = 0
+        self._replay_origin = start_time
+        self._reset_schedule()
+        try:
+            while True:
+                block = source.read(source.blocksize)
+                if len(block) == 0:
+                    break
+                while len(block):
+                    size = min(len(block), self._wake_at - self.audio_buffer.samples_written)
+                    self._audio_callback(block[:size, np.newaxis], size, None, None)
+                    block = block[size:]
+                    if self.audio_buffer.samples_written >= self._wake_at:
+                        result = self._process_due()
+                        if result is not None:
+                            yield result
+        finally:
+            self._replay_origin = None
+            self._audio_ready.clear()
+            source.close()
+    
     def _audio_callback(self, indata, frames, time, status):
         """Audio input callback"""
         if status:
             print(f"Audio status: {status}")
+            for flag in ('input_overflow', 'input_underflow', 'output_overflow', 'output_underflow', 'priming_output'):
+                if getattr(status, flag, False):
+                    self.callback_status.inc(flag=flag)
         
         # Convert to mono and add to buffer
         audio_chunk = indata[:, 0] if indata.ndim > 1 else indata
-        self.audio_buffer.extend(audio_chunk)
+        self.audio_buffer.write(audio_chunk)
+        if self.audio_buffer.samples_written >= self._wake_at:
+            self._audio_ready.set()
+    
+    def _ring_capacity(self):
+        """Ring size: the analysis window, one STFT hop for frame alignment, plus slack"""
+        return (self.buffer_size + self.feature_engine.hop_length
+                + int(self.buffer_slack * self.sample_rate))
+    
+    def _reset_schedule(self):
+        """Start the hop grid over: the first window ends once buffer_size samples are in
+        
+        With provisional_window set, the first window ends as soon as that much
+        audio is in; later partial windows fall on the same hops the full
+        windows will use.
+        """
+        self._hop_size = self._hop_samples() * (self.qos.hop_factor if self._adaptive() else 1)
+        self._next_end = self.buffer_size
+        if self.provisional_window:
+            min_duration = max(self.provisional_window, self.feature_engine.min_duration)
+            self._next_end = min(self.buffer_size, int(np.ceil(min_duration * self.sample_rate)))
+        self._wake_at = self._next_end
     
     def _processing_loop(self):
-        """Main processing loop"""
-        last_process_time = 0
-        print("🔄 Processing loop started...")
+        """Analyse each hop of new audio as soon as the callback has delivered it
         
+        The audio callback wakes this thread once the next window end has been
+        captured, so scheduling follows the audio clock instead of wall-clock
+        polling.
+        """
+        print("🔄 Processing loop started...")
+        self._reset_schedule()
         while self.is_recording:
-            current_time = time.time()
-            
-            # Process every hop_duration seconds
-            if current_time - last_process_time >= self.hop_duration:
-                if len(self.audio_buffer) >= self.buffer_size:
-                    # Get current buffer content
-                    audio_data = list(self.audio_buffer)
-                    
-                    # Extract features and predict
-                    features = self.extract_features_from_array(audio_data)
-                    if features:
-                        emotion, confidence = self._predict_emotion(features)
-                        if emotion:
-                            # Store results
-                            self.emotion_history.append(emotion)
-                            self.confidence_history.append(confidence)
-                            
-                            # Call callback if provided
-                            if self.callback:
-                                try:
-                                    self.callback(emotion, confidence)
-                                except Exception as e:
-                                    print(f"Callback error: {e}")
-                
-                last_process_time = current_time
-            
-            time.sleep(0.01)  # Small sleep to prevent excessive CPU usage
+            if not self._audio_ready.wait(timeout=0.1):
+                continue
+            self._audio_ready.clear()
+            self._process_due()
+    
+    def _process_due(self):
+        """Analyse the newest due window, if any; returns its result (see _analyze_window)
+        
+        When an analysis took longer than a hop, the windows that went by
+        meanwhile are skipped (and counted) and the freshest one is analysed.
+        """
+        written = self.audio_buffer.samples_written
+        next_end, hop_size = self._next_end, self._hop_size
+        if written < next_end:
+            return None
+        
+        # Jump to the newest window on the hop grid (which runs through buffer_size)
+        end = max(next_end, self.buffer_size + (written - self.buffer_size) // hop_size * hop_size)
+        skipped = (end - next_end) // hop_size
+        if skipped:
+            self.skipped_windows += skipped
+            self.skipped.inc(skipped)
+        self._next_end = self.buffer_size + ((end - self.buffer_size) // hop_size + 1) * hop_size
+        self._wake_at = self._next_end
+        
+        # When the window's last sample was captured, by the audio clock
+        if self._replay_origin is not None:
+            captured_at = self._replay_origin + end / self.sample_rate
+        else:
+            captured_at = time.time() - (written - end) / self.sample_rate
+        return self._analyze_window(end, captured_at)
     
-    def _predict_emotion(self, features):
-        """Predict emotion from features"""
+    def _analyze_window(self, end, captured_at):
+        """Extract features for the window ending at sample `end`, predict and report
+        
+        Windows ending before buffer_size samples are provisional: they cover
+        all audio so far, always take the full extraction path and are
+        reported without entering emotion_history or the timeline.
+        
+        Returns the stored result, a NO_SPEECH result for gated windows, or
+        None when there is nothing to report.
+        """
+        analysis_start = time.perf_counter()
+        length = min(end, self.buffer_size)
+        provisional = length < self.buffer_size
+        audio_data = self.audio_buffer.window(length, end)
+        tier = self._active_tier()
+        plan = tier.feature_plan if tier is not None else self.feature_plan
+        
+        speech = self._contains_speech(audio_data)
+        if not speech:
+            features = None
+        elif self.streaming and not provisional:
+            features = self._extract_streaming_features(end, audio_data, plan)
+        else:
+            features = self.extract_features_from_array(audio_data, plan)
+        
+        # Drop results whose window the callback overwrote mid-analysis
+        if features and not self.audio_buffer.is_intact(length, end):
+            self.window_overruns += 1
+            self.analyses.inc(outcome='overrun')
+            features = None
+        elif not features and speech:
+            self.analyses.inc(outcome='no_features')
+        
+        if not speech:
+            gated = {"emotion": NO_SPEECH, "confidence": 0.0, "audio_time": end / self.sample_rate,
+                     "captured_at": captured_at, "window_seconds": length / self.sample_rate,
+                     "provisional": provisional, "speech": False}
+            self._publish(gated, None)
+            return gated
+        if not features:
+            return None
+        
+        emotion, confidence = self._predict_emotion(features, tier)
+        elapsed = time.perf_counter() - analysis_start
+        hop_duration = self._hop_size / self.sample_rate
+        if self._adaptive() and self.qos.observe(elapsed, hop_duration):
+            self._hop_size = self._hop_samples() * self.qos.hop_factor
+        self.analysis_seconds.observe(elapsed)
+        self.lag_ratio.set(elapsed / hop_duration)  # The hop this window ran at, stretched or not
+        self.processing_lag.observe(
+            (self.audio_buffer.samples_written - end) / self.sample_rate)
+        self.analyses.inc(outcome='success' if emotion else 'prediction_failed')
+        if not emotion:
+            return None
+        
+        # Store results
+        if not provisional:
+            self.emotion_history.append(emotion)
+            self.confidence_history.append(confidence)
+        self.latest_result = {
+            "emotion": emotion,
+            "confidence": float(confidence),
+            "audio_time": end / self.sample_rate,
+            "window_seconds": length / self.sample_rate,
+            "provisional": provisional,
+            "tier": LITE_TIER if tier is not None else FULL_TIER,
+            "hop_duration": hop_duration,
+            "captured_at": captured_at,
+            "compute_seconds": elapsed,
+            # A replayed window's result is ready as soon as it has been computed
+            "latency": elapsed if self._replay_origin is not None else time.time() - captured_at
+        }
+        self.result_history.append(self.latest_result)
+        self.result_latency.observe(self.latest_result["latency"])
+        if self.timeline is not None and not provisional:
+            try:
+                self.timeline.append(self.patient_id, emotion, float(confidence),
+                                     self.last_probabilities, t=captured_at)
+            except Exception as e:
+                print(f"Timeline error: {e}")
+        self._publish(self.latest_result, self.last_probabilities)
+        
+        # Call callback if provided
+        if self.callback:
+            try:
+                self.callback(emotion, confidence)
+            except Exception as e:
+                print(f"Callback error: {e}")
+        return self.latest_result
+    
+    def _publish(self, result, probabilities):
+        """Write a result and the rolling stats to the result bus, if one is attached"""
+        if self.result_bus is None:
+            return
+        try:
+            if not self.result_bus.labels:
+                self.result_bus.set_labels(self.model.classes_)
+            self.result_bus.publish(result, probabilities, self.get_emotion_stats(), len(self.emotion_history))
+        except Exception as e:
+            print(f"Result bus error: {e}")
+    
+    def _adaptive(self):
+        """Whether the QoS controller is in charge (replays keep full quality so their output is deterministic)"""
+        return self.qos is not None and self._replay_origin is None
+    
+    def _active_tier(self):
+        """The lite ModelBundle while the QoS controller has switched to it, else None for the full model"""
+        if self._adaptive() and self.qos.tier == LITE_TIER:
+            return self.lite_tier
+        return None
+    
+    def _hop_samples(self):
+        """Samples between analyses; whole STFT frames in streaming mode so frames can be reused"""
+        hop_size = max(1, int(round(self.hop_duration * self.sample_rate)))
+        if self.streaming:
+            frame_hop = self.feature_engine.hop_length
+            hop_size = max(frame_hop, int(round(hop_size / frame_hop)) * frame_hop)
+        return hop_size
+    
+    def _contains_speech(self, audio_data):
+        """Voice-activity check run before extraction
+        
+        Gated windows are reported to the callback as NO_SPEECH and never
+        enter emotion_history.
+        """
+        if self.vad is None:
+            return True
+        mark = time.perf_counter()
+        is_speech, _ = self.vad.detect(audio_data, self.sample_rate)
+        self.feature_engine.lap('vad', mark)
+        if is_speech:
+            return True
+        
+        self.analyses.inc(outcome='no_speech')
+        if self.callback:
+            try:
+                self.callback(NO_SPEECH, 0.0)
+            except Exception as e:
+                print(f"Callback error: {e}")
+        return False
+    
+    def _predict_emotion(self, features, tier=None):
+        """Predict emotion from features (with the lite tier's ModelBundle when given)"""
         try:
+            if tier is not None:
+                model, scaler, feature_names, compiled = tier.model, tier.scaler, tier.feature_names, tier.compiled
+            else:
+                model, scaler, feature_names, compiled = (self.model, self.scaler, self.feature_names,
+                                                          self.compiled_model)
+            if compiled is not None:
+                mark = time.perf_counter()
+                X = compiled.vectorize([features])
+                mark = self.feature_engine.lap('vectorize', mark)
+                probabilities = compiled.predict_proba(X)[0]
+                best = int(np.argmax(probabilities))
+                self.last_probabilities = {str(label): float(p)
+                                           for label, p in zip(compiled.classes_, probabilities)}
+                self.feature_engine.lap('predict', mark)
+                return compiled.classes_[best], probabilities[best]
+            
             # Convert to DataFrame with same structure as training data
             feature_df = pd.DataFrame([features])
-            feature_df = feature_df.reindex(columns=self.feature_names, fill_value=0)
+            feature_df = feature_df.reindex(columns=feature_names, fill_value=0)
             feature_df = feature_df.fillna(0)
             
             # Scale features
-            features_scaled = self.scaler.transform(feature_df.values)
+            mark = time.perf_counter()
+            features_scaled = scaler.transform(feature_df.values)
+            mark = self.feature_engine.lap('scale', mark)
             
             # Predict
-            prediction = self.model.predict(features_scaled)[0]
-            probabilities = self.model.predict_proba(features_scaled)[0]
+            prediction = model.predict(features_scaled)[0]
+            probabilities = model.predict_proba(features_scaled)[0]
             confidence = np.max(probabilities)
+            self.last_probabilities = {str(label): float(p) for label, p in zip(model.classes_, probabilities)}
+            self.feature_engine.lap('predict', mark)
             
             return prediction, confidence
             
@@ -246,29 +548,23 @@ class SimpleEmotionRecognizer:
             print(f"Prediction error: {e}")
             return None, 0.0
     
+    def warm_up(self):
+        """Run extraction and prediction on synthetic audio before going live
+
+        The first librosa calls compile numba code; doing that here keeps the
+        first real analyses from falling seconds behind the microphone.
+        """
+        timer = self.feature_engine.stage_timer
+        self.feature_engine.stage_timer = None
+        try:
+            return warm_up_pipeline(lambda audio, sr: self.extract_features_from_array(audio),
+                                    self._predict_emotion, self.sample_rate)
+        finally:
+            self.feature_engine.stage_timer = timer
+    
     def get_emotion_stats(self, window_size=10):
         """Get recent emotion statistics"""
-        if len(self.emotion_history) < 2:
-            return "unknown", 0.0, {}
-        
-        recent_emotions = list(self.emotion_history)[-window_size:]
-        recent_confidences = list(self.confidence_history)[-window_size:]
-        
-        # Most common emotion
-        emotion_counts = Counter(recent_emotions)
-        dominant_emotion = emotion_counts.most_common(1)[0][0]
-        
-        # Average confidence for dominant emotion
-        dominant_confidences = [conf for emotion, conf in zip(recent_emotions, recent_confidences) 
-                               if emotion == dominant_emotion]
-        avg_confidence = np.mean(dominant_confidences) if dominant_confidences else 0.0
-        
-        # Distribution
-        total = len(recent_emotions)
-        distribution = {emotion: (count/total)*100 
-                      for emotion, count in emotion_counts.items()}
-        
-        return dominant_emotion, avg_confidence, distribution
+        return summarize_emotions(self.emotion_history, self.confidence_history, window_size)
 
 class ConsoleInterface:
     """
@@ -322,6 +618,10 @@ class ConsoleInterface:
         print(f"\n📊 CURRENT DETECTION:")
         print(f"   Emotion: {color}{current_emotion.upper()}{self.reset_color}")
         print(f"   Confidence: {current_confidence:.1%}")
+        latest = self.recognizer.latest_result
+        if latest and latest.get("provisional"):
+            print(f"   Window: {latest['window_seconds']:.1f}s of {self.recognizer.buffer_duration:.1f}s "
+                  f"(provisional, low confidence)")
         
         # Dominant emotion over recent history
         dom_color = self.emotion_colors.get(dominant, self.reset_color)
@@ -345,14 +645,25 @@ class ConsoleInterface:
         print(f"   - Press Ctrl+C to stop")
         
         # Buffer status
-        buffer_fill = len(self.recognizer.audio_buffer) / self.recognizer.buffer_size
+        buffer_fill = min(1.0, len(self.recognizer.audio_buffer) / self.recognizer.buffer_size)
         buffer_bar = "█" * int(buffer_fill * 20) + "░" * (20 - int(buffer_fill * 20))
         print(f"\n🔊 AUDIO BUFFER: {buffer_bar} {buffer_fill:.1%}")
         
+        # How far behind the microphone results are
+        if latest:
+            print(f"⏱️  LATENCY: {latest['latency'] * 1000:.0f} ms "
+                  f"(compute {latest['compute_seconds'] * 1000:.0f} ms, "
+                  f"{self.recognizer.skipped_windows} windows skipped)")
+        
+        qos = self.recognizer.qos
+        if qos is not None:
+            state = "DEGRADED" if qos.level else "FULL"
+            print(f"⚙️  QUALITY: {state} ({qos.tier} features, hop x{qos.hop_factor}, load {qos.load:.0%})")
+        
         print("=" * 60)
     
-    def run(self, model_path):
-        """Run the console interface"""
+    def run(self, model_path, source=None, lite_model_path=None):
+        """Run the console interface (on the microphone unless another AudioSource is given)"""
         print("🚀 Starting Real-Time Emotion Recognition...")
         
         # Load model
@@ -361,8 +672,16 @@ class ConsoleInterface:
             print(f"❌ {message}")
             return False
         
+        if lite_model_path:
+            success, message = self.recognizer.load_lite_model(lite_model_path)
+            print(f"{'🪶' if success else '⚠️ '} {message}")
+        
+        print("🔥 Warming up the pipeline...")
+        success, message, _ = self.recognizer.warm_up()
+        print(f"{'✅' if success else '⚠️ '} {message}")
+        
         # Start recognition
-        success, message = self.recognizer.start_recognition(self.emotion_callback)
+        success, message = self.recognizer.start_recognition(self.emotion_callback, source)
         if not success:
             print(f"❌ {message}")
             return False
@@ -374,6 +693,13 @@ class ConsoleInterface:
             self.running = True
             while self.running:
                 time.sleep(0.1)
+                if source is not None and not source.running:
+                    break  # End of a recording
+            
+            time.sleep(self.recognizer.hop_duration)  # Let the last window finish
+            self.recognizer.stop_recognition()
+            print("✅ Input finished.")
+            return True
                 
         except KeyboardInterrupt:
             print("\n\n🛑 Stopping recognition...")
@@ -385,6 +711,8 @@ def test_audio_devices():
     """Test and list available audio devices"""
     print("🎤 Testing Audio Devices...")
     try:
+        import sounddevice as sd
+        
         devices = sd.query_devices()
         print("\nAvailable devices:")
         for i, device in enumerate(devices):
@@ -408,6 +736,52 @@ def test_audio_devices():
     except Exception as e:
         print(f"❌ Error listing devices: {e}")
 
+def replay_to_json(recognizer, model_path, source, start_time=0.0, output_path=None):
+    """Score a recording with recognizer.replay() and write one JSON line per window
+    
+    Progress goes to stderr so the results can be piped.
+    """
+    import json
+    from contextlib import redirect_stdout
+    
+    log = lambda message: print(message, file=sys.stderr)
+    with redirect_stdout(sys.stderr):
+        success, message = recognizer.load_model(model_path)
+    if not success:
+        log(f"❌ {message}")
+        return False
+    log(f"✅ {message}")
+    log(f"⏩ Replaying {source.describe()}")
+    
+    out = open(output_path, 'w') if output_path else sys.stdout
+    windows = 0
+    start = time.perf_counter()
+    try:
+        for result in recognizer.replay(source, start_time=start_time):
+            record = {
+                "t": round(result["captured_at"], 6),
+                "audio_time": round(result["audio_time"], 6),
+                "emotion": str(result["emotion"]),
+                "confidence": round(float(result["confidence"]), 6),
+                "window_seconds": round(result["window_seconds"], 6),
+                "provisional": result["provisional"],
+                "speech": result.get("speech", True)
+            }
+            out.write(json.dumps(record) + "\n")
+            windows += 1
+    except Exception as e:
+        log(f"❌ Replay failed: {e}")
+        return False
+    finally:
+        if output_path:
+            out.close()
+    
+    elapsed = time.perf_counter() - start
+    audio_seconds = recognizer.audio_buffer.samples_written / recognizer.sample_rate
+    log(f"✅ {windows} windows from {audio_seconds:.1f}s of audio in {elapsed:.1f}s "
+        f"({audio_seconds / elapsed if elapsed else 0:.0f}x real time)")
+    return True
+
 def main():
     """Main function"""
     import argparse
@@ -421,8 +795,62 @@ def main():
                        help='Audio buffer duration in seconds (default: 3.0)')
     parser.add_argument('--update-rate', type=float, default=0.5,
                        help='Analysis update rate in seconds (default: 0.5)')
+    parser.add_argument('--streaming', action='store_true',
+                       help='Only compute features for newly arrived audio each update')
+    parser.add_argument('--capture-dtype', choices=['float32', 'int16'], default='float32',
+                       help='Sample format captured from the microphone (default: float32)')
+    
+    parser.add_argument('--input', type=str, default='mic',
+                       help="Audio input: 'mic', 'mic:<device>', an audio file, or '-' for raw PCM on stdin (default: mic)")
+    parser.add_argument('--input-rate', type=int, default=22050,
+                       help='Sample rate of raw PCM on stdin (default: 22050)')
+    parser.add_argument('--input-dtype', choices=['int16', 'float32'], default='int16',
+                       help='Sample format of raw PCM on stdin (default: int16)')
+    parser.add_argument('--replay', action='store_true',
+                       help='Score a recorded --input as fast as possible and print one JSON line per window')
+    parser.add_argument('--start-time', type=float, default=0.0,
+                       help='Unix time of the first replayed sample, for result timestamps (default: 0)')
+    parser.add_argument('--output', type=str, default=None,
+                       help='Write replay results to this file instead of stdout')
+    
+    parser.add_argument('--provisional', type=float, nargs='?', const=0.5, default=None, metavar='SECONDS',
+                       help='Report provisional results from partial windows once this much audio is in, '
+                            'before the buffer fills (default when given: 0.5)')
+    
+    parser.add_argument('--adaptive', action='store_true',
+                       help='Lengthen the hop and switch to --lite-model when analyses overrun their budget')
+    parser.add_argument('--lite-model', type=str, default=None,
+                       help='Cheaper model (fewer feature families, same labels) used under CPU pressure')
+    parser.add_argument('--qos-high-water', type=float, default=0.8,
+                       help='Compute time / hop above which quality is reduced (default: 0.8)')
+    parser.add_argument('--qos-low-water', type=float, default=0.4,
+                       help='Projected compute time / hop below which quality is restored (default: 0.4)')
+    
+    parser.add_argument('--publish', type=str, nargs='?', const=DEFAULT_BUS_PATH, default=None, metavar='PATH',
+                       help=f'Publish live results for the API\'s /live endpoint (default when given: {DEFAULT_BUS_PATH})')
+    
+    parser.add_argument('--no-vad', action='store_true',
+                       help='Analyse every window, even silence and background noise')
+    parser.add_argument('--vad-threshold-db', type=float, default=-50.0,
+                       help='Frame level (dBFS) below which audio counts as silence (default: -50)')
+    parser.add_argument('--vad-min-speech', type=float, default=0.1,
+                       help='Fraction of voiced frames a window needs to be analysed (default: 0.1)')
+    
+    parser.add_argument('--no-fast-path', action='store_true',
+                       help='Always predict through pandas and sklearn instead of the compiled NumPy model')
+    parser.add_argument('--patient-id', type=str, default=None,
+                       help='Record results in this patient\'s timeline (needs --timeline-dir)')
+    parser.add_argument('--timeline-dir', type=str, default='emotion_timelines',
+                       help='Where patient timelines are stored (default: emotion_timelines)')
+    
+    parser.add_argument('--metrics-port', type=int, default=None,
+                       help='Serve Prometheus metrics on this port (default: disabled)')
+    parser.add_argument('--numba-cache-dir', type=str, default=None,
+                       help='Where compiled numba functions are cached across runs '
+                            '(default: NUMBA_CACHE_DIR or ~/.cache/caregiver-emotion/numba)')
     
     args = parser.parse_args()
+    configure_numba_cache(args.numba_cache_dir)
     
     if args.test_audio:
         test_audio_devices()
@@ -439,13 +867,49 @@ def main():
     recognizer = SimpleEmotionRecognizer()
     recognizer.buffer_duration = args.buffer_duration
     recognizer.hop_duration = args.update_rate
+    recognizer.streaming = args.streaming
+    recognizer.capture_dtype = args.capture_dtype
     recognizer.buffer_size = int(recognizer.buffer_duration * recognizer.sample_rate)
+    recognizer.fast_path = not args.no_fast_path
+    recognizer.provisional_window = args.provisional
+    if args.adaptive:
+        recognizer.enable_qos(high_water=args.qos_high_water, low_water=args.qos_low_water)
+    if args.no_vad:
+        recognizer.vad = None
+    else:
+        recognizer.vad.energy_threshold_db = args.vad_threshold_db
+        recognizer.vad.min_speech_fraction = args.vad_min_speech
+    if args.patient_id:
+        from timeline_store import TimelineStore, check_patient_id
+        check_patient_id(args.patient_id)  # Fail early on a bad id
+        recognizer.timeline = TimelineStore(args.timeline_dir)
+        recognizer.patient_id = args.patient_id
+        print(f"🗂️  Recording {args.patient_id}'s timeline in {args.timeline_dir}")
+    if args.publish and not args.replay:
+        recognizer.result_bus = ResultBusWriter(args.publish)
+        print(f"📡 Publishing live results to {args.publish}")
+    if args.metrics_port:
+        serve_metrics(recognizer.metrics, args.metrics_port)
+        print(f"📈 Metrics on http://localhost:{args.metrics_port}/metrics")
+    
+    from audio_sources import open_source
+    try:
+        source = open_source(args.input, args.input_rate, realtime=not args.replay,
+                             dtype=args.input_dtype, capture_dtype=args.capture_dtype)
+    except Exception as e:
+        print(f"❌ Could not open input {args.input}: {e}")
+        sys.exit(1)
+    if args.replay:
+        if source.live:
+            print("❌ --replay needs a recorded --input (a file or '-')")
+            sys.exit(1)
+        sys.exit(0 if replay_to_json(recognizer, args.model_path, source, args.start_time, args.output) else 1)
     
     # Create and run console interface
     console = ConsoleInterface(recognizer)
     console.display_interval = args.update_rate
     
-    success = console.run(args.model_path)
+    success = console.run(args.model_path, source, args.lite_model)
     if not success:
         print("❌ Failed to start emotion recognition")
         sys.exit(1)
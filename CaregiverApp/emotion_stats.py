@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Rolling emotion statistics shared by the local recognizer and API sessions
+"""
+
+import numpy as np
+from collections import Counter
+
+def summarize_emotions(emotion_history, confidence_history, window_size=10):
+    """Dominant emotion, its average confidence and the distribution over the last window_size results"""
+    if len(emotion_history) < 2:
+        return "unknown", 0.0, {}
+    
+    recent_emotions = list(emotion_history)[-window_size:]
+    recent_confidences = list(confidence_history)[-window_size:]
+    
+    # Most common emotion
+    emotion_counts = Counter(recent_emotions)
+    dominant_emotion = emotion_counts.most_common(1)[0][0]
+    
+    # Average confidence for dominant emotion
+    dominant_confidences = [conf for emotion, conf in zip(recent_emotions, recent_confidences) 
+                           if emotion == dominant_emotion]
+    avg_confidence = np.mean(dominant_confidences) if dominant_confidences else 0.0
+    
+    # Distribution
+    total = len(recent_emotions)
+    distribution = {emotion: (count/total)*100 
+                  for emotion, count in emotion_counts.items()}
+    
+    return dominant_emotion, avg_confidence, distribution
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Compiled fast-path inference for the emotion models
+Exports the scaler and classifier to plain NumPy arrays so predictions skip pandas and sklearn overhead
+"""
+
+import threading
+import numpy as np
+
+class CompiledModel:
+    """
+    A fitted scaler + classifier reduced to arrays, evaluated with vectorized NumPy
+
+    Feature dicts are written into a per-thread preallocated matrix whose
+    column order is fixed by feature_names; missing and NaN features become 0,
+    matching the DataFrame reindex/fillna path. Subclasses implement
+    _probabilities(X) on that raw (unscaled) matrix.
+    """
+
+    kind = None
+
+    def __init__(self, classes, feature_names):
+        self.classes_ = np.asarray(classes)
+        self.feature_names = list(feature_names)
+        self._local = threading.local()
+
+    def vectorize(self, features_list):
+        """N x F float64 matrix in feature_names order (reuses this thread's buffer)"""
+        n = len(features_list)
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None or buffer.shape[0] < n:
+            buffer = self._local.buffer = np.empty((max(n, 8), len(self.feature_names)))
+        X = buffer[:n]
+        for row, features in zip(X, features_list):
+            row[:] = [features.get(name, 0.0) for name in self.feature_names]
+        X[np.isnan(X)] = 0.0
+        return X
+
+    def predict_proba(self, X):
+        return self._probabilities(np.asarray(X, dtype=np.float64))
+
+    def predict_batch(self, features_list):
+        """(emotion, confidence) per feature dict, like EmotionAPI.predict_batch"""
+        return self.predict_batch_matrix(self.vectorize(features_list))
+
+    def predict_batch_matrix(self, X):
+        """(emotion, confidence) per row of a vectorized matrix"""
+        probabilities = self.predict_proba(X)
+        best = np.argmax(probabilities, axis=1)
+        return list(zip(self.classes_[best], probabilities[np.arange(len(best)), best]))
+
+class _Standardizer:
+    """The fitted scaler as z = (x - offset) / divisor, or x * multiplier + offset, exactly as sklearn computes it"""
+
+    def __init__(self, scaler):
+        name = type(scaler).__name__
+        if name == 'StandardScaler':
+            self.subtract = scaler.mean_ if scaler.mean_ is not None else 0.0
+            self.divide = scaler.scale_ if scaler.scale_ is not None else 1.0
+            self.multiply = self.add = None
+        elif name == 'MinMaxScaler':
+            self.multiply, self.add = scaler.scale_, scaler.min_
+            self.subtract = self.divide = None
+        else:
+            raise TypeError(f"unsupported scaler {name}")
+
+    def __call__(self, X):
+        if self.multiply is not None:
+            return X * self.multiply + self.add
+        return (X - self.subtract) / self.divide
+
+    def affine(self, n_features):
+        """(a, b) with z = x * a + b, for folding into a linear first layer"""
+        if self.multiply is not None:
+            return np.asarray(self.multiply, dtype=float), np.asarray(self.add, dtype=float)
+        divide = np.broadcast_to(np.asarray(self.divide, dtype=float), (n_features,))
+        subtract = np.broadcast_to(np.asarray(self.subtract, dtype=float), (n_features,))
+        return 1.0 / divide, -subtract / divide
+
+def _expit(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+def _softmax(x):
+    x = x - x.max(axis=1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=1, keepdims=True)
+    return x
+
+class CompiledLinear(CompiledModel):
+    """Logistic regression with the scaler folded into its weights: p = f(x @ W + b)"""
+
+    kind = 'linear'
+
+    def __init__(self, model, standardizer, feature_names):
+        super().__init__(model.classes_, feature_names)
+        a, b = standardizer.affine(len(feature_names))
+        coef = np.asarray(model.coef_, dtype=float)
+        self.weights = (coef * a).T.copy()
+        self.bias = np.asarray(model.intercept_, dtype=float) + coef @ b
+        solver = getattr(model, 'solver', None)
+        multi_class = getattr(model, 'multi_class', 'auto')
+        self.one_vs_rest = multi_class == 'ovr' or (multi_class == 'auto' and solver == 'liblinear')
+
+    def _probabilities(self, X):
+        scores = X @ self.weights + self.bias
+        if scores.shape[1] == 1:
+            positive = _expit(scores[:, 0])
+            return np.column_stack([1.0 - positive, positive])
+        if self.one_vs_rest:
+            scores = _expit(scores)
+            return scores / scores.sum(axis=1, keepdims=True)
+        return _softmax(scores)
+
+class CompiledMLP(CompiledModel):
+    """Multilayer perceptron with the scaler folded into its first layer"""
+
+    kind = 'mlp'
+
+    ACTIVATIONS = {
+        'relu': lambda x: np.maximum(x, 0, out=x),
+        'tanh': lambda x: np.tanh(x, out=x),
+        'logistic': _expit,
+        'identity': lambda x: x
+    }
+
+    def __init__(self, model, standardizer, feature_names):
+        super().__init__(model.classes_, feature_names)
+        if model.activation not in self.ACTIVATIONS:
+            raise TypeError(f"unsupported activation {model.activation}")
+        a, b = standardizer.affine(len(feature_names))
+        weights = [np.asarray(w, dtype=float) for w in model.coefs_]
+        biases = [np.asarray(c, dtype=float) for c in model.intercepts_]
+        biases[0] = biases[0] + b @ weights[0]
+        weights[0] = weights[0] * a[:, None]
+        self.layers = list(zip(weights, biases))
+        self.activation = self.ACTIVATIONS[model.activation]
+        self.out_activation = model.out_activation_
+
+    def _probabilities(self, X):
+        for i, (weights, bias) in enumerate(self.layers):
+            X = X @ weights + bias
+            if i < len(self.layers) - 1:
+                X = self.activation(X)
+        if self.out_activation == 'softmax':
+            return _softmax(X)
+        positive = _expit(X[:, 0])
+        return np.column_stack([1.0 - positive, positive])
+
+class CompiledTrees(CompiledModel):
+    """
+    Decision tree or forest flattened into one set of node arrays
+
+    All trees are walked together, one level per step, for every sample at
+    once. Standardization stays a separate vectorized step rather than being
+    folded into the thresholds: sklearn compares float32-rounded scaled
+    features, and moving thresholds into raw feature units would change which
+    side of a split borderline values fall on.
+    """
+
+    kind = 'trees'
+
+    def __init__(self, model, standardizer, feature_names):
+        super().__init__(model.classes_, feature_names)
+        estimators = getattr(model, 'estimators_', None) or [model]
+        n_classes = len(model.classes_)
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            if tree.n_outputs != 1 or tree.value.shape[2] != n_classes:
+                raise TypeError("multi-output trees are not supported")
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left < 0
+            # Leaves point at themselves so extra steps leave finished walks in place
+            lefts.append(np.where(leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(leaf, nodes, tree.children_right) + offset)
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            value = tree.value[:, 0, :].astype(float)
+            totals = value.sum(axis=1, keepdims=True)
+            values.append(np.divide(value, totals, out=np.zeros_like(value), where=totals > 0))
+            roots.append(offset)
+            offset += tree.node_count
+            depth = max(depth, tree.max_depth)
+
+        self.standardize = standardizer
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts).astype(np.intp)
+        self.right = np.concatenate(rights).astype(np.intp)
+        self.value = np.concatenate(values)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.depth = depth
+
+    def _probabilities(self, X):
+        Z = self.standardize(X).astype(np.float32)
+        rows = np.arange(len(Z))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(Z), len(self.roots))).copy()
+        for _ in range(self.depth):
+            go_left = Z[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes].mean(axis=1)
+
+COMPILERS = {
+    'LogisticRegression': CompiledLinear,
+    'MLPClassifier': CompiledMLP,
+    'DecisionTreeClassifier': CompiledTrees,
+    'RandomForestClassifier': CompiledTrees,
+    'ExtraTreesClassifier': CompiledTrees
+}
+
+def compile_model(model, scaler, feature_names, samples=256, tolerance=1e-6, seed=0):
+    """Compile a fitted model + scaler, verified against sklearn
+
+    Probabilities are compared on synthetic inputs spread around the
+    scaler's training distribution. Returns (CompiledModel or None, message);
+    None means callers should keep using sklearn.
+    """
+    name = type(model).__name__
+    compiler = COMPILERS.get(name)
+    if compiler is None:
+        return None, f"no fast path for {name}"
+    try:
+        compiled = compiler(model, _Standardizer(scaler), feature_names)
+
+        # Inputs around the training data, in raw feature units
+        rng = np.random.default_rng(seed)
+        Z = rng.standard_normal((samples, len(feature_names))) * 1.5
+        if type(scaler).__name__ == 'StandardScaler':
+            center = scaler.mean_ if scaler.mean_ is not None else 0.0
+            spread = scaler.scale_ if scaler.scale_ is not None else 1.0
+            X = Z * spread + center
+        else:
+            X = (Z * 0.25 + 0.5 - scaler.min_) / scaler.scale_
+
+        expected = model.predict_proba(scaler.transform(X))
+        actual = compiled.predict_proba(X)
+        error = float(np.max(np.abs(expected - actual)))
+        if error > tolerance or not np.array_equal(model.classes_, compiled.classes_):
+            return None, f"fast path for {name} disagrees with sklearn (max error {error:.2g})"
+        return compiled, f"{compiled.kind} fast path (max error {error:.1g})"
+    except Exception as e:
+        return None, f"could not compile {name}: {e}"
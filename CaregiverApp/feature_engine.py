@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+"""
+Shared audio feature engine for emotion recognition
+Computes the STFT once per window and derives every spectral feature from it
+"""
+
+import re
+import time
+import numpy as np
+import warnings
+from startup import lazy_import
+warnings.filterwarnings("ignore")
+
+# librosa (and numba behind it) loads on first use; see startup.configure_numba_cache
+librosa = lazy_import('librosa')
+
+# Scalar feature names and the feature family that produces them
+SCALAR_FEATURES = {
+    'spectral_centroid_mean': 'spectral_centroid',
+    'spectral_centroid_std': 'spectral_centroid',
+    'zcr_mean': 'zcr',
+    'rms_mean': 'rms',
+    'rms_std': 'rms',
+    'rolloff_mean': 'rolloff',
+    'rolloff_std': 'rolloff',
+    'bandwidth_mean': 'bandwidth',
+    'bandwidth_std': 'bandwidth',
+    'tempo': 'tempo',
+}
+ALL_FAMILIES = ('mfcc', 'chroma', 'spectral_centroid', 'zcr', 'rms', 'rolloff', 'bandwidth', 'tempo')
+
+# Families derived from the STFT, and those needing the log-mel spectrogram
+STFT_FAMILIES = {'mfcc', 'chroma', 'spectral_centroid', 'rolloff', 'bandwidth', 'tempo'}
+MEL_FAMILIES = {'mfcc', 'tempo'}
+
+_MFCC_NAME = re.compile(r'^mfcc_(mean|std)_(\d+)$')
+_CHROMA_NAME = re.compile(r'^chroma_mean_(\d+)$')
+
+class FeaturePlan:
+    """
+    The set of feature families a model needs, compiled from its feature_names
+    """
+
+    def __init__(self, families=ALL_FAMILIES, n_mfcc=13, feature_names=None):
+        self.families = frozenset(families)
+        self.n_mfcc = n_mfcc
+        self.feature_names = list(feature_names) if feature_names is not None else None
+
+    def needs(self, family):
+        """Whether the plan includes a feature family"""
+        return family in self.families
+
+    @property
+    def needs_stft(self):
+        return bool(self.families & STFT_FAMILIES)
+
+    @property
+    def needs_mel(self):
+        return bool(self.families & MEL_FAMILIES)
+
+    def __repr__(self):
+        return f"FeaturePlan({sorted(self.families)}, n_mfcc={self.n_mfcc})"
+
+def compile_feature_plan(feature_names, n_mfcc=13):
+    """Map a model's feature_names to the minimal FeaturePlan that produces them
+
+    An empty list means the model didn't record its features, so every family
+    is computed. Raises ValueError for names the engine can't produce.
+    """
+    if not feature_names:
+        return FeaturePlan(n_mfcc=n_mfcc)
+
+    families = set()
+    max_mfcc = 0
+    unknown = []
+    for name in feature_names:
+        mfcc = _MFCC_NAME.match(name)
+        chroma = _CHROMA_NAME.match(name)
+        if name in SCALAR_FEATURES:
+            families.add(SCALAR_FEATURES[name])
+        elif mfcc:
+            families.add('mfcc')
+            max_mfcc = max(max_mfcc, int(mfcc.group(2)) + 1)
+        elif chroma and int(chroma.group(1)) < 12:
+            families.add('chroma')
+        else:
+            unknown.append(name)
+
+    if unknown:
+        raise ValueError(f"Model uses features the extractor can't compute: {', '.join(unknown)}")
+
+    return FeaturePlan(families, n_mfcc=max(max_mfcc, 1), feature_names=feature_names)
+
+class FeatureEngine:
+    """
+    Single-STFT feature extractor used by SimpleEmotionRecognizer and EmotionAPI
+
+    librosa's feature helpers each run their own STFT when given a time series.
+    Here the magnitude and power spectrograms are computed once and passed in
+    as S=..., which yields the same feature dict as the per-feature calls.
+    """
+
+    def __init__(self, sample_rate=22050, n_fft=2048, hop_length=512, n_mfcc=13):
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mfcc = n_mfcc
+        self.min_duration = 0.5
+
+        # Mel filter banks depend only on (sr, n_fft), so build each once;
+        # chroma banks also depend on the estimated tuning (0.01-bin steps)
+        self._mel_basis = {}
+        self._chroma_basis = {}
+        self._fft_window = None
+
+        # Optional metrics.StageTimer receiving per-family extraction times
+        self.stage_timer = None
+
+    def lap(self, stage, start):
+        """Report the time since `start` for a stage; returns the new start"""
+        now = time.perf_counter()
+        if self.stage_timer is not None:
+            self.stage_timer.observe(stage, now - start)
+        return now
+
+    def mel_basis(self, sample_rate):
+        """Get (and cache) the mel filter bank for a sample rate"""
+        basis = self._mel_basis.get(sample_rate)
+        if basis is None:
+            basis = librosa.filters.mel(sr=sample_rate, n_fft=self.n_fft)
+            self._mel_basis[sample_rate] = basis
+        return basis
+
+    def chroma(self, power, sample_rate, tuning=None):
+        """Chroma from a power spectrogram, as librosa.feature.chroma_stft computes it"""
+        if tuning is None:
+            tuning = librosa.estimate_tuning(S=power, sr=sample_rate, bins_per_octave=12)
+        key = (sample_rate, round(float(tuning), 6))
+        basis = self._chroma_basis.get(key)
+        if basis is None:
+            basis = librosa.filters.chroma(sr=sample_rate, n_fft=self.n_fft, tuning=tuning)
+            self._chroma_basis[key] = basis
+        return librosa.util.normalize(np.dot(basis, power), norm=np.inf, axis=-2)
+
+    def spectrum(self, frames):
+        """Complex spectrum of framed audio (n_fft x n_frames), matching librosa.stft"""
+        if self._fft_window is None:
+            self._fft_window = librosa.filters.get_window('hann', self.n_fft, fftbins=True)
+        fft = librosa.get_fftlib()
+        return fft.rfft(self._fft_window[:, np.newaxis] * frames, axis=0).astype(np.complex64)
+
+    def prepare(self, audio_data, sample_rate=None):
+        """Validate and peak-normalize an audio array, or return None if unusable"""
+        sr = sample_rate or self.sample_rate
+        if len(audio_data) < sr * self.min_duration:
+            return None
+
+        y = np.asarray(audio_data, dtype=np.float32)
+
+        # Normalize
+        peak = np.max(np.abs(y))
+        if peak > 0:
+            return y / peak
+        return None
+
+    def extract(self, audio_data, sample_rate=None, plan=None):
+        """Extract the emotion feature dict from an audio array
+
+        With a FeaturePlan only the families the model uses are computed.
+        """
+        sr = sample_rate or self.sample_rate
+        plan = plan or FULL_PLAN
+        y = self.prepare(audio_data, sr)
+        if y is None:
+            return None
+        mark = time.perf_counter()
+
+        # One STFT for every spectral feature
+        if plan.needs_stft:
+            magnitude = np.abs(librosa.stft(y, n_fft=self.n_fft, hop_length=self.hop_length))
+            power = magnitude ** 2
+            mark = self.lap('feature_stft', mark)
+        if plan.needs_mel:
+            mel_db = librosa.power_to_db(np.dot(self.mel_basis(sr), power))
+            mark = self.lap('feature_mel', mark)
+
+        features = {}
+        if plan.needs('mfcc'):
+            self._add_mfcc_features(features, mel_db, plan.n_mfcc)
+            mark = self.lap('feature_mfcc', mark)
+        if plan.needs('chroma'):
+            self._add_chroma_features(features, self.chroma(power, sr))
+            mark = self.lap('feature_chroma', mark)
+
+        # Spectral features
+        if plan.needs('spectral_centroid'):
+            spectral_centroid = librosa.feature.spectral_centroid(S=magnitude, sr=sr)
+            features['spectral_centroid_mean'] = np.mean(spectral_centroid)
+            features['spectral_centroid_std'] = np.std(spectral_centroid)
+            mark = self.lap('feature_spectral_centroid', mark)
+        if plan.needs('zcr'):
+            zcr = librosa.feature.zero_crossing_rate(y, hop_length=self.hop_length)
+            features['zcr_mean'] = np.mean(zcr)
+            mark = self.lap('feature_zcr', mark)
+        if plan.needs('rms'):
+            rms = librosa.feature.rms(y=y, hop_length=self.hop_length)
+            features['rms_mean'] = np.mean(rms)
+            features['rms_std'] = np.std(rms)
+            mark = self.lap('feature_rms', mark)
+
+        # Additional features matching training
+        try:
+            if plan.needs('rolloff'):
+                rolloff = librosa.feature.spectral_rolloff(S=magnitude, sr=sr)
+                features['rolloff_mean'] = np.mean(rolloff)
+                features['rolloff_std'] = np.std(rolloff)
+                mark = self.lap('feature_rolloff', mark)
+
+            if plan.needs('bandwidth'):
+                bandwidth = librosa.feature.spectral_bandwidth(S=magnitude, sr=sr)
+                features['bandwidth_mean'] = np.mean(bandwidth)
+                features['bandwidth_std'] = np.std(bandwidth)
+                mark = self.lap('feature_bandwidth', mark)
+
+            if plan.needs('tempo'):
+                features['tempo'] = self._tempo(mel_db, sr)
+                mark = self.lap('feature_tempo', mark)
+        except:
+            self._zero_fallback_features(features, plan)
+
+        return features
+
+    def _zero_fallback_features(self, features, plan):
+        """Zero rolloff, bandwidth and tempo when one of them fails, as training did"""
+        for name in ('rolloff_mean', 'rolloff_std', 'bandwidth_mean', 'bandwidth_std', 'tempo'):
+            if plan.needs(SCALAR_FEATURES[name]):
+                features[name] = 0
+
+    def _add_mfcc_features(self, features, mel_db, n_mfcc=None):
+        """Add MFCC means and standard deviations from a log-mel spectrogram"""
+        n_mfcc = n_mfcc or self.n_mfcc
+        mfccs = librosa.feature.mfcc(S=mel_db, n_mfcc=n_mfcc)
+        for i in range(n_mfcc):
+            features[f'mfcc_mean_{i}'] = np.mean(mfccs[i])
+            features[f'mfcc_std_{i}'] = np.std(mfccs[i])
+
+    def _add_chroma_features(self, features, chroma):
+        """Add chroma means"""
+        for i in range(12):
+            features[f'chroma_mean_{i}'] = np.mean(chroma[i])
+
+    def _tempo(self, mel_db, sr):
+        """Estimate tempo from a log-mel spectrogram"""
+        # beat_track would otherwise rebuild the same log-mel spectrogram
+        onset_env = librosa.onset.onset_strength(S=mel_db, sr=sr, aggregate=np.median)
+        tempo, _ = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr,
+                                           hop_length=self.hop_length)
+        return float(np.atleast_1d(tempo)[0])
+
+# Every feature family, as extracted before models carried a plan
+FULL_PLAN = FeaturePlan()
+
+class StreamingFeatureExtractor:
+    """
+    Incremental sliding-window feature extractor for the real-time recognizer
+
+    Per-frame spectra and scalar features are computed only for STFT frames that
+    are new since the previous window and kept in a frame ring. Scalar feature
+    means and standard deviations are updated from running sums as old frames
+    drop out. MFCC, chroma and tempo depend on window-level state (top_db
+    clipping, tuning estimation, beat tracking), so they are re-aggregated from
+    the cached per-frame spectra instead of being recomputed from audio.
+
+    Windows must start on a multiple of hop_length so frames line up between
+    updates; anything else falls back to a full FeatureEngine pass.
+    """
+
+    # Per-frame scalar features kept in the ring and in the running sums
+    SCALARS = ('spectral_centroid', 'rolloff', 'bandwidth', 'zcr', 'rms')
+
+    def __init__(self, engine=None):
+        self.engine = engine or FeatureEngine()
+        self.frames_computed = 0
+        self.frames_reused = 0
+        self._window_length = None
+        self._sample_rate = None
+        self._capacity = 0
+        self._plan = None
+        self._clear(0)
+
+    def _clear(self, start):
+        """Drop all cached frames and restart the ring at absolute frame `start`"""
+        self._first = start
+        self._end = start
+        self._since_reseed = 0
+        self._sum = np.zeros(len(self.SCALARS))
+        self._sumsq = np.zeros(len(self.SCALARS))
+
+    def reset(self):
+        """Forget cached frames, e.g. before a new audio stream starts at sample 0"""
+        self._clear(0)
+
+    def _configure(self, window_length, sample_rate, capacity):
+        """Allocate the frame ring for a window length and sample rate"""
+        n_bins = 1 + self.engine.n_fft // 2
+        n_mels = self.engine.mel_basis(sample_rate).shape[0]
+        self._window_length = window_length
+        self._sample_rate = sample_rate
+        self._capacity = capacity
+        self._power = np.zeros((capacity, n_bins), dtype=np.float32)
+        self._mel = np.zeros((capacity, n_mels), dtype=np.float32)
+        self._scalars = np.zeros((capacity, len(self.SCALARS)))
+        self._pitches = [None] * capacity
+        self._clear(0)
+
+    def _frame_data(self, padded, padded_edge, frame_idx, sr, with_pitches=True):
+        """Compute per-frame data for the given window frames of the raw audio"""
+        n_fft, hop = self.engine.n_fft, self.engine.hop_length
+        frames = librosa.util.frame(padded, frame_length=n_fft, hop_length=hop)[:, frame_idx]
+
+        magnitude = np.abs(self.engine.spectrum(frames))
+        power = magnitude ** 2
+        mel = np.dot(self.engine.mel_basis(sr), power)
+
+        rms = np.sqrt(np.mean(np.abs(frames) ** 2, axis=0))
+        # zero_crossing_rate pads with edge values rather than zeros
+        edge_frames = librosa.util.frame(padded_edge, frame_length=n_fft, hop_length=hop)[:, frame_idx]
+        zcr = np.mean(librosa.zero_crossings(edge_frames, axis=-2, pad=False), axis=0)
+
+        scalars = np.column_stack([
+            librosa.feature.spectral_centroid(S=magnitude, sr=sr)[0],
+            librosa.feature.spectral_rolloff(S=magnitude, sr=sr)[0],
+            librosa.feature.spectral_bandwidth(S=magnitude, sr=sr)[0],
+            zcr,
+            rms,
+        ])
+
+        # Tuning candidates, as estimate_tuning would collect them per frame
+        candidates = [None] * power.shape[1]
+        if not with_pitches:
+            return power.T, mel.T, scalars, candidates
+
+        pitches, mags = librosa.piptrack(S=power, sr=sr, n_fft=n_fft)
+        for j in range(power.shape[1]):
+            mask = pitches[:, j] > 0
+            candidates[j] = (pitches[mask, j], mags[mask, j])
+
+        return power.T, mel.T, scalars, candidates
+
+    def extract(self, audio_data, window_start, sample_rate=None, plan=None):
+        """Extract features for the window starting at absolute sample `window_start`"""
+        engine = self.engine
+        sr = sample_rate or engine.sample_rate
+        plan = plan or FULL_PLAN
+        if len(audio_data) < sr * engine.min_duration:
+            return None
+
+        y = np.asarray(audio_data, dtype=np.float32)
+        peak = float(np.max(np.abs(y)))
+        if peak == 0:
+            return None
+
+        n_fft, hop = engine.n_fft, engine.hop_length
+        n_frames = 1 + len(y) // hop
+        # Interior frames never touch the centre padding, so they are shared between windows
+        t_lo = -(-(n_fft // 2) // hop)
+        t_hi = (len(y) - n_fft // 2) // hop
+        if window_start % hop or t_hi < t_lo:
+            self._window_length = None
+            return engine.extract(y, sr, plan)
+
+        if len(y) != self._window_length or sr != self._sample_rate:
+            self._configure(len(y), sr, t_hi - t_lo + 1)
+
+        # Cached frames only carry tuning candidates if the previous plan needed chroma
+        if plan is not self._plan:
+            self._plan = plan
+            self._clear(0)
+
+        origin = window_start // hop
+        first, last = origin + t_lo, origin + t_hi + 1
+        if first < self._first or first >= self._end:
+            self._clear(first)
+
+        cap = self._capacity
+        if first > self._first:
+            dropped = self._scalars[np.arange(self._first, first) % cap]
+            self._sum -= dropped.sum(axis=0)
+            self._sumsq -= (dropped ** 2).sum(axis=0)
+            self._first = first
+
+        mark = time.perf_counter()
+        padded = np.pad(y, n_fft // 2)
+        padded_edge = np.pad(y, n_fft // 2, mode='edge')
+
+        # Frames touching the centre padding are specific to this window, so
+        # compute them together with the newly arrived interior frames
+        edges = np.r_[0:t_lo, t_hi + 1:n_frames]
+        new = np.arange(max(self._end, first), last)
+        power, mel, scalars, candidates = self._frame_data(
+            padded, padded_edge, np.concatenate([edges, new - origin]), sr,
+            with_pitches=plan.needs('chroma'))
+        n_head, n_edges = t_lo, len(edges)
+
+        if len(new):
+            slots = new % cap
+            self._power[slots] = power[n_edges:]
+            self._mel[slots] = mel[n_edges:]
+            self._scalars[slots] = scalars[n_edges:]
+            for slot, candidate in zip(slots, candidates[n_edges:]):
+                self._pitches[slot] = candidate
+            self._sum += scalars[n_edges:].sum(axis=0)
+            self._sumsq += (scalars[n_edges:] ** 2).sum(axis=0)
+            self.frames_computed += len(new)
+            self._since_reseed += len(new)
+            self._end = last
+
+        slots = np.arange(first, last) % cap
+        self.frames_reused += len(slots) - len(new)
+
+        # Re-seed the running sums once per ring turn to bound float drift
+        if self._since_reseed >= cap:
+            self._sum = self._scalars[slots].sum(axis=0)
+            self._sumsq = (self._scalars[slots] ** 2).sum(axis=0)
+            self._since_reseed = 0
+        mark = engine.lap('feature_frames', mark)
+
+        head = slice(0, n_head)
+        tail = slice(n_head, n_edges)
+        scale = 1.0 / peak ** 2
+        features = {}
+        if plan.needs_mel:
+            mel_db = librosa.power_to_db(np.concatenate([mel[head], self._mel[slots], mel[tail]]).T * scale)
+            mark = engine.lap('feature_mel', mark)
+        if plan.needs('mfcc'):
+            engine._add_mfcc_features(features, mel_db, plan.n_mfcc)
+            mark = engine.lap('feature_mfcc', mark)
+        if plan.needs('chroma'):
+            window_power = np.concatenate([power[head], self._power[slots], power[tail]]).T * scale
+            pitch_candidates = candidates[head] + [self._pitches[slot] for slot in slots] + candidates[tail]
+            pitches = np.concatenate([p for p, _ in pitch_candidates])
+            mags = np.concatenate([m for _, m in pitch_candidates])
+            threshold = np.median(mags) if len(mags) else 0.0
+            tuning = librosa.pitch_tuning(pitches[mags >= threshold], resolution=0.01, bins_per_octave=12)
+            engine._add_chroma_features(features, engine.chroma(window_power, sr, tuning))
+            mark = engine.lap('feature_chroma', mark)
+
+        edge_scalars = scalars[:n_edges]
+        total = self._sum + edge_scalars.sum(axis=0)
+        total_sq = self._sumsq + (edge_scalars ** 2).sum(axis=0)
+        mean = total / n_frames
+        std = np.sqrt(np.maximum(total_sq / n_frames - mean ** 2, 0))
+        stats = {name: (mean[i], std[i]) for i, name in enumerate(self.SCALARS)}
+
+        if plan.needs('spectral_centroid'):
+            features['spectral_centroid_mean'] = stats['spectral_centroid'][0]
+            features['spectral_centroid_std'] = stats['spectral_centroid'][1]
+        if plan.needs('zcr'):
+            features['zcr_mean'] = stats['zcr'][0]
+        if plan.needs('rms'):
+            features['rms_mean'] = stats['rms'][0] / peak
+            features['rms_std'] = stats['rms'][1] / peak
+
+        try:
+            if plan.needs('rolloff'):
+                features['rolloff_mean'] = stats['rolloff'][0]
+                features['rolloff_std'] = stats['rolloff'][1]
+            if plan.needs('bandwidth'):
+                features['bandwidth_mean'] = stats['bandwidth'][0]
+                features['bandwidth_std'] = stats['bandwidth'][1]
+            if plan.needs('tempo'):
+                features['tempo'] = engine._tempo(mel_db, sr)
+                mark = engine.lap('feature_tempo', mark)
+        except:
+            engine._zero_fallback_features(features, plan)
+
+        return features
+
+def extract_reference_features(audio_data, sample_rate=22050):
+    """Original per-feature extraction (one STFT per librosa call), kept for checking"""
+    if len(audio_data) < sample_rate * 0.5:
+        return None
+
+    y = np.array(audio_data, dtype=np.float32)
+    if np.max(np.abs(y)) > 0:
+        y = y / np.max(np.abs(y))
+    else:
+        return None
+
+    features = {}
+    mfccs = librosa.feature.mfcc(y=y, sr=sample_rate, n_mfcc=13)
+    for i in range(13):
+        features[f'mfcc_mean_{i}'] = np.mean(mfccs[i])
+        features[f'mfcc_std_{i}'] = np.std(mfccs[i])
+
+    chroma = librosa.feature.chroma_stft(y=y, sr=sample_rate)
+    for i in range(12):
+        features[f'chroma_mean_{i}'] = np.mean(chroma[i])
+
+    spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=sample_rate)
+    zcr = librosa.feature.zero_crossing_rate(y)
+    rms = librosa.feature.rms(y=y)
+    features['spectral_centroid_mean'] = np.mean(spectral_centroid)
+    features['spectral_centroid_std'] = np.std(spectral_centroid)
+    features['zcr_mean'] = np.mean(zcr)
+    features['rms_mean'] = np.mean(rms)
+    features['rms_std'] = np.std(rms)
+
+    rolloff = librosa.feature.spectral_rolloff(y=y, sr=sample_rate)
+    features['rolloff_mean'] = np.mean(rolloff)
+    features['rolloff_std'] = np.std(rolloff)
+    bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=sample_rate)
+    features['bandwidth_mean'] = np.mean(bandwidth)
+    features['bandwidth_std'] = np.std(bandwidth)
+    tempo, _ = librosa.beat.beat_track(y=y, sr=sample_rate)
+    features['tempo'] = float(np.atleast_1d(tempo)[0])
+
+    return features
+
+def compare_with_reference(engine, audio_data, sample_rate=22050, rtol=1e-4, atol=1e-5):
+    """Compare engine output with the reference extraction
+
+    Returns (matches, mismatches) where mismatches maps feature name to
+    (engine_value, reference_value).
+    """
+    ours = engine.extract(audio_data, sample_rate)
+    reference = extract_reference_features(audio_data, sample_rate)
+    if ours is None or reference is None:
+        return ours is None and reference is None, {}
+
+    mismatches = {}
+    for name, ref_value in reference.items():
+        value = ours.get(name)
+        if value is None or not np.isclose(value, ref_value, rtol=rtol, atol=atol):
+            mismatches[name] = (value, ref_value)
+    return not mismatches, mismatches
+
+def main():
+    """Check the engine against the reference extraction on synthetic audio"""
+    sample_rate = 22050
+    rng = np.random.default_rng(0)
+    t = np.arange(int(3.0 * sample_rate)) / sample_rate
+    clips = {
+        'tone': 0.5 * np.sin(2 * np.pi * 220 * t),
+        'noise': 0.1 * rng.standard_normal(len(t)),
+        'chirp': np.sin(2 * np.pi * (100 + 400 * t) * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 2 * t)),
+    }
+
+    engine = FeatureEngine(sample_rate=sample_rate)
+    all_ok = True
+    for name, clip in clips.items():
+        ok, mismatches = compare_with_reference(engine, clip.astype(np.float32), sample_rate)
+        all_ok = all_ok and ok
+        print(f"{'✅' if ok else '❌'} {name}: {len(mismatches)} mismatched features")
+        for feature, (value, ref_value) in mismatches.items():
+            print(f"   {feature}: {value} != {ref_value}")
+    return all_ok
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Lightweight metrics for the emotion pipeline
+Counters, gauges and histograms rendered in the Prometheus text format
+"""
+
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, from sub-millisecond stages to slow requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+class _Metric:
+    """Shared label handling; each child holds one label combination"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            lines.extend(self._render_child(values, child))
+        return lines
+
+class Counter(_Metric):
+    """Monotonic count, e.g. requests by outcome"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._children[key] = self._children.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._children.get(self._key(labels), 0)
+
+    def _render_child(self, values, value):
+        return [f"{self.name}_total{_format_labels(self.labelnames, values)} {value}"]
+
+class Gauge(_Metric):
+    """Point-in-time value, set directly or read from a callback at scrape time"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._children[key] = value
+
+    def render(self):
+        if self.callback is not None:
+            try:
+                value = self.callback()
+            except Exception:
+                value = None
+            if value is not None:
+                self.set(value)
+        return super().render()
+
+    def _render_child(self, values, value):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {value}"]
+
+class Histogram(_Metric):
+    """Cumulative-bucket latency histogram"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            child[0][bisect.bisect_left(self.buckets, value)] += 1
+            child[1] += value
+            child[2] += 1
+
+    def _render_child(self, values, child):
+        counts, total, count = child
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, values, ('le', repr(float(bound))))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values, ('le', '+Inf'))
+        lines.append(f"{self.name}_bucket{labels} {count}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, values)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, values)} {count}")
+        return lines
+
+class Registry:
+    """A named set of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        return self._register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+class StageTimer:
+    """
+    Records pipeline stage durations into a histogram, and into the calling
+    thread's request log while one is open (see begin_request/end_request)
+    """
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self._local = threading.local()
+
+    def observe(self, stage, seconds):
+        self.histogram.observe(seconds, stage=stage)
+        timings = getattr(self._local, 'timings', None)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def begin_request(self):
+        self._local.timings = {}
+
+    def end_request(self):
+        """Stage timings collected on this thread since begin_request"""
+        timings = getattr(self._local, 'timings', None)
+        self._local.timings = None
+        return timings or {}
+
+def log_json(record):
+    """One structured log line"""
+    print(json.dumps(record, default=str), flush=True)
+
+def serve_metrics(registry, port, host='0.0.0.0'):
+    """Expose a registry on http://host:port/metrics from a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server")
+    thread.daemon = True
+    thread.start()
+    return server
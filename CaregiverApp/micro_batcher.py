@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Dynamic micro-batching for the Emotion Detection API
+Collects concurrent predictions for a few milliseconds and runs them as one matrix
+"""
+
+import time
+import threading
+from collections import Counter
+from concurrent.futures import Future
+
+class MicroBatcher:
+    """
+    Batches concurrent predict requests in front of EmotionAPI.predict_batch
+
+    A batch is dispatched when max_batch_size requests are waiting or max_wait
+    seconds after its first request arrived, whichever comes first. A larger
+    window trades per-request latency for fewer, larger sklearn calls.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=32, max_wait=0.005):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._pending = []  # (features, future, enqueue_time)
+        self._cond = threading.Condition()
+        self._running = True
+
+        # Stats
+        self.batches = 0
+        self.items = 0
+        self.total_batch_wait = 0.0
+        self.total_item_wait = 0.0
+        self.last_batch_size = 0
+        self.last_batch_wait = 0.0
+        self.size_counts = Counter()
+
+        self._thread = threading.Thread(target=self._run, name="micro-batcher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, features):
+        """Queue one feature dict; returns a Future resolving to (emotion, confidence)"""
+        future = Future()
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("Micro-batcher stopped")
+            self._pending.append((features, future, time.monotonic()))
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch_size:
+                self._cond.notify()
+        return future
+
+    def predict(self, features, timeout=None):
+        """Blocking predict through the batcher"""
+        return self.submit(features).result(timeout=timeout)
+
+    def _next_batch(self):
+        """Wait for a full batch or the end of the batching window"""
+        with self._cond:
+            while not self._pending and self._running:
+                self._cond.wait()
+            if not self._pending:
+                return []
+
+            deadline = self._pending[0][2] + self.max_wait
+            while len(self._pending) < self.max_batch_size and self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            return batch
+
+    def _run(self):
+        """Dispatch loop"""
+        while self._running or self._pending:
+            batch = self._next_batch()
+            if not batch:
+                continue
+
+            dispatched = time.monotonic()
+            try:
+                results = self.predict_batch([features for features, _, _ in batch])
+            except Exception as e:
+                print(f"Micro-batch prediction error: {e}")
+                results = []
+            if len(results) != len(batch):
+                results = [(None, 0.0)] * len(batch)
+
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+            batch_wait = dispatched - batch[0][2]
+            with self._cond:
+                self.batches += 1
+                self.items += len(batch)
+                self.total_batch_wait += batch_wait
+                self.total_item_wait += sum(dispatched - queued for _, _, queued in batch)
+                self.last_batch_size = len(batch)
+                self.last_batch_wait = batch_wait
+                self.size_counts[len(batch)] += 1
+
+    def stats(self):
+        """Batch size and wait-time statistics"""
+        with self._cond:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self.batches,
+                "items": self.items,
+                "queued": len(self._pending),
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "mean_batch_wait_ms": 1000 * self.total_batch_wait / self.batches if self.batches else 0.0,
+                "mean_item_wait_ms": 1000 * self.total_item_wait / self.items if self.items else 0.0,
+                "last_batch_size": self.last_batch_size,
+                "last_batch_wait_ms": self.last_batch_wait * 1000,
+                "batch_sizes": {str(size): count for size, count in sorted(self.size_counts.items())}
+            }
+
+    def stop(self):
+        """Stop after dispatching anything still queued"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout=2.0)
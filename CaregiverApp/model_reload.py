@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Model bundles and zero-downtime hot reload for the Emotion Detection API
+A reload loads and checks the new model off to the side, then swaps one reference
+"""
+
+import os
+import time
+import threading
+from feature_engine import compile_feature_plan
+from fast_inference import compile_model
+from result_cache import file_version
+from startup import lazy_import
+
+joblib = lazy_import('joblib')
+
+DEFAULT_EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'neutral', 'sad', 'surprise']
+
+class ModelBundle:
+    """
+    Everything one model version needs, swapped as a unit
+
+    Requests take a reference to the bundle once and use it throughout, so a
+    reload never mixes the old scaler with the new model or extracts features
+    for one version and predicts with another.
+    """
+
+    def __init__(self, model, scaler, feature_names, emotion_labels=None, sample_rate=22050,
+                 path=None, version=None, fast_path=True):
+        self.model = model
+        self.scaler = scaler
+        self.feature_names = list(feature_names)
+        # Fails loudly if the model wants features the engine can't produce
+        self.feature_plan = compile_feature_plan(self.feature_names)
+        self.emotion_labels = list(emotion_labels) if emotion_labels else list(DEFAULT_EMOTION_LABELS)
+        self.sample_rate = int(sample_rate)
+        self.path = path
+        self.version = version
+        self.loaded_at = time.time()
+
+        # Array-only copy of scaler + model, or None to predict through sklearn
+        self.compiled, self.fast_path = (compile_model(model, scaler, self.feature_names) if fast_path
+                                         else (None, "disabled"))
+
+    def info(self):
+        """JSON-friendly description"""
+        return {
+            "path": self.path,
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "sample_rate": self.sample_rate,
+            "feature_count": len(self.feature_names),
+            "fast_path": self.fast_path,
+            "emotion_labels": self.emotion_labels
+        }
+
+def load_bundle(model_path, mmap_mode='r', fast_path=True):
+    """Load a .joblib model bundle
+
+    With mmap_mode='r' joblib maps the bundle's numpy arrays straight from the
+    file instead of copying them onto the heap, so every process serving the
+    same file shares one page-cache copy. This needs an uncompressed dump
+    (joblib falls back to a normal load for compressed files), and estimators
+    that copy their arrays while unpickling, such as tree ensembles, keep
+    private copies of those. With fast_path the model is also compiled to
+    NumPy arrays (see fast_inference) when its type is supported.
+    """
+    model_data = joblib.load(model_path, mmap_mode=mmap_mode)
+    return ModelBundle(
+        model=model_data['model'],
+        scaler=model_data['scaler'],
+        feature_names=model_data['feature_names'],
+        emotion_labels=model_data.get('emotion_labels'),
+        sample_rate=model_data.get('sample_rate', 22050),
+        path=model_path,
+        version=file_version(model_path),
+        fast_path=fast_path
+    )
+
+class ModelReloader:
+    """
+    Loads, canary-checks and activates new model bundles in the background
+
+    api is an EmotionAPI. before_activate(bundle) runs after the canary passes
+    and before the swap, e.g. to bring up worker processes on the new file;
+    returning (False, message) aborts the reload and keeps the current model.
+    """
+
+    def __init__(self, api, before_activate=None):
+        self.api = api
+        self.before_activate = before_activate
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._watch_thread = None
+        self._watching = False
+
+        # Status
+        self.reloads = 0
+        self.failures = 0
+        self.last_result = None
+
+    @property
+    def reloading(self):
+        return self._reloading
+
+    def reload(self, model_path=None):
+        """Load, check and swap in a model now; returns (success, message)"""
+        with self._lock:
+            if self._reloading:
+                return False, "A reload is already in progress"
+            self._reloading = True
+
+        started = time.time()
+        model_path = model_path or (self.api.bundle.path if self.api.bundle else None)
+        try:
+            if not model_path:
+                raise ValueError("No model path given")
+            bundle = self.api.load_bundle(model_path)
+            ok, message = self.api.validate_bundle(bundle)
+            if ok and self.before_activate is not None:
+                ok, message = self.before_activate(bundle)
+            if ok:
+                self.api.activate_bundle(bundle)
+                message = f"Model {bundle.version} active ({message})"
+        except Exception as e:
+            ok, message = False, f"Error loading model: {e}"
+        finally:
+            with self._lock:
+                self._reloading = False
+
+        with self._lock:
+            if ok:
+                self.reloads += 1
+            else:
+                self.failures += 1
+            self.last_result = {
+                "success": ok,
+                "message": message,
+                "model_path": model_path,
+                "started_at": started,
+                "seconds": time.time() - started
+            }
+        print(f"{'🔁' if ok else '⚠️ '} {message}")
+        return ok, message
+
+    def reload_async(self, model_path=None):
+        """Start a reload in the background; False if one is already running"""
+        if self._reloading:
+            return False
+        thread = threading.Thread(target=self.reload, args=(model_path,), name="model-reload")
+        thread.daemon = True
+        thread.start()
+        return True
+
+    def watch(self, model_path, interval=5.0):
+        """Reload whenever model_path changes on disk
+
+        A change is acted on once the file has stopped changing for one
+        interval, so a model copied in place isn't loaded half-written
+        (an atomic rename into place is still the safer way to deploy).
+        """
+        def signature():
+            try:
+                stat = os.stat(model_path)
+                return stat.st_mtime_ns, stat.st_size, stat.st_ino
+            except OSError:
+                return None
+
+        def loop(current):
+            pending = None
+            while self._watching:
+                time.sleep(interval)
+                seen = signature()
+                if seen is None or seen == current:
+                    pending = None
+                elif seen != pending:
+                    pending = seen  # Changed; wait one more interval for it to settle
+                else:
+                    current, pending = seen, None
+                    self.reload(model_path)
+
+        self._watching = True
+        self._watch_thread = threading.Thread(target=loop, args=(signature(),), name="model-watch")
+        self._watch_thread.daemon = True
+        self._watch_thread.start()
+
+    def stop(self):
+        self._watching = False
+
+    def status(self):
+        with self._lock:
+            return {
+                "reloading": self._reloading,
+                "watching": self._watching,
+                "reloads": self.reloads,
+                "failures": self.failures,
+                "last_result": self.last_result
+            }
@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Multi-stream emotion recognition
+Serves many audio sources (microphones, files, network feeds) from one process and one model
+"""
+
+import sys
+import time
+import uuid
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from feature_engine import StreamingFeatureExtractor
+from ring_buffer import AudioRingBuffer
+from audio_decoding import pcm_to_float32
+from emotion_stats import summarize_emotions
+from metrics import Registry, StageTimer, serve_metrics
+from timeline_store import check_patient_id
+from startup import configure_numba_cache
+
+class AudioStream:
+    """
+    One attached source: a ring buffer, a streaming feature extractor and a
+    short result history; everything else is shared by the engine
+
+    Producers (an audio callback, a file reader, a network handler) call
+    write() with mono chunks; the engine analyses the stream whenever another
+    hop has arrived.
+    """
+
+    def __init__(self, engine, stream_id, sample_rate, patient_id=None):
+        self.engine = engine
+        self.id = stream_id
+        self.patient_id = patient_id  # Results go to this patient's timeline when the engine has one
+        self.sample_rate = int(sample_rate)
+        self.native_rate = self.sample_rate == engine.api.sample_rate
+        self.buffer_size = int(engine.buffer_duration * self.sample_rate)
+
+        # Hops are whole STFT frames at the native rate so frames can be reused
+        hop_size = max(1, int(round(engine.hop_duration * self.sample_rate)))
+        if self.native_rate:
+            frame_hop = engine.api.feature_engine.hop_length
+            hop_size = max(frame_hop, int(round(hop_size / frame_hop)) * frame_hop)
+        self.hop_size = hop_size
+
+        self.audio_buffer = AudioRingBuffer(self.buffer_size + self.hop_size
+                                            + int(engine.buffer_slack * self.sample_rate))
+        self.extractor = StreamingFeatureExtractor(engine.api.feature_engine) if self.native_rate else None
+        self.next_end = self.buffer_size  # Absolute sample at which the next window ends
+        self.source = None  # Device stream or reader thread feeding write(), if attached by the engine
+
+        # Results
+        self.emotion_history = deque(maxlen=20)
+        self.confidence_history = deque(maxlen=20)
+        self.latest = None
+        self.analyses = 0
+        self.skipped_windows = 0
+        self.no_speech_windows = 0
+        self.window_overruns = 0
+
+    def write(self, audio_chunk):
+        """Append mono samples (one producer per stream); integer PCM is scaled to [-1, 1]"""
+        self.audio_buffer.write(pcm_to_float32(audio_chunk))
+        if self.audio_buffer.samples_written >= self.next_end:
+            self.engine._wake.set()
+
+    def due_window(self):
+        """End of the freshest due window, skipping any the engine fell behind on; None if not due"""
+        written = self.audio_buffer.samples_written
+        if written < self.next_end:
+            return None
+        end = self.next_end + (written - self.next_end) // self.hop_size * self.hop_size
+        self.skipped_windows += (end - self.next_end) // self.hop_size
+        self.next_end = end + self.hop_size
+        return end
+
+    def get_emotion_stats(self, window_size=10):
+        """Get recent emotion statistics"""
+        return summarize_emotions(self.emotion_history, self.confidence_history, window_size)
+
+    def summary(self):
+        """JSON-friendly stream state"""
+        dominant, avg_confidence, distribution = self.get_emotion_stats()
+        return {
+            "stream_id": self.id,
+            "patient_id": self.patient_id,
+            "sample_rate": self.sample_rate,
+            "audio_seconds": self.audio_buffer.samples_written / self.sample_rate,
+            "latest": self.latest,
+            "dominant_emotion": dominant,
+            "average_confidence": float(avg_confidence),
+            "distribution": distribution,
+            "analyses": self.analyses,
+            "skipped_windows": self.skipped_windows,
+            "no_speech_windows": self.no_speech_windows,
+            "window_overruns": self.window_overruns
+        }
+
+class MultiStreamRecognizer:
+    """
+    Analyses many audio streams against one shared model
+
+    A single scheduler thread is woken whenever a stream has a new hop of
+    audio. It collects every stream with a due window, extracts their
+    features on a thread pool (per-stream streaming extractors sharing one
+    FeatureEngine's filter banks) and predicts all of them in one batched
+    scale/predict call, so model cost per hop grows far slower than the
+    number of streams. api is an EmotionAPI with a model loaded; its
+    voice-activity detector, if set, gates each window before extraction.
+
+    After waking, the scheduler waits batch_wait seconds so streams whose
+    hops land close together share a batch.
+
+    Extraction threads share the GIL: they overlap only while numpy, the
+    FFTs and numba kernels run with it released, and the Python glue between
+    those calls is serialized, so adding threads stops helping after a few
+    cores. Threads rather than worker processes because each stream's
+    streaming extractor keeps the previous window's STFT frames in this
+    process; a process per pass would have to ship every window and
+    recompute them. For more streams than one process can extract, run
+    several engines (or the API server with --workers).
+
+    callback(stream_id, emotion, confidence) is called for every result.
+    """
+
+    def __init__(self, api, buffer_duration=3.0, hop_duration=0.5, workers=None, callback=None,
+                 batch_wait=0.02, timeline=None):
+        self.api = api
+        self.timeline = timeline  # Optional TimelineStore for streams with a patient_id
+        self.buffer_duration = buffer_duration
+        self.hop_duration = hop_duration
+        self.batch_wait = batch_wait  # Seconds to let other streams' hops arrive before a pass
+        self.buffer_slack = 1.0  # Seconds a producer may run ahead of a window being analysed
+        self.callback = callback
+        self.streams = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stream-features")
+        self._thread = None
+        self.running = False
+
+        # Engine-wide metrics
+        self.metrics = Registry()
+        self.api.enable_metrics(StageTimer(self.metrics.histogram(
+            'multistream_stage_seconds', 'Time spent in each pipeline stage', ['stage'])))
+        self.batch_size = self.metrics.histogram(
+            'multistream_batch_size', 'Windows predicted together per scheduler pass',
+            buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+        self.pass_seconds = self.metrics.histogram(
+            'multistream_pass_seconds', 'Extraction plus batched prediction time per scheduler pass')
+        self.analyses = self.metrics.counter(
+            'multistream_analyses', 'Analysed windows by outcome', ['outcome'])
+        self.metrics.gauge('multistream_streams', 'Attached streams', callback=lambda: len(self.streams))
+        self.metrics.gauge('multistream_skipped_windows', 'Windows skipped because processing fell behind',
+                           callback=lambda: sum(s.skipped_windows for s in list(self.streams.values())))
+
+    def add_stream(self, stream_id=None, sample_rate=None, patient_id=None):
+        """Register a stream fed by the caller through AudioStream.write()"""
+        if patient_id is not None and self.timeline is not None:
+            check_patient_id(patient_id)
+        stream = AudioStream(self, stream_id or uuid.uuid4().hex[:8], sample_rate or self.api.sample_rate,
+                             patient_id)
+        with self._lock:
+            if stream.id in self.streams:
+                raise ValueError(f"Stream {stream.id} already exists")
+            self.streams[stream.id] = stream
+        return stream
+
+    def remove_stream(self, stream_id):
+        """Detach a stream, stopping its device or reader; returns it or None"""
+        with self._lock:
+            stream = self.streams.pop(stream_id, None)
+        if stream is not None and stream.source is not None and hasattr(stream.source, 'stop'):
+            stream.source.stop()
+            stream.source.close()
+        return stream
+
+    def attach_source(self, source, stream_id=None, patient_id=None):
+        """Feed a stream from an AudioSource
+
+        Live sources push into the stream from their own callback. Recorded
+        sources are read by a thread, paced at real time when source.realtime
+        is set; otherwise they are read as fast as the engine analyses them,
+        without skipping windows.
+        """
+        stream = self.add_stream(stream_id or source.describe(), source.sample_rate, patient_id)
+
+        if source.live:
+            def audio_callback(indata, frames, time_info, status):
+                stream.write(indata[:, 0] if indata.ndim > 1 else indata)
+
+            source.start(audio_callback)
+            stream.source = source
+            return stream
+
+        def feed():
+            start = time.perf_counter()
+            delivered = 0
+            try:
+                while self.running and stream.id in self.streams:
+                    size = source.blocksize
+                    if not source.realtime:
+                        # Unpaced replay stops at the next window end until the engine takes it
+                        size = min(size, stream.next_end - stream.audio_buffer.samples_written)
+                        if size <= 0:
+                            time.sleep(0.002)
+                            continue
+                    block = source.read(size)
+                    if len(block) == 0:
+                        break
+                    stream.write(block)
+                    delivered += len(block)
+                    if source.realtime:
+                        delay = start + delivered / source.sample_rate - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+            finally:
+                source.close()
+
+        stream.source = threading.Thread(target=feed, name=f"source-{stream.id}")
+        stream.source.daemon = True
+        if self.running:
+            stream.source.start()
+        return stream
+
+    def attach_device(self, device=None, stream_id=None, sample_rate=None, blocksize=1024, patient_id=None):
+        """Feed a stream from a sounddevice input device"""
+        from audio_sources import MicrophoneSource
+
+        source = MicrophoneSource(sample_rate or self.api.sample_rate, device=device, blocksize=blocksize)
+        return self.attach_source(source, stream_id or f"device-{device if device is not None else 'default'}",
+                                  patient_id)
+
+    def attach_file(self, path, stream_id=None, realtime=True, blocksize=1024, patient_id=None):
+        """Feed a stream from an audio file (paced at real time unless realtime=False)"""
+        from audio_sources import FileSource
+
+        return self.attach_source(FileSource(path, blocksize, realtime), stream_id or path, patient_id)
+
+    def start(self):
+        """Start the scheduler (and any file readers attached before it)"""
+        if self.api.bundle is None:
+            return False, "No model loaded"
+        self.running = True
+        self._thread = threading.Thread(target=self._loop, name="multistream-scheduler")
+        self._thread.daemon = True
+        self._thread.start()
+        for stream in list(self.streams.values()):
+            if isinstance(stream.source, threading.Thread) and not stream.source.is_alive():
+                stream.source.start()
+        return True, f"Serving {len(self.streams)} streams"
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+        for stream_id in list(self.streams):
+            source = self.streams[stream_id].source
+            if source is not None and hasattr(source, 'stop'):
+                source.stop()
+                source.close()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        self._pool.shutdown(wait=False)
+
+    def _loop(self):
+        """Wait for due windows, then analyse all of them as one pass"""
+        while self.running:
+            if not self._wake.wait(timeout=0.1):
+                continue
+            self._wake.clear()
+            if self.batch_wait:
+                time.sleep(self.batch_wait)
+            with self._lock:
+                streams = list(self.streams.values())
+            due = []
+            for stream in streams:
+                end = stream.due_window()
+                if end is not None:
+                    due.append((stream, end))
+            if due:
+                self._analyze(due)
+
+    def _extract(self, stream, end, bundle):
+        """Voice-activity check and features for one stream's window; (features, speech)"""
+        window = stream.audio_buffer.window(stream.buffer_size, end)
+        if self.api.check_speech(window, stream.sample_rate) is not None:
+            return None, False
+        try:
+            if stream.native_rate:
+                features = stream.extractor.extract(window, end - stream.buffer_size, stream.sample_rate,
+                                                    bundle.feature_plan)
+            else:
+                features = self.api.extract_features_from_array(window, stream.sample_rate,
+                                                                bundle.feature_plan)
+        except Exception as e:
+            print(f"Error extracting features for {stream.id}: {e}")
+            return None, True
+        # Drop results whose window the producer overwrote mid-analysis
+        if features and not stream.audio_buffer.is_intact(stream.buffer_size, end):
+            stream.window_overruns += 1
+            self.analyses.inc(outcome='overrun')
+            return None, True
+        return features, True
+
+    def _analyze(self, due):
+        """Extract due windows in parallel, then predict them as one batch"""
+        start = time.perf_counter()
+        # One bundle per pass: a reload mid-pass must not mix one model's features with another's
+        bundle = self.api.bundle
+        extracted = list(self._pool.map(lambda item: self._extract(*item, bundle), due))
+
+        ready = []
+        for (stream, end), (features, speech) in zip(due, extracted):
+            if features:
+                ready.append((stream, end, features))
+            elif not speech:
+                stream.no_speech_windows += 1
+                stream.latest = {"emotion": None, "confidence": 0.0, "speech": False,
+                                 "audio_time": end / stream.sample_rate}
+                self.analyses.inc(outcome='no_speech')
+            else:
+                self.analyses.inc(outcome='no_features')
+        if not ready:
+            return
+
+        predictions = self.api.predict_batch([features for _, _, features in ready], bundle)
+        if len(predictions) != len(ready):
+            predictions = [(None, 0.0)] * len(ready)
+        self.batch_size.observe(len(ready))
+        self.pass_seconds.observe(time.perf_counter() - start)
+
+        for (stream, end, _), (emotion, confidence) in zip(ready, predictions):
+            if emotion is None:
+                self.analyses.inc(outcome='prediction_failed')
+                continue
+            self.analyses.inc(outcome='success')
+            stream.analyses += 1
+            stream.emotion_history.append(emotion)
+            stream.confidence_history.append(confidence)
+            stream.latest = {"emotion": str(emotion), "confidence": float(confidence), "speech": True,
+                             "audio_time": end / stream.sample_rate}
+            if self.timeline is not None and stream.patient_id is not None:
+                try:
+                    self.timeline.append(stream.patient_id, emotion, float(confidence))
+                except Exception as e:
+                    print(f"Timeline error: {e}")
+            if self.callback:
+                try:
+                    self.callback(stream.id, emotion, confidence)
+                except Exception as e:
+                    print(f"Callback error: {e}")
+
+    def get_emotion_stats(self, stream_id, window_size=10):
+        """Recent emotion statistics for one stream"""
+        return self.streams[stream_id].get_emotion_stats(window_size)
+
+    def stats(self):
+        """Per-stream summaries"""
+        with self._lock:
+            streams = list(self.streams.values())
+        return {stream.id: stream.summary() for stream in streams}
+
+def main():
+    """Monitor several microphones and/or files with one model"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Recognize emotions on many audio streams with one model')
+    parser.add_argument('--model-path', type=str, default='emotion_model.joblib',
+                       help='Path to trained model file')
+    parser.add_argument('--device', action='append', default=[],
+                       help='Input device index or name to monitor, optionally as DEVICE=PATIENT_ID '
+                            '(repeatable)')
+    parser.add_argument('--file', action='append', default=[],
+                       help='Audio file to replay as a stream, optionally as PATH=PATIENT_ID (repeatable)')
+    parser.add_argument('--timeline-dir', type=str, default='emotion_timelines',
+                       help='Where timelines of sources given a PATIENT_ID are stored (default: emotion_timelines)')
+    parser.add_argument('--fast', action='store_true',
+                       help='Replay files as fast as they can be analysed instead of in real time')
+    parser.add_argument('--buffer-duration', type=float, default=3.0,
+                       help='Audio buffer duration in seconds (default: 3.0)')
+    parser.add_argument('--update-rate', type=float, default=0.5,
+                       help='Analysis update rate in seconds (default: 0.5)')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Feature extraction threads (default: Python\'s thread pool default)')
+    parser.add_argument('--batch-wait-ms', type=float, default=20,
+                       help='Wait this long after the first due stream so others join its batch (default: 20)')
+    parser.add_argument('--no-vad', action='store_true',
+                       help='Analyse every window, even silence and background noise')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                       help='Serve Prometheus metrics on this port (default: disabled)')
+    parser.add_argument('--numba-cache-dir', type=str, default=None,
+                       help='Where compiled numba functions are cached across runs '
+                            '(default: NUMBA_CACHE_DIR or ~/.cache/caregiver-emotion/numba)')
+    args = parser.parse_args()
+    configure_numba_cache(args.numba_cache_dir)
+
+    if not args.device and not args.file:
+        print("❌ Give at least one --device or --file")
+        return False
+
+    from emotion_api import EmotionAPI
+    from vad import VoiceActivityDetector
+
+    api = EmotionAPI()
+    success, message = api.load_model(args.model_path)
+    if not success:
+        print(f"❌ {message}")
+        return False
+    if not args.no_vad:
+        api.vad = VoiceActivityDetector()
+    warm_ok, warm_message, _ = api.warm_up()
+    print(f"{'🔥' if warm_ok else '⚠️ '} {warm_message}")
+
+    def report(stream_id, emotion, confidence):
+        print(f"🎭 [{stream_id}] {emotion} ({confidence:.1%})")
+
+    timeline = None
+    if any('=' in source for source in args.device + args.file):
+        from timeline_store import TimelineStore
+        timeline = TimelineStore(args.timeline_dir)
+    engine = MultiStreamRecognizer(api, args.buffer_duration, args.update_rate, args.workers, report,
+                                   batch_wait=args.batch_wait_ms / 1000.0, timeline=timeline)
+    try:
+        for source in args.device:
+            device, _, patient_id = source.partition('=')
+            stream = engine.attach_device(int(device) if device.isdigit() else device,
+                                          patient_id=patient_id or None)
+            print(f"🎤 {stream.id} attached")
+        for source in args.file:
+            path, _, patient_id = source.rpartition('=') if '=' in source else (source, '', '')
+            stream = engine.attach_file(path, realtime=not args.fast, patient_id=patient_id or None)
+            print(f"📼 {stream.id} attached ({stream.sample_rate} Hz)")
+    except Exception as e:
+        print(f"❌ Error attaching source: {e}")
+        engine.stop()
+        return False
+
+    if args.metrics_port:
+        serve_metrics(engine.metrics, args.metrics_port)
+        print(f"📈 Metrics on http://localhost:{args.metrics_port}/metrics")
+
+    ok, message = engine.start()
+    print(f"{'✅' if ok else '❌'} {message}")
+    if not ok:
+        return False
+    try:
+        while any(stream.source is None or not isinstance(stream.source, threading.Thread)
+                  or stream.source.is_alive() for stream in engine.streams.values()):
+            time.sleep(0.5)
+        time.sleep(engine.hop_duration * 2)  # Let the last windows of finished files through
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping...")
+    finally:
+        engine.stop()
+
+    for stream_id, summary in engine.stats().items():
+        print(f"📊 {stream_id}: {summary['dominant_emotion']} dominant, {summary['analyses']} analyses, "
+              f"{summary['skipped_windows']} skipped, {summary['no_speech_windows']} without speech")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
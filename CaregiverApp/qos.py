@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Adaptive quality of service for rolling emotion analysis
+Lengthens the hop and falls back to a cheaper feature tier when analyses overrun their time budget
+"""
+
+import threading
+
+FULL_TIER = 'full'
+LITE_TIER = 'lite'
+
+def default_levels(has_lite=False, max_hop_factor=4):
+    """Quality levels from best to cheapest, as (hop_factor, tier) pairs
+
+    The hop is doubled first; with a lite model (one trained without the
+    expensive feature families) the remaining levels also switch to its tier.
+    """
+    factors = [1]
+    while factors[-1] * 2 <= max_hop_factor:
+        factors.append(factors[-1] * 2)
+    if not has_lite:
+        return [(factor, FULL_TIER) for factor in factors]
+    return [(factor, FULL_TIER) for factor in factors[:2]] + [(factor, LITE_TIER) for factor in factors[1:]]
+
+def check_lite_tier(bundle, full_plan, full_classes):
+    """Whether a loaded ModelBundle can stand in for the full model as its lite tier
+
+    It must predict the same labels from a strict subset of the full model's
+    feature families. Returns (ok, message).
+    """
+    if set(map(str, bundle.model.classes_)) != set(map(str, full_classes)):
+        return False, "lite model predicts different labels than the full model"
+    families, full_families = bundle.feature_plan.families, full_plan.families
+    if not families < full_families:
+        return False, "lite model must use fewer feature families than the full model"
+    return True, f"lite tier drops {', '.join(sorted(full_families - families))}"
+
+class QualityController:
+    """
+    Picks a quality level from measured per-analysis compute time
+
+    Each analysis reports its compute time and the hop it ran at; load is the
+    smoothed compute time divided by that hop (1.0 means analyses take the
+    whole interval between them). After `patience` analyses above high_water
+    the controller steps down one level. It steps back up after `recovery`
+    analyses whose load, scaled to the level above, would stay below
+    low_water. When a step down also switches to a cheaper tier, how much
+    more the level above costs is measured at that moment (before and after,
+    under the same CPU pressure), so the headroom the cheaper tier creates is
+    not mistaken for spare CPU. A step that only lengthens the hop leaves the
+    cost of one analysis unchanged and is not measured, since any change in
+    compute time across it is the machine's load changing.
+
+    Thread-safe; one controller can be shared by every stream on a machine.
+    """
+
+    def __init__(self, levels=None, high_water=0.8, low_water=0.4, smoothing=0.3, patience=3, recovery=10):
+        self.levels = list(levels or default_levels())
+        self.high_water = high_water
+        self.low_water = low_water
+        self.smoothing = smoothing
+        self.patience = patience
+        self.recovery = recovery
+        self._lock = threading.Lock()
+        self.level = 0
+        self.load = 0.0
+        self._cost = None  # Smoothed compute seconds at the current level
+        self._samples = 0  # Analyses at the current level
+        self._step_cost = {}  # Cost of each level relative to the one below it
+        self._left = None  # (level, cost) when stepping down, until the new level's cost settles
+        self._over = 0
+        self._under = 0
+
+        # Stats
+        self.observed = 0
+        self.degraded = 0
+        self.restored = 0
+
+    @property
+    def hop_factor(self):
+        return self.levels[self.level][0]
+
+    @property
+    def tier(self):
+        return self.levels[self.level][1]
+
+    def set_levels(self, levels):
+        """Replace the level ladder (e.g. once a lite model is loaded), keeping the current hop factor"""
+        with self._lock:
+            factor = self.hop_factor
+            self.levels = list(levels)
+            self.level = min(self.level, len(self.levels) - 1)
+            while self.level > 0 and self.levels[self.level][0] > factor:
+                self.level -= 1
+            self._cost = None
+            self._samples = 0
+            self._step_cost, self._left = {}, None
+            self._over = self._under = 0
+
+    def observe(self, compute_seconds, hop_seconds):
+        """Record one analysis; returns True when the level changed"""
+        with self._lock:
+            self.observed += 1
+            self._samples += 1
+            if self._cost is None:
+                self._cost = compute_seconds
+            else:
+                self._cost += self.smoothing * (compute_seconds - self._cost)
+            if self._samples == self.patience and self._left is not None:
+                level, cost = self._left
+                self._step_cost[level] = max(1.0, cost / self._cost) if self._cost > 0 else 1.0
+                self._left = None
+            self.load = self._cost / hop_seconds if hop_seconds > 0 else 0.0
+
+            if self.load > self.high_water and self.level < len(self.levels) - 1:
+                self._under = 0
+                self._over += 1
+                if self._over >= self.patience:
+                    return self._move(+1)
+                return False
+            self._over = 0
+
+            if self.level > 0:
+                up_factor, _ = self.levels[self.level - 1]
+                relative_cost = self._step_cost.get(self.level - 1, 1.0)
+                projected = self.load * relative_cost * self.hop_factor / up_factor
+                if projected < self.low_water:
+                    self._under += 1
+                    if self._under >= self.recovery:
+                        return self._move(-1)
+                    return False
+            self._under = 0
+            return False
+
+    def _move(self, step):
+        """Change level (call with the lock held)"""
+        if step > 0:
+            changes_tier = self.levels[self.level + 1][1] != self.tier
+            self._left = (self.level, self._cost) if changes_tier else None
+            self.degraded += 1
+        else:
+            self._left = None
+            self.restored += 1
+        self.level += step
+        # The new level's first measurement starts a fresh average
+        self._cost = None
+        self._samples = 0
+        self._over = self._under = 0
+        return True
+
+    def mode(self):
+        """The current level, for results"""
+        return {"level": self.level, "hop_factor": self.hop_factor, "tier": self.tier, "degraded": self.level > 0}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "level": self.level,
+                "hop_factor": self.hop_factor,
+                "tier": self.tier,
+                "degraded": self.level > 0,
+                "load": round(self.load, 4),
+                "high_water": self.high_water,
+                "low_water": self.low_water,
+                "levels": [{"hop_factor": factor, "tier": tier} for factor, tier in self.levels],
+                "observed": self.observed,
+                "degraded_count": self.degraded,
+                "restored_count": self.restored
+            }
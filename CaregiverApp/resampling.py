@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Polyphase resampling to the model's native sample rate
+Anti-aliasing filters are designed once per rate pair and reused
+"""
+
+import time
+import threading
+from math import gcd
+import numpy as np
+from startup import lazy_import
+
+signal = lazy_import('scipy.signal')
+
+class Resampler:
+    """
+    Converts clips to target_rate with scipy's polyphase resampler
+
+    The FIR filter for each (source, target) pair is designed on first use
+    and cached, so steady traffic at a handful of client rates (8/16/44.1/48
+    kHz) only pays for the filtering itself. The filter matches
+    resample_poly's default Kaiser design.
+    """
+
+    def __init__(self, target_rate=22050, max_filters=16):
+        self.target_rate = int(target_rate)
+        self.max_filters = max_filters
+
+        self._filters = {}  # (source_rate, target_rate) -> (up, down, taps)
+        self._lock = threading.Lock()
+
+        # Stats
+        self.resampled = 0
+        self.passthrough = 0
+        self.filter_hits = 0
+        self.filter_misses = 0
+        self.total_time = 0.0
+        self.total_samples = 0
+
+    def _filter(self, source_rate):
+        """Cached (up, down, taps) for source_rate -> target_rate"""
+        pair = (source_rate, self.target_rate)
+        with self._lock:
+            design = self._filters.get(pair)
+            if design is not None:
+                self.filter_hits += 1
+                return design
+            self.filter_misses += 1
+
+        divisor = gcd(source_rate, self.target_rate)
+        up, down = self.target_rate // divisor, source_rate // divisor
+        max_rate = max(up, down)
+        taps = signal.firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+        design = (up, down, taps)
+
+        with self._lock:
+            if len(self._filters) >= self.max_filters:
+                self._filters.pop(next(iter(self._filters)))
+            self._filters[pair] = design
+        return design
+
+    def resample(self, audio_data, source_rate):
+        """Return audio_data at target_rate (unchanged if it already is)"""
+        source_rate = int(source_rate)
+        if source_rate <= 0:
+            raise ValueError(f"Invalid sample rate {source_rate}")
+        if source_rate == self.target_rate:
+            with self._lock:
+                self.passthrough += 1
+            return audio_data
+
+        start = time.perf_counter()
+        up, down, taps = self._filter(source_rate)
+        audio = np.asarray(audio_data, dtype=np.float32)
+        resampled = signal.resample_poly(audio, up, down, window=taps).astype(np.float32)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.resampled += 1
+            self.total_time += elapsed
+            self.total_samples += len(audio)
+        return resampled
+
+    def stats(self):
+        """Resampling cost and filter cache counters"""
+        with self._lock:
+            return {
+                "target_rate": self.target_rate,
+                "resampled": self.resampled,
+                "passthrough": self.passthrough,
+                "filters_cached": len(self._filters),
+                "filter_hits": self.filter_hits,
+                "filter_misses": self.filter_misses,
+                "total_ms": 1000 * self.total_time,
+                "mean_ms": 1000 * self.total_time / self.resampled if self.resampled else 0.0,
+                "input_samples_per_second": (self.total_samples / self.total_time
+                                             if self.total_time else 0.0)
+            }
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Shared-memory result bus
+The local recognizer publishes its latest result into a fixed-layout mmap file that other processes read lock-free
+"""
+
+import os
+import mmap
+import time
+import tempfile
+import numpy as np
+
+MAGIC = 0x45424c56  # "VLBE"
+LAYOUT_VERSION = 1
+MAX_LABELS = 16
+DEFAULT_BUS_PATH = os.path.join(tempfile.gettempdir(), 'caregiver-emotion-live.bin')
+
+# The whole segment; seq is the seqlock counter (odd while a write is in progress)
+LIVE_DTYPE = np.dtype([
+    ('magic', '<u4'),
+    ('layout', '<u4'),
+    ('seq', '<u8'),
+    ('writer_pid', '<u4'),
+    ('n_labels', '<u4'),
+    ('results', '<u8'),                         # Results published since the writer started
+    ('published_at', '<f8'),                    # Unix time of the last publish
+    ('captured_at', '<f8'),                     # Unix time of the window's last sample
+    ('audio_time', '<f8'),                      # Seconds of audio into the stream
+    ('window_seconds', '<f4'),
+    ('confidence', '<f4'),
+    ('speech', 'u1'),
+    ('provisional', 'u1'),
+    ('emotion', 'S32'),
+    ('labels', 'S32', (MAX_LABELS,)),
+    ('probabilities', '<f4', (MAX_LABELS,)),    # By label
+    ('dominant', 'S32'),                        # get_emotion_stats() over the recent history
+    ('average_confidence', '<f4'),
+    ('distribution', '<f4', (MAX_LABELS,)),     # Percent by label
+    ('history', '<u4')                          # Results the stats were computed from
+], align=True)
+
+class ResultBusWriter:
+    """
+    Single-writer end of the bus
+
+    publish() bumps seq to an odd value, overwrites the record in place and
+    bumps it back to even, so a publish costs a few hundred bytes of memory
+    writes and never waits for readers. The file is reused, never replaced,
+    so readers keep their mapping across recognizer restarts.
+    """
+
+    def __init__(self, path=DEFAULT_BUS_PATH):
+        self.path = path
+        self.labels = []
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != LIVE_DTYPE.itemsize:
+                os.ftruncate(fd, LIVE_DTYPE.itemsize)
+            self._mmap = mmap.mmap(fd, LIVE_DTYPE.itemsize)
+        finally:
+            os.close(fd)
+        self._record = np.ndarray((1,), dtype=LIVE_DTYPE, buffer=self._mmap)
+
+        seq = int(self._record['seq'][0])
+        self._begin(seq + (seq & 1))  # Left odd by a writer that died mid-publish
+        self._record['magic'] = MAGIC
+        self._record['layout'] = LAYOUT_VERSION
+        self._record['writer_pid'] = os.getpid()
+        self._record['results'] = 0
+        self._end()
+
+    def _begin(self, seq=None):
+        seq = int(self._record['seq'][0]) if seq is None else seq
+        self._record['seq'] = seq + 1
+
+    def _end(self):
+        self._record['seq'] = int(self._record['seq'][0]) + 1
+
+    def set_labels(self, labels):
+        """Label order for probabilities and distribution (the model's classes)"""
+        self.labels = [str(label) for label in labels][:MAX_LABELS]
+        self._begin()
+        self._record['labels'] = [label.encode()[:32] for label in self.labels] + \
+                                 [b''] * (MAX_LABELS - len(self.labels))
+        self._record['n_labels'] = len(self.labels)
+        self._end()
+
+    def publish(self, result, probabilities=None, stats=None, history=0):
+        """Overwrite the live record with a recognizer result
+
+        result is a latest_result-style dict, probabilities a {label: p} dict
+        and stats a (dominant, average_confidence, distribution) tuple from
+        get_emotion_stats() over `history` results.
+        """
+        probability_row = np.zeros(MAX_LABELS, dtype=np.float32)
+        distribution_row = np.zeros(MAX_LABELS, dtype=np.float32)
+        for i, label in enumerate(self.labels):
+            if probabilities:
+                probability_row[i] = probabilities.get(label, 0.0)
+            if stats:
+                distribution_row[i] = stats[2].get(label, 0.0)
+
+        record = self._record
+        self._begin()
+        record['published_at'] = time.time()
+        record['captured_at'] = result.get("captured_at", 0.0)
+        record['audio_time'] = result.get("audio_time", 0.0)
+        record['window_seconds'] = result.get("window_seconds", 0.0)
+        record['confidence'] = result.get("confidence", 0.0)
+        record['speech'] = result.get("speech", True)
+        record['provisional'] = result.get("provisional", False)
+        record['emotion'] = str(result.get("emotion") or '').encode()[:32]
+        record['probabilities'] = probability_row
+        record['dominant'] = str(stats[0]).encode()[:32] if stats else b''
+        record['average_confidence'] = float(stats[1]) if stats else 0.0
+        record['distribution'] = distribution_row
+        record['history'] = history
+        record['results'] = int(record['results'][0]) + 1
+        self._end()
+
+    def close(self):
+        self._record = None
+        self._mmap.close()
+
+class ResultBusReader:
+    """
+    Lock-free reader for the bus
+
+    read() copies the record between two reads of seq and retries if a
+    publish overlapped; readers never block the writer or each other.
+    """
+
+    def __init__(self, path=DEFAULT_BUS_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), LIVE_DTYPE.itemsize, access=mmap.ACCESS_READ)
+        self._record = np.ndarray((1,), dtype=LIVE_DTYPE, buffer=self._mmap)
+        self.retries = 0
+
+    def read_record(self, attempts=1000):
+        """A consistent copy of the raw record, or None if the writer never finished a publish"""
+        seq_view = self._record['seq']
+        for _ in range(attempts):
+            before = int(seq_view[0])
+            if before & 1:
+                self.retries += 1
+                continue
+            record = self._record[0].copy()
+            if int(seq_view[0]) == before:
+                if record['magic'] != MAGIC or record['layout'] != LAYOUT_VERSION or not record['results']:
+                    return None
+                return record
+            self.retries += 1
+        return None
+
+    def read(self):
+        """The latest result as a JSON-friendly dict, or None if nothing has been published"""
+        record = self.read_record()
+        if record is None:
+            return None
+        n = int(record['n_labels'])
+        f32 = lambda value: round(float(value), 6)  # Drop float32 noise like 0.4000000059
+        labels = [label.decode() for label in record['labels'][:n]]
+        now = time.time()
+        return {
+            "emotion": record['emotion'].decode() or None,
+            "confidence": f32(record['confidence']),
+            "speech": bool(record['speech']),
+            "provisional": bool(record['provisional']),
+            "captured_at": float(record['captured_at']),
+            "published_at": float(record['published_at']),
+            "age_seconds": max(0.0, now - float(record['published_at'])),
+            "audio_time": float(record['audio_time']),
+            "window_seconds": f32(record['window_seconds']),
+            "probabilities": {label: f32(p) for label, p in zip(labels, record['probabilities'][:n])},
+            "stats": {
+                "dominant_emotion": record['dominant'].decode(),
+                "average_confidence": f32(record['average_confidence']),
+                "distribution": {label: f32(p) for label, p in zip(labels, record['distribution'][:n]) if p},
+                "history": int(record['history'])
+            },
+            "results": int(record['results']),
+            "writer_pid": int(record['writer_pid'])
+        }
+
+    def close(self):
+        self._record = None
+        self._mmap.close()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Content-addressed result cache for the Emotion Detection API
+Retries and resubmissions of the same clip skip feature extraction entirely
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+def clip_key(audio_data, sample_rate, model_version):
+    """Hash of the decoded samples, sample rate and model version"""
+    samples = np.ascontiguousarray(audio_data)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{samples.dtype.str}|{sample_rate}|{model_version}|".encode())
+    digest.update(samples.view(np.uint8).data)
+    return digest.hexdigest()
+
+def file_version(path):
+    """Content hash of a model file, used as its version"""
+    digest = hashlib.blake2b(digest_size=8)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    LRU + TTL cache of prediction results, with an optional on-disk tier
+
+    Keys already include the model version, so results from an old model can
+    never be served; invalidate() just frees the memory they used. Disk
+    entries are one small JSON file each and are pruned oldest-first once
+    max_disk_entries is exceeded.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300, disk_dir=None, max_disk_entries=10000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+
+        self._entries = OrderedDict()  # key -> (result, expires_at)
+        self._lock = threading.Lock()
+        self._disk_count = 0
+
+        # Stats
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_count = sum(1 for name in os.listdir(disk_dir) if name.endswith('.json'))
+
+    def get(self, key):
+        """Cached result dict for a key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self._entries[key]
+                self.expirations += 1
+
+        result = self._disk_get(key, now)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._remember(key, result, now + self.ttl)
+        return result
+
+    def put(self, key, result):
+        """Cache a successful result"""
+        expires_at = time.time() + self.ttl
+        self._remember(key, result, expires_at)
+        self._disk_put(key, result, expires_at)
+
+    def _remember(self, key, result, expires_at):
+        with self._lock:
+            self._entries[key] = (result, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop every in-memory entry (called when the model is swapped)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_get(self, key, now):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("expires_at", 0) <= now:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+            return None
+        return entry.get("result")
+
+    def _disk_put(self, key, result, expires_at):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            existed = os.path.exists(path)
+            with open(tmp_path, 'w') as f:
+                json.dump({"expires_at": expires_at, "result": result}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Result cache disk write failed: {e}")
+            return
+
+        with self._lock:
+            if not existed:
+                self._disk_count += 1
+            prune = self._disk_count > self.max_disk_entries
+        if prune:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Remove the oldest disk entries down to 90% of the limit"""
+        try:
+            entries = [e for e in os.scandir(self.disk_dir) if e.name.endswith('.json')]
+            entries.sort(key=lambda e: e.stat().st_mtime)
+            excess = len(entries) - int(self.max_disk_entries * 0.9)
+            for entry in entries[:max(0, excess)]:
+                os.remove(entry.path)
+            with self._lock:
+                self._disk_count = len(entries) - max(0, excess)
+        except OSError as e:
+            print(f"Result cache disk prune failed: {e}")
+
+    def stats(self):
+        """Hit/miss counters and sizes"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "disk_entries": self._disk_count if self.disk_dir else None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
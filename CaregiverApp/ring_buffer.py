@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Preallocated audio ring buffer for the real-time audio path
+Single producer (the sounddevice callback), single consumer (the processing loop)
+"""
+
+import numpy as np
+
+class AudioRingBuffer:
+    """
+    Lock-free single-producer/single-consumer ring buffer of audio samples
+
+    Every sample is stored twice, at i and i + capacity, so the most recent
+    n <= capacity samples are always one contiguous slice and window() can
+    return a view without copying. The producer fills the slots first and only
+    then publishes the new write position, so the consumer never sees samples
+    that haven't been written yet.
+
+    A window stays valid until the producer has written another
+    capacity - n samples; use is_intact() after reading to detect overruns.
+    """
+
+    def __init__(self, capacity, dtype=np.float32):
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        self._data = np.zeros(2 * self.capacity, dtype=self.dtype)
+        self._write_pos = 0
+
+    def __len__(self):
+        """Number of samples currently held"""
+        return min(self._write_pos, self.capacity)
+
+    @property
+    def samples_written(self):
+        """Total samples written since creation (absolute stream position)"""
+        return self._write_pos
+
+    def write(self, samples):
+        """Append samples (producer side only)"""
+        samples = np.asarray(samples)
+        total = len(samples)
+        if total == 0:
+            return
+        if total > self.capacity:
+            samples = samples[-self.capacity:]
+
+        n = len(samples)
+        pos = (self._write_pos + total - n) % self.capacity
+        first = min(n, self.capacity - pos)
+        rest = n - first
+
+        data = self._data
+        data[pos:pos + first] = samples[:first]
+        data[pos + self.capacity:pos + self.capacity + first] = samples[:first]
+        if rest:
+            data[:rest] = samples[first:]
+            data[self.capacity:self.capacity + rest] = samples[first:]
+
+        # Publish only after the samples are in place
+        self._write_pos += total
+
+    def window(self, n, end=None):
+        """Zero-copy view of the n samples ending at absolute position `end` (default: latest)"""
+        if end is None:
+            end = self._write_pos
+        start = end - n
+        if n > self.capacity or start < 0 or end > self._write_pos:
+            raise ValueError(f"Window [{start}, {end}) is not available")
+        if self._write_pos - start > self.capacity:
+            raise ValueError(f"Window [{start}, {end}) has already been overwritten")
+
+        offset = start % self.capacity
+        return self._data[offset:offset + n]
+
+    def is_intact(self, n, end):
+        """Whether the window of n samples ending at `end` hasn't been overwritten since"""
+        return self._write_pos - (end - n) <= self.capacity
+
+    def clear(self):
+        """Forget all samples (only while the producer is stopped)"""
+        self._write_pos = 0
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Server-side streaming sessions for the Emotion Detection API
+Mirrors SimpleEmotionRecognizer's rolling analysis for audio pushed in chunks
+"""
+
+import time
+import uuid
+import threading
+from collections import deque
+from feature_engine import StreamingFeatureExtractor
+from audio_decoding import pcm_to_float32
+from ring_buffer import AudioRingBuffer
+from emotion_stats import summarize_emotions
+
+class SessionLimitReached(Exception):
+    """Raised when the server already holds max_sessions sessions"""
+
+class StreamSession:
+    """
+    One client's audio stream: a ring buffer, an incremental feature
+    extractor and the same rolling history SimpleEmotionRecognizer keeps
+
+    An analysis runs each time another hop of audio has arrived, on the
+    latest buffer_duration window, so clients only upload each sample once.
+    Streams at the model's native rate reuse STFT frames between hops; other
+    rates resample each window and extract it in full. When the API has a
+    QualityController, its current level stretches the hop and may switch the
+    analysis to the lite model.
+    """
+
+    def __init__(self, api, sample_rate=22050, buffer_duration=3.0, hop_duration=0.5,
+                 max_hops_per_push=8, patient_id=None, timeline=None):
+        self.id = uuid.uuid4().hex
+        self.api = api
+        self.patient_id = patient_id
+        self.timeline = timeline if patient_id else None  # Optional TimelineStore for this patient's results
+        self.sample_rate = int(sample_rate)
+        self.buffer_size = int(buffer_duration * self.sample_rate)
+
+        # Hops are whole STFT frames so the extractor can reuse earlier frames
+        frame_hop = api.feature_engine.hop_length
+        self.hop_size = max(frame_hop, int(round(hop_duration * self.sample_rate / frame_hop)) * frame_hop)
+        self.max_hops_per_push = max_hops_per_push
+
+        self.audio_buffer = AudioRingBuffer(self.buffer_size + self.hop_size * max_hops_per_push)
+        self.extractor = StreamingFeatureExtractor(api.feature_engine)
+        self.native_rate = self.sample_rate == api.sample_rate
+        self.next_analysis = self.buffer_size  # Absolute sample at which the next window ends
+        self.skipped_hops = 0
+        self.no_speech_hops = 0
+
+        # Results
+        self.emotion_history = deque(maxlen=20)
+        self.confidence_history = deque(maxlen=20)
+        self.latest = None
+
+        self.created = time.time()
+        self.last_active = self.created
+        self.lock = threading.Lock()
+
+    @property
+    def hop_duration(self):
+        return self.hop_size / self.sample_rate
+
+    def _current_hop(self):
+        """hop_size stretched by the API's QoS level"""
+        qos = self.api.qos
+        return self.hop_size * qos.hop_factor if qos is not None else self.hop_size
+
+    def push(self, audio_data):
+        """Append a chunk and analyse every hop it completes; returns the new results
+
+        Integer PCM chunks are scaled to [-1, 1] first, so they are gated and
+        classified like the same audio sent as floats.
+        """
+        with self.lock:
+            self.last_active = time.time()
+            self.audio_buffer.write(pcm_to_float32(audio_data))
+            written = self.audio_buffer.samples_written
+
+            # A big catch-up chunk only analyses the most recent hops (which
+            # must still be in the ring when the hop is stretched)
+            hop = self._current_hop()
+            max_hops = max(1, self.max_hops_per_push * self.hop_size // hop)
+            pending = (written - self.next_analysis) // hop + 1
+            if pending > max_hops:
+                skip = pending - max_hops
+                self.next_analysis += skip * hop
+                self.skipped_hops += skip
+
+            results = []
+            while self.next_analysis <= written:
+                end = self.next_analysis
+                self.next_analysis += hop
+                result = self._analyze(end, hop)
+                if result:
+                    results.append(result)
+            return results
+
+    def _analyze(self, end, hop):
+        """Extract features for the window ending at `end` and predict
+
+        Windows the voice-activity detector rejects are reported as "no speech"
+        and kept out of the emotion history.
+        """
+        bundle, tier = self.api.session_tier()
+        start = time.perf_counter()
+        try:
+            window = self.audio_buffer.window(self.buffer_size, end)
+            if self.api.check_speech(window, self.sample_rate) is not None:
+                self.no_speech_hops += 1
+                self.latest = {
+                    "emotion": None,
+                    "confidence": 0.0,
+                    "speech": False,
+                    "audio_time": end / self.sample_rate
+                }
+                return self.latest
+            if self.native_rate:
+                features = self.extractor.extract(window, end - self.buffer_size, self.sample_rate,
+                                                  bundle.feature_plan)
+            else:
+                features = self.api.extract_features_from_array(window, self.sample_rate, bundle.feature_plan)
+        except Exception as e:
+            print(f"Error extracting features: {e}")
+            return None
+        if not features:
+            return None
+
+        emotion, confidence = self.api.predict_emotion(features, bundle)
+        if not emotion:
+            return None
+        if self.api.qos is not None:
+            self.api.qos.observe(time.perf_counter() - start, hop / self.sample_rate)
+
+        self.emotion_history.append(emotion)
+        self.confidence_history.append(confidence)
+        if self.timeline is not None:
+            try:
+                self.timeline.append(self.patient_id, emotion, float(confidence))
+            except Exception as e:
+                print(f"Timeline error: {e}")
+        self.latest = {
+            "emotion": emotion,
+            "confidence": float(confidence),
+            "speech": True,
+            "audio_time": end / self.sample_rate,
+            "tier": tier,
+            "hop_duration": hop / self.sample_rate
+        }
+        return self.latest
+
+    def get_emotion_stats(self, window_size=10):
+        """Get recent emotion statistics"""
+        return summarize_emotions(self.emotion_history, self.confidence_history, window_size)
+
+    def summary(self):
+        """JSON-friendly session state"""
+        dominant, avg_confidence, distribution = self.get_emotion_stats()
+        return {
+            "session_id": self.id,
+            "patient_id": self.patient_id,
+            "sample_rate": self.sample_rate,
+            "hop_duration": self.hop_duration,
+            "buffer_duration": self.buffer_size / self.sample_rate,
+            "audio_seconds": self.audio_buffer.samples_written / self.sample_rate,
+            "latest": self.latest,
+            "dominant_emotion": dominant,
+            "average_confidence": float(avg_confidence),
+            "distribution": distribution,
+            "skipped_hops": self.skipped_hops,
+            "no_speech_hops": self.no_speech_hops,
+            "quality": self.api.qos.mode() if self.api.qos is not None else None
+        }
+
+class SessionManager:
+    """
+    Holds live StreamSessions and evicts those idle for longer than idle_timeout
+    """
+
+    def __init__(self, api, idle_timeout=120, max_sessions=100, sweep_interval=5.0, timeline=None):
+        self.api = api
+        self.timeline = timeline  # Optional TimelineStore; sessions with a patient_id record into it
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.evicted = 0
+
+    def _sweep(self, now):
+        """Drop idle sessions (call with the lock held)"""
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        idle = [sid for sid, session in self._sessions.items()
+                if now - session.last_active > self.idle_timeout]
+        for sid in idle:
+            del self._sessions[sid]
+        self.evicted += len(idle)
+
+    def create(self, **kwargs):
+        """Open a new session"""
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            if len(self._sessions) >= self.max_sessions:
+                raise SessionLimitReached(f"{self.max_sessions} sessions already open")
+            session = StreamSession(self.api, timeline=self.timeline, **kwargs)
+            self._sessions[session.id] = session
+            return session
+
+    def get(self, session_id):
+        """Look up a live session, or None"""
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            return self._sessions.get(session_id)
+
+    def close(self, session_id):
+        """Close a session; returns it, or None if it didn't exist"""
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "idle_timeout": self.idle_timeout,
+                "evicted": self.evicted
+            }
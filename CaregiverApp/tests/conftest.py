@@ -0,0 +1,45 @@
+"""Shared fixtures for the CaregiverApp Python tests"""
+
+import os
+import sys
+import wave
+import numpy as np
+import pytest
+
+# The app's modules are flat files next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE_RATE = 22050
+
+def write_wav(path, audio, sample_rate=SAMPLE_RATE):
+    """Write a mono float array as 16-bit PCM WAV"""
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype('<i2')
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return str(path)
+
+def tone(seconds, freq=220.0, level=0.3, sample_rate=SAMPLE_RATE):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (level * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+@pytest.fixture(scope='session')
+def model_path(tmp_path_factory):
+    """A small random-forest model bundle over the full feature set"""
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+    from feature_engine import FeatureEngine
+
+    names = sorted(FeatureEngine(sample_rate=SAMPLE_RATE).extract(tone(1.0), SAMPLE_RATE))
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((40, len(names)))
+    y = np.array(['angry', 'happy', 'neutral', 'sad'] * 10)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(scaler.transform(X), y)
+    path = tmp_path_factory.mktemp('model') / 'model.joblib'
+    joblib.dump({'model': model, 'scaler': scaler, 'feature_names': names,
+                 'emotion_labels': sorted(set(y)), 'sample_rate': SAMPLE_RATE}, path)
+    return str(path)
@@ -0,0 +1,63 @@
+"""Request body decoding and format parameter validation"""
+
+import numpy as np
+import pytest
+from conftest import write_wav, tone
+from audio_decoding import (decode_audio, decode_raw, parse_sample_rate, parse_channels,
+                            AudioDecodeError)
+
+RAW = 'application/octet-stream'
+
+def test_raw_float32_body():
+    samples = np.array([0.0, 0.5, -0.5], dtype='<f4')
+    audio, sample_rate = decode_audio(samples.tobytes(), RAW, sample_rate='16000')
+    np.testing.assert_array_equal(audio, samples)
+    assert sample_rate == 16000
+
+def test_raw_int16_stereo_is_mixed_to_mono():
+    frames = np.array([[100, 300], [-200, 200]], dtype='<i2')
+    audio, _ = decode_audio(frames.tobytes(), RAW, dtype='int16', sample_rate=8000, channels='2')
+    np.testing.assert_allclose(audio, [200 / 32768, 0])
+    assert audio.dtype == np.float32
+
+def test_int16_is_scaled_to_unit_range():
+    pcm = np.array([-32768, 0, 16384, 32767], dtype='<i2')
+    audio = decode_raw(pcm.tobytes(), 'int16')
+    assert audio.dtype == np.float32
+    np.testing.assert_allclose(audio, [-1.0, 0.0, 0.5, 32767 / 32768])
+
+@pytest.mark.parametrize("value", ['abc', '0', '-8000', '', 0, -1, 22050.5, None, float('inf')])
+def test_invalid_sample_rates_are_rejected(value):
+    with pytest.raises(AudioDecodeError):
+        parse_sample_rate(value)
+
+@pytest.mark.parametrize("value", ['x', '0', -2, None])
+def test_invalid_channel_counts_are_rejected(value):
+    with pytest.raises(AudioDecodeError):
+        parse_channels(value)
+
+def test_raw_body_needs_a_sample_rate():
+    with pytest.raises(AudioDecodeError, match="needs a sample rate"):
+        decode_audio(b'\0' * 8, RAW)
+
+def test_raw_body_parameters_are_validated_by_the_decoder():
+    body = b'\0' * 8
+    for kwargs in ({'sample_rate': '0'}, {'sample_rate': 'fast'}, {'sample_rate': 8000, 'channels': 'two'},
+                   {'sample_rate': 8000, 'dtype': 'int8'}):
+        with pytest.raises(AudioDecodeError):
+            decode_audio(body, RAW, **kwargs)
+
+def test_partial_frames_are_rejected():
+    with pytest.raises(AudioDecodeError):
+        decode_raw(b'\0' * 6, 'int16', channels=2)
+
+def test_wav_upload_carries_its_own_sample_rate(tmp_path):
+    path = write_wav(tmp_path / 'clip.wav', tone(0.5, sample_rate=16000), sample_rate=16000)
+    with open(path, 'rb') as f:
+        audio, sample_rate = decode_audio(f.read(), 'audio/wav; charset=binary')
+    assert sample_rate == 16000
+    assert len(audio) == 8000
+
+def test_unsupported_content_type():
+    with pytest.raises(AudioDecodeError):
+        decode_audio(b'', 'text/plain')
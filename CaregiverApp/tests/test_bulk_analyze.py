@@ -0,0 +1,97 @@
+"""Resume behaviour of the offline bulk analysis CLI"""
+
+import argparse
+import csv
+import pytest
+from conftest import write_wav, tone
+import bulk_analyze
+
+def make_args(inputs, model_path, output, **overrides):
+    args = dict(inputs=inputs, model_path=model_path, output=output, window=3.0, hop=0.5,
+                segment_seconds=4.0, workers=0, restart=False)
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+def read_rows(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+@pytest.fixture
+def recordings(tmp_path):
+    folder = tmp_path / 'recordings'
+    folder.mkdir()
+    write_wav(folder / 'a.wav', tone(8.0, 220))
+    write_wav(folder / 'b.wav', tone(6.0, 330))
+    return folder
+
+def test_fresh_run_writes_every_window_once(recordings, model_path, tmp_path):
+    output = str(tmp_path / 'out.csv')
+    assert bulk_analyze.run(make_args([str(recordings)], model_path, output))
+    rows = read_rows(output)
+    keys = [(row['file'], row['window']) for row in rows]
+    assert len(keys) == len(set(keys))
+    # 8 s and 6 s files, 3 s windows every 512 * 22 samples (~0.51 s)
+    assert len(rows) == 10 + 6
+
+def test_rerun_with_same_settings_resumes_without_duplicates(recordings, model_path, tmp_path):
+    output = str(tmp_path / 'out.csv')
+    assert bulk_analyze.run(make_args([str(recordings)], model_path, output))
+    first = read_rows(output)
+    assert bulk_analyze.run(make_args([str(recordings)], model_path, output))
+    assert read_rows(output) == first
+
+def test_changed_segmentation_is_refused(recordings, model_path, tmp_path):
+    output = str(tmp_path / 'out.csv')
+    assert bulk_analyze.run(make_args([str(recordings)], model_path, output))
+    first = read_rows(output)
+    assert not bulk_analyze.run(make_args([str(recordings)], model_path, output, segment_seconds=2.0))
+    assert read_rows(output) == first
+
+def test_changed_inputs_are_refused(recordings, model_path, tmp_path):
+    output = str(tmp_path / 'out.csv')
+    assert bulk_analyze.run(make_args([str(recordings)], model_path, output))
+    first = read_rows(output)
+    write_wav(recordings / 'c.wav', tone(5.0, 440))
+    assert not bulk_analyze.run(make_args([str(recordings)], model_path, output))
+    assert read_rows(output) == first
+
+def test_restart_starts_over(recordings, model_path, tmp_path):
+    output = str(tmp_path / 'out.csv')
+    assert bulk_analyze.run(make_args([str(recordings)], model_path, output))
+    assert bulk_analyze.run(make_args([str(recordings)], model_path, output, segment_seconds=2.0,
+                                      restart=True))
+    rows = read_rows(output)
+    assert len(rows) == len({(row['file'], row['window']) for row in rows}) == 16
+
+def test_interrupted_segment_is_cut_back_on_resume(recordings, model_path, tmp_path):
+    output = str(tmp_path / 'out.csv')
+    assert bulk_analyze.run(make_args([str(recordings)], model_path, output))
+    complete = read_rows(output)
+
+    # Forget the last segment and leave a half-written row behind, as a crash would
+    progress = output + '.progress.jsonl'
+    with open(progress) as f:
+        lines = f.readlines()
+    with open(progress, 'w') as f:
+        f.writelines(lines[:-1])
+    with open(output, 'a') as f:
+        f.write('partial,row')
+
+    assert bulk_analyze.run(make_args([str(recordings)], model_path, output))
+    assert sorted(read_rows(output), key=lambda r: (r['file'], int(r['window']))) == \
+        sorted(complete, key=lambda r: (r['file'], int(r['window'])))
+
+def test_restart_with_changed_settings_replaces_parquet_parts(recordings, model_path, tmp_path):
+    pd = pytest.importorskip('pandas')
+    pytest.importorskip('pyarrow')
+    output = str(tmp_path / 'out.parquet')
+    assert bulk_analyze.run(make_args([str(recordings)], model_path, output))
+    (tmp_path / 'out.parquet' / 'notes.txt').write_text('kept')
+    assert bulk_analyze.run(make_args([str(recordings)], model_path, output, hop=1.0, segment_seconds=2.0,
+                                      restart=True))
+    parts = sorted((tmp_path / 'out.parquet').glob('part-*.parquet'))
+    rows = pd.concat([pd.read_parquet(part) for part in parts])
+    assert len(rows) == len(rows.drop_duplicates(['file', 'window']))
+    assert set((rows['end_s'] - rows['start_s']).round(2)) == {3.0}
+    assert len(rows) == 6 + 4  # Windows every ~1.0 s only
+    assert (tmp_path / 'out.parquet' / 'notes.txt').exists()
@@ -0,0 +1,217 @@
+"""Flask API endpoints"""
+
+import os
+import numpy as np
+import pytest
+import emotion_api
+
+TOKEN = 's3cret'
+
+@pytest.fixture
+def client():
+    return emotion_api.app.test_client()
+
+@pytest.fixture
+def admin(monkeypatch, tmp_path):
+    """Admin enabled with a models directory; reloads are recorded instead of run"""
+    models = tmp_path / 'models'
+    models.mkdir()
+    (models / 'new.joblib').write_bytes(b'')
+    (tmp_path / 'outside.joblib').write_bytes(b'')
+    os.symlink(tmp_path / 'outside.joblib', models / 'link.joblib')
+    reloads = []
+    monkeypatch.setattr(emotion_api, 'ADMIN_TOKEN', TOKEN)
+    monkeypatch.setattr(emotion_api, 'MODELS_DIR', str(models))
+    monkeypatch.setattr(emotion_api.model_reloader, 'reload_async', lambda path=None: reloads.append(path) or True)
+    return models, reloads
+
+def test_admin_routes_are_disabled_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(emotion_api, 'ADMIN_TOKEN', None)
+    assert client.get('/admin/model').status_code == 404
+    assert client.post('/admin/reload', json={}).status_code == 404
+    # Localhost is not trusted on its own
+    assert client.post('/admin/reload', json={}, environ_base={'REMOTE_ADDR': '127.0.0.1'}).status_code == 404
+
+def test_admin_routes_need_the_right_token(client, admin):
+    assert client.get('/admin/model').status_code == 403
+    assert client.get('/admin/model', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    assert client.get('/admin/model', headers={'X-Admin-Token': TOKEN}).status_code == 200
+    assert client.get('/admin/model', headers={'Authorization': f'Bearer {TOKEN}'}).status_code == 200
+
+def test_reload_loads_files_from_the_models_directory(client, admin):
+    models, reloads = admin
+    response = client.post('/admin/reload', json={'model_path': 'new.joblib'}, headers={'X-Admin-Token': TOKEN})
+    assert response.status_code == 202
+    assert reloads == [str(models / 'new.joblib')]
+
+@pytest.mark.parametrize("model_path", ['../outside.joblib', 'link.joblib', '/etc/passwd', 'missing.joblib', 7])
+def test_reload_rejects_paths_outside_the_models_directory(client, admin, model_path):
+    _, reloads = admin
+    response = client.post('/admin/reload', json={'model_path': model_path}, headers={'X-Admin-Token': TOKEN})
+    assert response.status_code == 400
+    assert reloads == []
+
+@pytest.fixture
+def timelines(monkeypatch, tmp_path, model_path):
+    """A loaded model, a result cache and a timeline store"""
+    from result_cache import ResultCache
+    from timeline_store import TimelineStore
+
+    ok, message = emotion_api.emotion_api.load_model(model_path)
+    assert ok, message
+    store = TimelineStore(str(tmp_path / 'timelines'))
+    monkeypatch.setattr(emotion_api, 'timeline_store', store)
+    monkeypatch.setattr(emotion_api, 'worker_pool', None)
+    monkeypatch.setattr(emotion_api.emotion_api, 'vad', None)
+    monkeypatch.setattr(emotion_api.emotion_api, 'result_cache', ResultCache())
+    yield store
+    store.close()
+
+def test_cached_results_are_not_recorded_twice(client, timelines):
+    from conftest import tone
+
+    body = {"audio": tone(1.0).tolist(), "sample_rate": 22050, "patient_id": "p1"}
+    first = client.post('/detect_emotion', json=body).get_json()
+    second = client.post('/detect_emotion', json=body).get_json()
+    assert first["success"] and not first["cached"]
+    assert second["cached"]
+    summary = client.get('/patients/p1/timeline').get_json()["summary"]
+    assert summary["count"] == 1
+    assert summary["mean_probabilities"] == {}  # The API only records labels and confidence
+
+def test_timeline_reads_do_not_create_patients(client, timelines):
+    response = client.get('/patients/ghost/timeline')
+    assert response.status_code == 200
+    assert response.get_json()["summary"]["count"] == 0
+    assert client.get('/patients/..%2Fescape/timeline').status_code in (400, 404)
+    assert os.listdir(timelines.root) == []
+
+@pytest.mark.parametrize("headers", [{'X-Sample-Rate': 'abc'}, {'X-Sample-Rate': '0'}, {'X-Channels': 'two'},
+                                     {'X-Channels': '0'}, {'X-Audio-Dtype': 'int8'}])
+def test_bad_raw_format_parameters_are_client_errors(client, headers):
+    response = client.post('/detect_emotion', data=b'\0' * 64,
+                           headers=dict(headers, **{'Content-Type': 'application/octet-stream'}))
+    assert response.status_code == 400
+    assert not response.get_json()["success"]
+
+@pytest.mark.parametrize("sample_rate", [0, -1, 'fast', None])
+def test_bad_json_sample_rate_is_a_client_error(client, sample_rate):
+    response = client.post('/detect_emotion', json={"audio": [0.0] * 100, "sample_rate": sample_rate})
+    assert response.status_code == 400
+
+def test_bad_sample_rate_fails_only_its_batch_clip(client, timelines):
+    from conftest import tone
+
+    clips = [{"audio": tone(1.0).tolist(), "sample_rate": 22050}, {"audio": [0.1] * 100, "sample_rate": 0}]
+    response = client.post('/detect_emotion_batch', json={"clips": clips})
+    assert response.status_code == 200
+    first, second = response.get_json()["results"]
+    assert first["success"]
+    assert not second["success"] and "sample rate" in second["error"]
+
+@pytest.fixture
+def served(monkeypatch, model_path):
+    """A loaded model with voice-activity gating, analysed in-process without a cache"""
+    from vad import VoiceActivityDetector
+
+    ok, message = emotion_api.emotion_api.load_model(model_path)
+    assert ok, message
+    monkeypatch.setattr(emotion_api, 'worker_pool', None)
+    monkeypatch.setattr(emotion_api.emotion_api, 'vad', VoiceActivityDetector())
+    monkeypatch.setattr(emotion_api.emotion_api, 'result_cache', None)
+
+def post_both_ways(client, audio):
+    """The same clip as JSON floats and as raw int16 PCM"""
+    pcm = np.round(audio * 32767).astype('<i2')
+    as_json = client.post('/detect_emotion', json={"audio": (pcm / 32768.0).tolist(), "sample_rate": 22050})
+    as_raw = client.post('/detect_emotion', data=pcm.tobytes(),
+                         headers={'Content-Type': 'application/octet-stream', 'X-Audio-Dtype': 'int16',
+                                  'X-Sample-Rate': '22050'})
+    return as_json.get_json(), as_raw.get_json()
+
+def test_raw_int16_quiet_hum_is_gated_like_json(client, served):
+    from conftest import tone
+
+    as_json, as_raw = post_both_ways(client, tone(3.0, 60, 0.01))
+    assert as_json["speech"] is False
+    assert as_raw["speech"] is False
+
+def test_raw_int16_speech_predicts_like_json(client, served):
+    from conftest import tone
+
+    as_json, as_raw = post_both_ways(client, tone(3.0, 150, 0.4) + tone(3.0, 450, 0.1))
+    assert as_json["speech"] and as_raw["speech"]
+    assert as_raw["emotion"] == as_json["emotion"]
+    assert as_raw["confidence"] == pytest.approx(as_json["confidence"])
+
+@pytest.mark.parametrize("body", [
+    {"sample_rate": "fast"}, {"sample_rate": 0}, {"sample_rate": -16000}, {"sample_rate": 10 ** 9},
+    {"buffer_duration": 0}, {"buffer_duration": -3}, {"buffer_duration": "long"}, {"buffer_duration": 3600},
+    {"hop_duration": 0}, {"hop_duration": -0.5}, {"hop_duration": None}, {"buffer_duration": 1.0, "hop_duration": 2.0},
+])
+def test_bad_session_parameters_are_client_errors(client, served, body):
+    response = client.post('/sessions', json=body)
+    assert response.status_code == 400
+    assert not response.get_json()["success"]
+
+def test_session_lifecycle(client, served):
+    from conftest import tone
+
+    created = client.post('/sessions', json={"buffer_duration": 2.0, "hop_duration": 0.5})
+    assert created.status_code == 201
+    session_id = created.get_json()["session_id"]
+
+    audio = tone(3.0, 150, 0.4) + tone(3.0, 450, 0.1)
+    pcm = np.round(audio * 32767).astype('<i2')
+    results = []
+    for i in range(0, len(pcm), 11025):
+        response = client.post(f'/sessions/{session_id}/audio', data=pcm[i:i + 11025].tobytes(),
+                               headers={'Content-Type': 'application/octet-stream', 'X-Audio-Dtype': 'int16'})
+        assert response.status_code == 200
+        results.extend(response.get_json()["results"])
+    assert results and all(result["speech"] for result in results)
+    assert results[0]["audio_time"] == pytest.approx(2.0, abs=1e-3)
+
+    state = client.get(f'/sessions/{session_id}').get_json()
+    assert state["audio_seconds"] == pytest.approx(3.0)
+    assert state["latest"] == results[-1]
+
+    wrong_rate = client.post(f'/sessions/{session_id}/audio', data=pcm[:1024].tobytes(),
+                             headers={'Content-Type': 'application/octet-stream', 'X-Audio-Dtype': 'int16',
+                                      'X-Sample-Rate': '16000'})
+    assert wrong_rate.status_code == 400
+
+    assert client.delete(f'/sessions/{session_id}').status_code == 200
+    assert client.get(f'/sessions/{session_id}').status_code == 404
+    assert client.post(f'/sessions/{session_id}/audio', json={"audio": [0.0]}).status_code == 404
+
+def vowels():
+    """Speech-like clips that differ enough to get different features"""
+    from conftest import tone
+    return [tone(2.0, f0, 0.4) + tone(2.0, 3 * f0, 0.1) for f0 in (110, 150, 200, 260)]
+
+@pytest.mark.parametrize("fast_path", [True, False])
+def test_analyze_batch_matches_analyzing_each_clip(model_path, fast_path):
+    api = emotion_api.EmotionAPI()
+    api.fast_path = fast_path
+    ok, message = api.load_model(model_path)
+    assert ok, message
+    assert (api.bundle.compiled is not None) == fast_path
+
+    clips = [(audio, 22050) for audio in vowels()] + [(np.zeros(100, dtype=np.float32), 22050)]
+    batch = api.analyze_batch(clips)
+    assert batch == [api.analyze(audio, sample_rate) for audio, sample_rate in clips]
+    assert all(result["success"] for result in batch[:-1])
+    assert not batch[-1]["success"]
+
+def test_batch_endpoint_matches_single_clip_requests(client, served):
+    clips = vowels()
+    response = client.post('/detect_emotion_batch',
+                           json={"clips": [{"audio": audio.tolist(), "sample_rate": 22050} for audio in clips]})
+    assert response.status_code == 200
+    batch = response.get_json()["results"]
+    assert len(batch) == len(clips)
+    for audio, result in zip(clips, batch):
+        single = client.post('/detect_emotion', json={"audio": audio.tolist(), "sample_rate": 22050}).get_json()
+        assert result["emotion"] == single["emotion"]
+        assert result["confidence"] == pytest.approx(single["confidence"])
@@ -0,0 +1,87 @@
+"""Replay and provisional windows of the single-stream recognizer"""
+
+import numpy as np
+import pytest
+from conftest import SAMPLE_RATE
+from audio_sources import ArraySource
+from emotion_recognizer import SimpleEmotionRecognizer
+from timeline_store import TimelineStore
+
+def speech_like(seconds):
+    """A vowel whose pitch wanders, so consecutive windows differ"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 150 + 40 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    return (0.4 * np.sin(phase) + 0.1 * np.sin(3 * phase)).astype(np.float32)
+
+@pytest.fixture
+def recognizer(model_path):
+    recognizer = SimpleEmotionRecognizer()
+    ok, message = recognizer.load_model(model_path)
+    assert ok, message
+    recognizer.vad = None
+    recognizer.buffer_duration, recognizer.hop_duration = 2.0, 0.5
+    recognizer.buffer_size = int(recognizer.buffer_duration * SAMPLE_RATE)
+    return recognizer
+
+def replay(recognizer, audio, blocksize=1024, start_time=1000.0):
+    return list(recognizer.replay(ArraySource(audio, SAMPLE_RATE, blocksize), start_time=start_time))
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_replay_scores_every_window_in_order(recognizer, streaming):
+    recognizer.streaming = streaming
+    hop = recognizer._hop_samples() / SAMPLE_RATE
+    results = replay(recognizer, speech_like(5.0))
+
+    times = [result["audio_time"] for result in results]
+    expected = 2.0 + hop * np.arange(int((5.0 - 2.0) / hop + 1e-9) + 1)
+    np.testing.assert_allclose(times, expected, atol=1.0 / SAMPLE_RATE)
+    assert [result["captured_at"] for result in results] == pytest.approx([1000.0 + t for t in times])
+    assert not any(result["provisional"] for result in results)
+    assert recognizer.skipped_windows == 0 and recognizer.window_overruns == 0
+
+def test_replay_is_deterministic_whatever_the_block_size(recognizer):
+    audio = speech_like(4.0)
+    first = replay(recognizer, audio, blocksize=1024)
+    second = replay(recognizer, audio, blocksize=4000)
+    key = lambda result: (result["audio_time"], result["captured_at"], result["emotion"], result["confidence"])
+    assert [key(result) for result in first] == [key(result) for result in second]
+
+
+def test_provisional_windows_lead_up_to_full_ones_in_order(recognizer, tmp_path):
+    store = TimelineStore(str(tmp_path / 'timelines'))
+    recognizer.timeline, recognizer.patient_id = store, 'p1'
+    recognizer.provisional_window = 0.5
+    try:
+        results = replay(recognizer, speech_like(3.5))
+    finally:
+        store.close()
+
+    times = [result["audio_time"] for result in results]
+    assert times == sorted(times) and len(set(times)) == len(times)
+    assert times[0] == pytest.approx(0.5, abs=1.0 / SAMPLE_RATE)
+
+    provisional = [result for result in results if result["provisional"]]
+    full = [result for result in results if not result["provisional"]]
+    assert results == provisional + full  # No provisional result after the buffer has filled
+    assert [result["window_seconds"] for result in provisional] == pytest.approx(
+        [result["audio_time"] for result in provisional])
+    assert all(result["window_seconds"] < 2.0 for result in provisional)
+    assert full[0]["audio_time"] == pytest.approx(2.0, abs=1.0 / SAMPLE_RATE)
+    assert all(result["window_seconds"] == pytest.approx(2.0) for result in full)
+
+    # Only full windows count towards the history and the timeline
+    assert len(recognizer.emotion_history) == len(full)
+    reopened = TimelineStore(str(tmp_path / 'timelines'))
+    try:
+        assert reopened.query('p1', 0, 10000)["summary"]["count"] == len(full)
+    finally:
+        reopened.close()
+
+def test_provisional_windows_stay_on_the_full_windows_hop_grid(recognizer):
+    recognizer.provisional_window = 0.6
+    times = [result["audio_time"] for result in replay(recognizer, speech_like(3.0))]
+    hop = recognizer._hop_samples() / SAMPLE_RATE
+    # After the first partial window, every end falls on the grid that runs through the buffer length
+    for t in times[1:]:
+        assert (t - 2.0) / hop == pytest.approx(round((t - 2.0) / hop), abs=1e-3)
@@ -0,0 +1,74 @@
+"""Compiled NumPy fast path against sklearn"""
+
+import warnings
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+from fast_inference import compile_model
+
+N_FEATURES = 12
+NAMES = [f"f{i}" for i in range(N_FEATURES)]
+
+def training_data(n_classes):
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((120, N_FEATURES)) * rng.uniform(0.5, 50, N_FEATURES) + rng.uniform(-10, 10, N_FEATURES)
+    labels = np.array(['angry', 'happy', 'neutral', 'sad'][:n_classes])
+    return X, labels[rng.integers(0, n_classes, len(X))]
+
+ESTIMATORS = {
+    'logistic-multinomial': (lambda: LogisticRegression(max_iter=500), 4),
+    'logistic-liblinear-binary': (lambda: LogisticRegression(solver='liblinear'), 2),
+    'logistic-binary': (lambda: LogisticRegression(max_iter=500), 2),
+    'mlp-relu': (lambda: MLPClassifier((16, 8), max_iter=200, random_state=0), 4),
+    'mlp-tanh': (lambda: MLPClassifier((16,), activation='tanh', max_iter=200, random_state=0), 4),
+    'mlp-logistic-binary': (lambda: MLPClassifier((16,), activation='logistic', max_iter=200, random_state=0), 2),
+    'decision-tree': (lambda: DecisionTreeClassifier(max_depth=6, random_state=0), 4),
+    'random-forest': (lambda: RandomForestClassifier(n_estimators=10, random_state=0), 4),
+    'extra-trees': (lambda: ExtraTreesClassifier(n_estimators=10, random_state=0), 4),
+}
+
+@pytest.mark.parametrize('scaler_type', [StandardScaler, MinMaxScaler])
+@pytest.mark.parametrize('estimator', ESTIMATORS)
+def test_compiled_probabilities_match_sklearn(estimator, scaler_type):
+    make, n_classes = ESTIMATORS[estimator]
+    X, y = training_data(n_classes)
+    scaler = scaler_type().fit(X)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # Convergence warnings from the short MLP fits
+        model = make().fit(scaler.transform(X), y)
+
+    compiled, message = compile_model(model, scaler, NAMES)
+    assert compiled is not None, message
+
+    unseen = training_data(n_classes)[0][::-1] * 1.1
+    expected = model.predict_proba(scaler.transform(unseen))
+    np.testing.assert_allclose(compiled.predict_proba(unseen), expected, rtol=0, atol=1e-6)
+    assert list(compiled.classes_) == list(model.classes_)
+
+def test_predict_batch_treats_missing_and_nan_features_as_zero():
+    X, y = training_data(4)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(scaler.transform(X), y)
+    compiled, _ = compile_model(model, scaler, NAMES)
+
+    features = dict(zip(NAMES, X[0]))
+    del features['f3']
+    features['f5'] = float('nan')
+    row = X[0].copy()
+    row[[3, 5]] = 0.0
+    expected = model.predict_proba(scaler.transform(row[None]))[0]
+
+    (emotion, confidence), = compiled.predict_batch([features])
+    assert emotion == model.classes_[np.argmax(expected)]
+    assert confidence == pytest.approx(expected.max())
+
+def test_unsupported_estimators_fall_back_to_sklearn():
+    X, y = training_data(4)
+    scaler = StandardScaler().fit(X)
+    compiled, message = compile_model(KNeighborsClassifier().fit(scaler.transform(X), y), scaler, NAMES)
+    assert compiled is None and "no fast path" in message
@@ -0,0 +1,48 @@
+"""Incremental sliding-window feature extraction"""
+
+import numpy as np
+import pytest
+from conftest import SAMPLE_RATE, tone
+from feature_engine import FeatureEngine, StreamingFeatureExtractor
+
+WINDOW = 2 * SAMPLE_RATE
+
+@pytest.fixture(scope='module')
+def recording():
+    """Six seconds of a gliding vowel over a little noise, so every window differs"""
+    t = np.arange(6 * SAMPLE_RATE) / SAMPLE_RATE
+    glide = 0.3 * np.sin(2 * np.pi * (150 * t + 10 * t ** 2))
+    noise = 0.01 * np.random.default_rng(0).standard_normal(len(t))
+    return (glide + noise + tone(6.0, 450, 0.05)).astype(np.float32)
+
+def assert_features_match(actual, expected):
+    assert actual.keys() == expected.keys()
+    for name in expected:
+        assert actual[name] == pytest.approx(expected[name], rel=1e-3, abs=1e-4), name
+
+def test_hop_aligned_windows_match_a_full_pass(recording):
+    engine = FeatureEngine(sample_rate=SAMPLE_RATE)
+    extractor = StreamingFeatureExtractor(engine)
+    hop = 8 * engine.hop_length
+    for start in range(0, len(recording) - WINDOW + 1, hop):
+        window = recording[start:start + WINDOW]
+        assert_features_match(extractor.extract(window, start, SAMPLE_RATE),
+                              engine.extract(window, SAMPLE_RATE))
+    assert extractor.frames_reused > extractor.frames_computed
+
+def test_misaligned_window_falls_back_to_a_full_pass(recording):
+    engine = FeatureEngine(sample_rate=SAMPLE_RATE)
+    extractor = StreamingFeatureExtractor(engine)
+    extractor.extract(recording[:WINDOW], 0, SAMPLE_RATE)
+    computed = extractor.frames_computed
+
+    start = engine.hop_length * 4 + 100
+    window = recording[start:start + WINDOW]
+    assert extractor.extract(window, start, SAMPLE_RATE) == engine.extract(window, SAMPLE_RATE)
+    assert extractor.frames_computed == computed
+    assert extractor.frames_reused == 0
+
+def test_silent_and_short_windows_have_no_features():
+    extractor = StreamingFeatureExtractor(FeatureEngine(sample_rate=SAMPLE_RATE))
+    assert extractor.extract(np.zeros(WINDOW, dtype=np.float32), 0, SAMPLE_RATE) is None
+    assert extractor.extract(tone(0.2), 0, SAMPLE_RATE) is None
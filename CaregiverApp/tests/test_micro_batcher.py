@@ -0,0 +1,56 @@
+"""Micro-batching of concurrent predictions"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from micro_batcher import MicroBatcher
+
+def echo_batch(features_list):
+    """Answers each request with its own id, so mixed-up results are visible"""
+    return [(features['id'], features['id'] / 1000) for features in features_list]
+
+@pytest.fixture
+def batcher():
+    batcher = MicroBatcher(echo_batch, max_batch_size=8, max_wait=0.01)
+    yield batcher
+    batcher.stop()
+
+def test_concurrent_callers_each_get_their_own_result(batcher):
+    start = threading.Barrier(16)
+
+    def call(i):
+        start.wait()
+        return batcher.predict({'id': i}, timeout=5)
+
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(call, range(400)))
+
+    assert results == [(i, i / 1000) for i in range(400)]
+    stats = batcher.stats()
+    assert stats['items'] == 400
+    assert stats['mean_batch_size'] > 1
+    assert max(int(size) for size in stats['batch_sizes']) <= 8
+
+def test_full_batch_is_dispatched_without_waiting_for_the_window():
+    batcher = MicroBatcher(echo_batch, max_batch_size=4, max_wait=60)
+    try:
+        futures = [batcher.submit({'id': i}) for i in range(4)]
+        assert [future.result(timeout=5) for future in futures] == [(i, i / 1000) for i in range(4)]
+    finally:
+        batcher.stop()
+
+def test_failed_batch_answers_every_caller():
+    def broken(features_list):
+        raise RuntimeError("model exploded")
+
+    batcher = MicroBatcher(broken, max_batch_size=4, max_wait=0.01)
+    try:
+        futures = [batcher.submit({'id': i}) for i in range(6)]
+        assert [future.result(timeout=5) for future in futures] == [(None, 0.0)] * 6
+    finally:
+        batcher.stop()
+
+def test_stopped_batcher_rejects_new_requests(batcher):
+    batcher.stop()
+    with pytest.raises(RuntimeError):
+        batcher.submit({'id': 1})
@@ -0,0 +1,87 @@
+"""Many streams served by one recognizer"""
+
+import time
+import numpy as np
+import pytest
+from conftest import SAMPLE_RATE, tone
+from emotion_api import EmotionAPI
+from multi_stream import MultiStreamRecognizer
+from timeline_store import TimelineStore
+
+# Each stream carries one pitch; the fake model names whichever pitch a window's spectrum is centred on
+PITCHES = {'low': 300, 'mid': 1200, 'high': 3000}
+
+def label_by_centroid(features_list, bundle=None):
+    labels = list(PITCHES)
+    pitches = np.array(list(PITCHES.values()))
+    return [(labels[int(np.argmin(np.abs(pitches - features['spectral_centroid_mean'])))], 0.9)
+            for features in features_list]
+
+@pytest.fixture
+def engine(model_path, tmp_path, monkeypatch):
+    api = EmotionAPI()
+    ok, message = api.load_model(model_path)
+    assert ok, message
+    monkeypatch.setattr(api, 'predict_batch', label_by_centroid)
+    store = TimelineStore(str(tmp_path / 'timelines'))
+    results = []
+    engine = MultiStreamRecognizer(api, buffer_duration=1.0, hop_duration=0.25, batch_wait=0,
+                                   timeline=store, callback=lambda *result: results.append(result))
+    yield engine, results, store
+    engine.stop()
+    store.close()
+
+def run_passes(engine):
+    """One scheduler pass over whatever is due, as the scheduler thread would run it"""
+    due = [(stream, stream.due_window()) for stream in engine.streams.values()]
+    due = [(stream, end) for stream, end in due if end is not None]
+    if due:
+        engine._analyze(due)
+    return len(due)
+
+def test_results_stay_with_their_own_stream(engine):
+    engine, results, store = engine
+    streams = {name: engine.add_stream(name, sample_rate, patient_id=f"patient-{name}")
+               for name, sample_rate in (('low', SAMPLE_RATE), ('mid', 16000), ('high', SAMPLE_RATE))}
+    signals = {name: tone(3.0, PITCHES[name], 0.3, streams[name].sample_rate) for name in streams}
+
+    # Interleave chunk sizes so windows come due in different passes for different streams
+    offsets = dict.fromkeys(streams, 0)
+    for step in range(40):
+        for i, (name, stream) in enumerate(streams.items()):
+            size = 1500 + 700 * i
+            stream.write(signals[name][offsets[name]:offsets[name] + size])
+            offsets[name] += size
+        run_passes(engine)
+
+    by_stream = {}
+    for stream_id, emotion, confidence in results:
+        by_stream.setdefault(stream_id, []).append(emotion)
+    assert set(by_stream) == set(streams)
+    for name, emotions in by_stream.items():
+        assert set(emotions) == {name}
+        assert streams[name].analyses == len(emotions)
+        assert streams[name].latest["emotion"] == name
+
+    now = time.time()
+    for name in streams:
+        summary = store.query(f"patient-{name}", now - 3600, now + 60)["summary"]
+        assert summary["count"] == len(by_stream[name])
+        assert set(summary["distribution"]) == {name}
+
+def test_removed_stream_gets_no_further_results(engine):
+    engine, results, _ = engine
+    kept = engine.add_stream('low')
+    dropped = engine.add_stream('high')
+    kept.write(tone(1.0, PITCHES['low']))
+    dropped.write(tone(1.0, PITCHES['high']))
+    engine.remove_stream('high')
+    dropped.write(tone(1.0, PITCHES['high']))
+    run_passes(engine)
+    assert [stream_id for stream_id, _, _ in results] == ['low']
+
+def test_duplicate_stream_ids_are_rejected(engine):
+    engine, _, _ = engine
+    engine.add_stream('low')
+    with pytest.raises(ValueError):
+        engine.add_stream('low')
@@ -0,0 +1,56 @@
+"""Adaptive quality controller"""
+
+import pytest
+from qos import QualityController, default_levels, FULL_TIER, LITE_TIER
+
+def run(controller, compute_seconds, base_hop, times):
+    changes = 0
+    for _ in range(times):
+        changes += controller.observe(compute_seconds, base_hop * controller.hop_factor)
+    return changes
+
+def test_default_levels():
+    assert default_levels() == [(1, FULL_TIER), (2, FULL_TIER), (4, FULL_TIER)]
+    assert default_levels(has_lite=True) == [(1, FULL_TIER), (2, FULL_TIER), (2, LITE_TIER), (4, LITE_TIER)]
+
+def test_steps_down_after_patience_overloaded_analyses():
+    controller = QualityController(patience=3)
+    run(controller, 0.45, 0.5, 2)
+    assert controller.level == 0
+    run(controller, 0.45, 0.5, 1)
+    assert controller.level == 1 and controller.hop_factor == 2
+    assert controller.mode()["degraded"]
+
+def test_stays_degraded_while_restoring_would_overload_again():
+    controller = QualityController(patience=3, recovery=10)
+    run(controller, 0.45, 0.5, 3)
+    run(controller, 0.45, 0.5, 50)  # Load 0.45 here is 0.9 at the full hop
+    assert controller.level == 1
+
+def test_restores_once_compute_time_drops():
+    controller = QualityController(patience=3, recovery=10)
+    run(controller, 0.45, 0.5, 3)
+    run(controller, 0.05, 0.5, 30)
+    assert controller.level == 0
+    assert controller.restored == 1
+
+def test_cheaper_tier_headroom_is_not_mistaken_for_spare_cpu():
+    controller = QualityController(default_levels(has_lite=True), patience=3, recovery=10)
+    run(controller, 0.9, 0.5, 3)       # Full tier at 2x hop
+    run(controller, 0.9, 0.5, 3)       # Lite tier at 2x hop
+    assert controller.tier == LITE_TIER
+    run(controller, 0.3, 0.5, 50)      # The lite tier costs a third of the full one
+    assert controller.tier == LITE_TIER
+
+def test_set_levels_keeps_the_current_hop_factor():
+    controller = QualityController(default_levels(max_hop_factor=4), patience=1)
+    run(controller, 10.0, 0.5, 2)
+    assert controller.hop_factor == 4
+    controller.set_levels(default_levels(has_lite=True, max_hop_factor=2))
+    assert controller.hop_factor == 2
+
+@pytest.mark.parametrize("hop", [0.0, -1.0])
+def test_zero_hop_does_not_divide_by_zero(hop):
+    controller = QualityController()
+    assert not controller.observe(0.1, hop)
+    assert controller.load == 0.0
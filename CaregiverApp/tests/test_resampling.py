@@ -0,0 +1,39 @@
+"""Cached polyphase resampling"""
+
+from math import gcd
+import numpy as np
+import pytest
+from scipy import signal
+from resampling import Resampler
+
+@pytest.mark.parametrize("source_rate", [8000, 16000, 44100, 48000, 11025])
+def test_output_matches_resample_poly(source_rate):
+    rng = np.random.default_rng(source_rate)
+    audio = (0.3 * rng.standard_normal(source_rate)).astype(np.float32)
+    divisor = gcd(source_rate, 22050)
+    expected = signal.resample_poly(audio, 22050 // divisor, source_rate // divisor)
+
+    resampler = Resampler(22050)
+    for _ in range(2):  # Designed filter, then the cached one
+        actual = resampler.resample(audio, source_rate)
+        assert actual.dtype == np.float32
+        np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-5)
+    assert (resampler.filter_misses, resampler.filter_hits) == (1, 1)
+
+def test_native_rate_passes_through_untouched():
+    audio = np.ones(100, dtype=np.float32)
+    resampler = Resampler(22050)
+    assert resampler.resample(audio, 22050) is audio
+    assert resampler.passthrough == 1 and resampler.resampled == 0
+
+def test_filter_cache_is_bounded():
+    resampler = Resampler(22050, max_filters=2)
+    for source_rate in (8000, 16000, 44100, 8000):
+        resampler.resample(np.zeros(400, dtype=np.float32), source_rate)
+    assert len(resampler._filters) == 2
+    assert resampler.filter_misses == 4
+
+@pytest.mark.parametrize("source_rate", [0, -8000])
+def test_invalid_rates_are_rejected(source_rate):
+    with pytest.raises(ValueError):
+        Resampler(22050).resample(np.zeros(10, dtype=np.float32), source_rate)
@@ -0,0 +1,85 @@
+"""Shared-memory result bus between the recognizer and readers"""
+
+import os
+import threading
+import pytest
+from result_bus import ResultBusWriter, ResultBusReader, LIVE_DTYPE
+
+LABELS = ['angry', 'happy', 'neutral', 'sad']
+
+@pytest.fixture
+def bus_path(tmp_path):
+    return str(tmp_path / 'live.bin')
+
+def publish(writer, i=0):
+    writer.publish({"emotion": "happy", "confidence": 0.75, "audio_time": float(i), "speech": True},
+                   {"happy": 0.75, "sad": 0.25},
+                   ("happy", 0.7, {"happy": 60.0, "sad": 40.0}), history=5)
+
+def test_reader_sees_nothing_before_the_first_publish(bus_path):
+    writer = ResultBusWriter(bus_path)
+    reader = ResultBusReader(bus_path)
+    assert reader.read() is None
+    reader.close()
+    writer.close()
+
+def test_published_result_round_trips(bus_path):
+    writer = ResultBusWriter(bus_path)
+    writer.set_labels(LABELS)
+    publish(writer)
+    reader = ResultBusReader(bus_path)
+    result = reader.read()
+    assert result["emotion"] == "happy"
+    assert result["confidence"] == 0.75
+    assert result["probabilities"] == {"angry": 0.0, "happy": 0.75, "neutral": 0.0, "sad": 0.25}
+    assert result["stats"] == {"dominant_emotion": "happy", "average_confidence": 0.7,
+                               "distribution": {"happy": 60.0, "sad": 40.0}, "history": 5}
+    assert result["results"] == 1
+    reader.close()
+    writer.close()
+
+def test_new_writer_reuses_the_file_and_recovers_an_odd_sequence(bus_path):
+    writer = ResultBusWriter(bus_path)
+    publish(writer)
+    writer._begin()  # Die mid-publish
+    writer.close()
+
+    reader = ResultBusReader(bus_path)
+    assert reader.read_record(attempts=5) is None
+    replacement = ResultBusWriter(bus_path)
+    publish(replacement)
+    assert reader.read()["results"] == 1
+    assert int(reader.read_record()['seq']) % 2 == 0
+    reader.close()
+    replacement.close()
+
+def test_reads_are_never_torn_under_concurrent_publishing(bus_path):
+    writer = ResultBusWriter(bus_path)
+    writer.set_labels(LABELS)
+    reader = ResultBusReader(bus_path)
+    publish(writer)
+    done = threading.Event()
+
+    def keep_publishing():
+        i = 0
+        while not done.is_set():
+            i += 1
+            # audio_time and history always match in a consistent record
+            writer.publish({"emotion": "happy", "confidence": 0.5, "audio_time": float(i)}, history=i)
+
+    thread = threading.Thread(target=keep_publishing)
+    thread.start()
+    try:
+        for _ in range(2000):
+            record = reader.read_record()
+            if record is not None and record['history']:
+                assert record['audio_time'] == record['history']
+    finally:
+        done.set()
+        thread.join()
+    reader.close()
+    writer.close()
+
+def test_layout_size_is_fixed(bus_path):
+    ResultBusWriter(bus_path).close()
+    assert os.path.getsize(bus_path) == LIVE_DTYPE.itemsize
@@ -0,0 +1,59 @@
+"""Content-addressed result cache"""
+
+import numpy as np
+from result_cache import ResultCache, clip_key
+
+RESULT = {"emotion": "happy", "confidence": 0.9, "success": True}
+
+def test_clip_key_depends_on_samples_rate_and_model_version():
+    audio = np.linspace(-1, 1, 100, dtype=np.float32)
+    key = clip_key(audio, 22050, 'v1')
+    assert clip_key(audio.copy(), 22050, 'v1') == key
+    assert clip_key(audio, 16000, 'v1') != key
+    assert clip_key(audio, 22050, 'v2') != key
+    changed = audio.copy()
+    changed[50] += 1e-3
+    assert clip_key(changed, 22050, 'v1') != key
+
+def test_hit_and_miss_are_counted():
+    cache = ResultCache()
+    assert cache.get('k') is None
+    cache.put('k', RESULT)
+    assert cache.get('k') == RESULT
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', RESULT)
+    cache.put('b', RESULT)
+    cache.get('a')
+    cache.put('c', RESULT)
+    assert cache.get('b') is None
+    assert cache.get('a') == RESULT and cache.get('c') == RESULT
+    assert cache.evictions == 1
+
+def test_expired_entries_are_not_served():
+    cache = ResultCache(ttl=-1)
+    cache.put('k', RESULT)
+    assert cache.get('k') is None
+    assert cache.expirations == 1
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    ResultCache(disk_dir=str(tmp_path)).put('k', RESULT)
+    cache = ResultCache(disk_dir=str(tmp_path))
+    assert cache.get('k') == RESULT
+    assert cache.disk_hits == 1
+
+def test_invalidate_clears_memory_only(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path))
+    cache.put('k', RESULT)
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0
+    assert cache.get('k') == RESULT  # Keys carry the model version, so disk entries stay valid
+
+def test_disk_tier_is_pruned_past_its_limit(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path), max_disk_entries=10)
+    for i in range(12):
+        cache.put(f'k{i}', RESULT)
+    assert len(list(tmp_path.glob('*.json'))) <= 10
@@ -0,0 +1,55 @@
+"""AudioRingBuffer windows and overrun detection"""
+
+import numpy as np
+import pytest
+from ring_buffer import AudioRingBuffer
+
+def test_window_returns_the_latest_samples_across_the_wrap():
+    ring = AudioRingBuffer(8)
+    ring.write(np.arange(6))
+    ring.write(np.arange(6, 11))
+    assert ring.samples_written == 11
+    assert len(ring) == 8
+    np.testing.assert_array_equal(ring.window(5), np.arange(6, 11))
+    np.testing.assert_array_equal(ring.window(8), np.arange(3, 11))
+
+def test_window_is_a_view_not_a_copy():
+    ring = AudioRingBuffer(8)
+    ring.write(np.ones(8))
+    assert ring.window(4).base is not None
+
+def test_window_by_absolute_end_position():
+    ring = AudioRingBuffer(8)
+    ring.write(np.arange(10))
+    np.testing.assert_array_equal(ring.window(3, end=7), [4, 5, 6])
+
+def test_unavailable_windows_raise():
+    ring = AudioRingBuffer(8)
+    ring.write(np.arange(10))
+    with pytest.raises(ValueError):
+        ring.window(4, end=11)  # Not written yet
+    with pytest.raises(ValueError):
+        ring.window(4, end=5)   # Already overwritten
+    with pytest.raises(ValueError):
+        ring.window(9)          # Longer than the buffer
+
+def test_is_intact_detects_overwritten_windows():
+    ring = AudioRingBuffer(8)
+    ring.write(np.arange(8))
+    assert ring.is_intact(4, 8)
+    ring.write(np.arange(4))
+    assert ring.is_intact(4, 8)
+    ring.write(np.arange(1))
+    assert not ring.is_intact(4, 8)
+
+def test_oversized_write_keeps_only_the_tail():
+    ring = AudioRingBuffer(4)
+    ring.write(np.arange(10))
+    assert ring.samples_written == 10
+    np.testing.assert_array_equal(ring.window(4), [6, 7, 8, 9])
+
+def test_clear_forgets_samples():
+    ring = AudioRingBuffer(4)
+    ring.write(np.arange(4))
+    ring.clear()
+    assert len(ring) == 0 and ring.samples_written == 0
@@ -0,0 +1,82 @@
+"""Server-side streaming sessions"""
+
+import numpy as np
+import pytest
+from conftest import SAMPLE_RATE, tone
+from stream_sessions import StreamSession
+
+@pytest.fixture(scope='module')
+def api(model_path):
+    from emotion_api import EmotionAPI
+    from vad import VoiceActivityDetector
+
+    api = EmotionAPI()
+    ok, message = api.load_model(model_path)
+    assert ok, message
+    api.vad = VoiceActivityDetector()
+    return api
+
+def push_in_chunks(session, audio, chunk=2048):
+    results = []
+    for i in range(0, len(audio), chunk):
+        results.extend(session.push(audio[i:i + chunk]))
+    return results
+
+def as_int16(audio):
+    return np.round(audio * 32767).astype(np.int16)
+
+@pytest.mark.parametrize("audio", [tone(4.0, 60, 0.01), np.zeros(4 * SAMPLE_RATE, dtype=np.float32)],
+                         ids=['hum', 'silence'])
+def test_int16_chunks_of_non_speech_are_gated(api, audio):
+    session = StreamSession(api)
+    results = push_in_chunks(session, as_int16(audio))
+    assert results
+    assert all(result["speech"] is False and result["emotion"] is None for result in results)
+    assert session.no_speech_hops == len(results)
+
+def test_int16_and_float_chunks_give_the_same_results(api):
+    audio = tone(4.0, 150, 0.4) + tone(4.0, 450, 0.1)
+    from_float = push_in_chunks(StreamSession(api), audio)
+    from_int16 = push_in_chunks(StreamSession(api), as_int16(audio))
+    assert [r["emotion"] for r in from_int16] == [r["emotion"] for r in from_float]
+    assert all(result["speech"] for result in from_int16)
+
+def test_first_result_arrives_once_the_buffer_fills_then_every_hop(api):
+    session = StreamSession(api, buffer_duration=3.0, hop_duration=0.5)
+    audio = tone(5.0, 150, 0.4)
+    results = push_in_chunks(session, audio)
+    times = [result["audio_time"] for result in results]
+    assert times[0] == pytest.approx(3.0, abs=1e-3)
+    hop = session.hop_duration
+    assert times == pytest.approx([3.0 + i * hop for i in range(len(times))], abs=1e-3)
+    assert len(times) == int((5.0 - 3.0) / hop + 1e-9) + 1
+    assert session.summary()["latest"] == results[-1]
+    assert session.summary()["audio_seconds"] == pytest.approx(5.0)
+
+def test_big_catch_up_chunk_only_analyses_recent_hops(api):
+    session = StreamSession(api, max_hops_per_push=2)
+    results = session.push(tone(10.0, 150, 0.4))
+    assert len(results) == 2
+    assert session.skipped_hops > 0
+    assert results[-1]["audio_time"] <= 10.0
+
+def test_manager_evicts_idle_sessions(api, monkeypatch):
+    import stream_sessions
+    from stream_sessions import SessionManager, SessionLimitReached
+
+    clock = [1000.0]
+    monkeypatch.setattr(stream_sessions.time, 'time', lambda: clock[0])
+    manager = SessionManager(api, idle_timeout=60, max_sessions=2, sweep_interval=0)
+    first = manager.create()
+    second = manager.create()
+    with pytest.raises(SessionLimitReached):
+        manager.create()
+
+    clock[0] += 30
+    second.push(np.zeros(1024, dtype=np.float32))  # Keeps the second session active
+    clock[0] += 45
+    assert manager.get(first.id) is None
+    assert manager.get(second.id) is second
+    assert manager.stats()["evicted"] == 1
+    assert manager.close(second.id) is second
+    assert manager.get(second.id) is None
@@ -0,0 +1,77 @@
+"""Per-patient timeline records, rollups and queries"""
+
+import os
+import pytest
+from timeline_store import TimelineStore, check_patient_id
+
+@pytest.fixture
+def store(tmp_path):
+    store = TimelineStore(str(tmp_path / 'timelines'))
+    yield store
+    store.close()
+
+def test_query_for_unknown_patient_is_empty_and_creates_nothing(store):
+    result = store.query('nobody', 0, 3600, 'minute')
+    assert result["summary"]["count"] == 0
+    assert result["buckets"] == []
+    assert os.listdir(store.root) == []
+
+def test_directories_are_created_by_the_first_append(store):
+    store.append('p1', 'happy', 0.8, t=100.0)
+    assert os.listdir(store.root) == ['p1']
+
+def test_invalid_patient_ids_are_rejected(store):
+    for bad in ('../escape', '', '.hidden', 'a/b', 'abc\n', 'abc\r\n'):
+        with pytest.raises(ValueError):
+            check_patient_id(bad)
+        with pytest.raises(ValueError):
+            store.query(bad, 0, 60)
+    assert os.listdir(store.root) == []
+
+def test_rollups_count_labels_and_confidence(store):
+    store.append('p1', 'happy', 0.8, t=60.0)
+    store.append('p1', 'happy', 0.6, t=70.0)
+    store.append('p1', 'sad', 0.4, t=130.0)
+    result = store.query('p1', 0, 180, 'minute')
+    assert [bucket["count"] for bucket in result["buckets"]] == [2, 1]
+    summary = result["summary"]
+    assert summary["count"] == 3
+    assert summary["dominant_emotion"] == 'happy'
+    assert summary["average_confidence"] == pytest.approx(0.6)
+    assert summary["distribution"] == pytest.approx({'happy': 200 / 3, 'sad': 100 / 3})
+
+def test_mean_probabilities_only_average_records_that_have_them(store):
+    store.append('p1', 'happy', 0.9, t=10.0)
+    store.append('p1', 'sad', 0.6, {'happy': 0.3, 'sad': 0.6, 'angry': 0.1}, t=20.0)
+    store.append('p1', 'sad', 0.8, {'happy': 0.1, 'sad': 0.8, 'angry': 0.1}, t=30.0)
+    summary = store.query('p1', 0, 60, 'minute')["summary"]
+    assert summary["count"] == 3
+    assert summary["mean_probabilities"] == pytest.approx({'happy': 0.2, 'sad': 0.7, 'angry': 0.1}, abs=1e-3)
+
+def test_label_only_records_leave_mean_probabilities_empty(store):
+    store.append('p1', 'happy', 0.9, t=10.0)
+    summary = store.query('p1', 0, 60, 'minute')["summary"]
+    assert summary["count"] == 1
+    assert summary["mean_probabilities"] == {}
+
+def test_open_buckets_are_recovered_after_reopening(tmp_path):
+    root = str(tmp_path / 'timelines')
+    store = TimelineStore(root)
+    store.append('p1', 'happy', 0.8, {'happy': 0.8, 'sad': 0.2}, t=3600.0)
+    store.append('p1', 'sad', 0.7, t=3660.0)
+    before = store.query('p1', 0, 7200, 'minute')
+    store.close()
+
+    reopened = TimelineStore(root)
+    assert reopened.query('p1', 0, 7200, 'minute') == before
+    assert reopened.query('p1', 0, 7200, 'hour')["summary"]["count"] == 2
+    reopened.close()
+
+def test_compact_drops_old_minute_rollups_but_keeps_days(store):
+    day = 86400
+    store.append('p1', 'happy', 0.8, t=1 * day)
+    store.append('p1', 'sad', 0.6, t=40 * day)
+    store.append('p1', 'sad', 0.6, t=41 * day)  # Closes the day-40 buckets
+    store.compact(now=41 * day)
+    assert store.query('p1', 0, 2 * day, 'minute')["summary"]["count"] == 0
+    assert store.query('p1', 0, 2 * day, 'day')["summary"]["count"] == 1
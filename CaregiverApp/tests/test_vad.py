@@ -0,0 +1,41 @@
+"""Voice-activity gating decisions"""
+
+import numpy as np
+from conftest import SAMPLE_RATE, tone
+from vad import VoiceActivityDetector
+
+def noise(seconds, level, seed=0):
+    return (level * np.random.default_rng(seed).standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+
+def test_sustained_loud_vowel_counts_as_speech():
+    vowel = tone(3.0, 150, 0.4) + tone(3.0, 450, 0.1)
+    is_speech, info = VoiceActivityDetector().detect(vowel, SAMPLE_RATE)
+    assert is_speech
+    assert info["speech_fraction"] == 1.0
+
+def test_speech_burst_over_quiet_hum_counts_as_speech():
+    audio = tone(3.0, 60, 0.01)
+    audio[SAMPLE_RATE:SAMPLE_RATE + SAMPLE_RATE // 2] += tone(0.5, 200, 0.1)
+    assert VoiceActivityDetector().detect(audio, SAMPLE_RATE)[0]
+
+def test_silence_is_gated():
+    is_speech, info = VoiceActivityDetector().detect(noise(3.0, 0.0005), SAMPLE_RATE)
+    assert not is_speech
+    assert info["speech_fraction"] == 0.0
+
+def test_steady_quiet_hum_is_gated():
+    assert not VoiceActivityDetector().detect(tone(3.0, 60, 0.01), SAMPLE_RATE)[0]
+
+def test_broadband_hiss_is_gated_even_when_loud():
+    assert not VoiceActivityDetector().detect(noise(3.0, 0.05), SAMPLE_RATE)[0]
+
+def test_int16_input_is_scaled_like_float():
+    vowel = tone(3.0, 150, 0.4)
+    pcm = (vowel * 32767).astype(np.int16)
+    vad = VoiceActivityDetector()
+    assert vad.detect(pcm, SAMPLE_RATE)[1]["level_db"] == vad.detect(vowel, SAMPLE_RATE)[1]["level_db"]
+
+def test_clip_shorter_than_a_frame_is_gated_and_counted():
+    vad = VoiceActivityDetector()
+    assert not vad.detect(np.zeros(10, dtype=np.float32), SAMPLE_RATE)[0]
+    assert vad.stats()["checked"] == 1 and vad.stats()["gated"] == 1
@@ -0,0 +1,34 @@
+"""Inference worker pool startup"""
+
+import pytest
+from worker_pool import InferenceWorkerPool
+
+def test_start_reports_ready_workers(model_path):
+    pool = InferenceWorkerPool(model_path, workers=1, warm_up=False)
+    try:
+        assert pool.start() == (True, "1 workers ready")
+    finally:
+        pool.shutdown()
+
+def test_start_waits_for_every_worker_process(model_path):
+    pool = InferenceWorkerPool(model_path, workers=2, warm_up=False)
+    try:
+        assert pool.start() == (True, "2 workers ready")
+        assert len(pool.ready_pids) == 2
+        assert pool.ready_pids == set(pool._executor._processes)
+    finally:
+        pool.shutdown()
+
+def test_failed_model_load_is_reported_and_shuts_the_pool_down(tmp_path):
+    pool = InferenceWorkerPool(str(tmp_path / 'missing.joblib'), workers=1, warm_up=False)
+    ok, message = pool.start()
+    assert not ok and "failed to load" in message
+    with pytest.raises(RuntimeError):
+        pool._executor.submit(print)
+
+def test_start_timeout_is_reported_instead_of_raised(model_path):
+    pool = InferenceWorkerPool(model_path, workers=1, warm_up=False)
+    ok, message = pool.start(timeout=0.001)
+    assert not ok and "not ready" in message
+    with pytest.raises(RuntimeError):
+        pool._executor.submit(print)
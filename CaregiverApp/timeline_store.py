@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Persistent per-patient emotion timeline
+Append-only columnar prediction records with minute, hour and day rollups for trend queries
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from datetime import datetime, timezone
+import numpy as np
+
+# Probability vectors have one slot per label id
+MAX_LABELS = 16
+
+# One prediction: 46 bytes
+RECORD_DTYPE = np.dtype([
+    ('t', '<f8'),                             # Unix time of the analysed window's end
+    ('label', 'u1'),                          # Index into the patient's labels.json
+    ('confidence', '<f4'),
+    ('has_probabilities', 'u1'),              # 0 when the source only reported a label and confidence
+    ('probabilities', '<f2', (MAX_LABELS,))   # By label id; zeros without probabilities
+])
+
+# One bucket of predictions at some resolution
+ROLLUP_DTYPE = np.dtype([
+    ('t', '<f8'),                             # Bucket start
+    ('count', '<u4'),
+    ('confidence_sum', '<f8'),
+    ('label_counts', '<u4', (MAX_LABELS,)),
+    ('probability_count', '<u4'),             # Predictions that carried probabilities
+    ('probability_sums', '<f4', (MAX_LABELS,))
+])
+
+RESOLUTIONS = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+_PATIENT_ID = re.compile(r'[A-Za-z0-9_-][A-Za-z0-9_.-]{0,63}')
+
+def check_patient_id(patient_id):
+    """Raise ValueError unless patient_id is usable as a timeline directory name"""
+    if not _PATIENT_ID.fullmatch(str(patient_id)):
+        raise ValueError(f"Invalid patient id: {patient_id!r}")
+
+def _day(t):
+    return datetime.fromtimestamp(t, timezone.utc).strftime('%Y-%m-%d')
+
+def _trim_partial(path, itemsize):
+    """Cut off a row left half-written by a crash so later appends stay aligned"""
+    if os.path.exists(path):
+        size = os.path.getsize(path)
+        if size % itemsize:
+            os.truncate(path, size - size % itemsize)
+
+class PatientTimeline:
+    """
+    One patient's records and rollups under root/<patient_id>/
+
+    raw/<YYYY-MM-DD>.bin  appended RECORD_DTYPE rows, one file per UTC day
+    minute.bin, hour.bin, day.bin  ROLLUP_DTYPE rows in time order
+
+    A bucket is written to its rollup file once a later record starts the
+    next bucket; until then it lives in memory and is included in queries.
+    On open, records newer than the last written bucket are replayed from
+    the raw files so nothing is lost if the process stopped mid-bucket.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.join(path, 'raw'), exist_ok=True)
+        self._labels_path = os.path.join(path, 'labels.json')
+        self.labels = []
+        if os.path.exists(self._labels_path):
+            with open(self._labels_path) as f:
+                self.labels = json.load(f)
+        self._label_ids = {label: i for i, label in enumerate(self.labels)}
+        self._raw_file = None
+        self._raw_day = None
+        self._open = {}  # resolution -> ROLLUP_DTYPE row being filled
+        self.lock = threading.Lock()
+        self._recover()
+
+    def _rollup_path(self, resolution):
+        return os.path.join(self.path, f'{resolution}.bin')
+
+    def _raw_path(self, day):
+        return os.path.join(self.path, 'raw', f'{day}.bin')
+
+    def _last_bucket(self, resolution):
+        """Start of the last written bucket, or None"""
+        path = self._rollup_path(resolution)
+        _trim_partial(path, ROLLUP_DTYPE.itemsize)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size < ROLLUP_DTYPE.itemsize:
+            return None
+        with open(path, 'rb') as f:
+            f.seek((size // ROLLUP_DTYPE.itemsize - 1) * ROLLUP_DTYPE.itemsize)
+            return float(np.frombuffer(f.read(ROLLUP_DTYPE.itemsize), dtype=ROLLUP_DTYPE)['t'][0])
+
+    def _recover(self):
+        """Rebuild the open buckets from raw records after the last written ones"""
+        resume = {}
+        for resolution, seconds in RESOLUTIONS.items():
+            last = self._last_bucket(resolution)
+            resume[resolution] = 0.0 if last is None else last + seconds
+        since = min(resume.values())
+        raw_dir = os.path.join(self.path, 'raw')
+        for name in sorted(os.listdir(raw_dir)):
+            if not name.endswith('.bin') or name[:-4] < _day(since):
+                continue
+            _trim_partial(os.path.join(raw_dir, name), RECORD_DTYPE.itemsize)
+            records = np.fromfile(os.path.join(raw_dir, name), dtype=RECORD_DTYPE)
+            for record in records[records['t'] >= since]:
+                for resolution in RESOLUTIONS:
+                    if record['t'] >= resume[resolution]:
+                        self._add_to_bucket(resolution, record)
+
+    def label_id(self, label):
+        """Stable small integer for a label, registered on first use"""
+        label = str(label)
+        label_id = self._label_ids.get(label)
+        if label_id is None:
+            if len(self.labels) >= MAX_LABELS:
+                raise ValueError(f"More than {MAX_LABELS} emotion labels for one patient")
+            label_id = len(self.labels)
+            self.labels.append(label)
+            self._label_ids[label] = label_id
+            with open(self._labels_path + '.tmp', 'w') as f:
+                json.dump(self.labels, f)
+            os.replace(self._labels_path + '.tmp', self._labels_path)
+        return label_id
+
+    def _add_to_bucket(self, resolution, record):
+        seconds = RESOLUTIONS[resolution]
+        start = float(record['t']) // seconds * seconds
+        bucket = self._open.get(resolution)
+        if bucket is not None and start > bucket['t']:
+            # A later bucket has begun; the open one is complete
+            with open(self._rollup_path(resolution), 'ab') as f:
+                f.write(bucket.tobytes())
+            bucket = None
+        if bucket is None:
+            bucket = np.zeros((), dtype=ROLLUP_DTYPE)
+            bucket['t'] = start
+            self._open[resolution] = bucket
+        # Records older than the open bucket (clock changes) are counted in it
+        bucket['count'] += 1
+        bucket['confidence_sum'] += record['confidence']
+        bucket['label_counts'][record['label']] += 1
+        if record['has_probabilities']:
+            bucket['probability_count'] += 1
+            bucket['probability_sums'] += record['probabilities']
+
+    def append(self, t, emotion, confidence, probabilities=None):
+        """Record one prediction; probabilities maps label -> probability
+
+        Predictions without probabilities count towards labels and confidence
+        but are left out of mean_probabilities.
+        """
+        with self.lock:
+            record = np.zeros((), dtype=RECORD_DTYPE)
+            record['t'] = t
+            record['label'] = self.label_id(emotion)
+            record['confidence'] = confidence
+            if probabilities:
+                record['has_probabilities'] = 1
+                for label, probability in probabilities.items():
+                    record['probabilities'][self.label_id(label)] = probability
+
+            day = _day(t)
+            if day != self._raw_day:
+                if self._raw_file is not None:
+                    self._raw_file.close()
+                _trim_partial(self._raw_path(day), RECORD_DTYPE.itemsize)
+                self._raw_file = open(self._raw_path(day), 'ab')
+                self._raw_day = day
+            self._raw_file.write(record.tobytes())
+            self._raw_file.flush()
+
+            for resolution in RESOLUTIONS:
+                self._add_to_bucket(resolution, record)
+
+    def buckets(self, resolution, start, end):
+        """Rollup rows with start <= t < end, including the open bucket"""
+        with self.lock:
+            path = self._rollup_path(resolution)
+            if os.path.exists(path) and os.path.getsize(path) >= ROLLUP_DTYPE.itemsize:
+                rows = np.memmap(path, dtype=ROLLUP_DTYPE, mode='r')
+                lo, hi = np.searchsorted(rows['t'], [start, end])
+                rows = np.array(rows[lo:hi])
+            else:
+                rows = np.zeros(0, dtype=ROLLUP_DTYPE)
+            bucket = self._open.get(resolution)
+            if bucket is not None and start <= bucket['t'] < end:
+                rows = np.concatenate([rows, bucket.reshape(1)])
+            return rows
+
+    def compact(self, cutoffs):
+        """Drop raw day files and rollup rows older than their cutoff times
+
+        cutoffs maps 'raw' or a resolution to a Unix time (None keeps all).
+        Returns the number of raw files and rollup rows removed.
+        """
+        removed = 0
+        with self.lock:
+            if cutoffs.get('raw') is not None:
+                oldest_day = _day(cutoffs['raw'])
+                raw_dir = os.path.join(self.path, 'raw')
+                for name in os.listdir(raw_dir):
+                    if name.endswith('.bin') and name[:-4] < oldest_day and name[:-4] != self._raw_day:
+                        os.remove(os.path.join(raw_dir, name))
+                        removed += 1
+            for resolution in RESOLUTIONS:
+                cutoff = cutoffs.get(resolution)
+                path = self._rollup_path(resolution)
+                if cutoff is None or not os.path.exists(path):
+                    continue
+                rows = np.fromfile(path, dtype=ROLLUP_DTYPE)
+                keep = rows[rows['t'] >= cutoff]
+                if len(keep) < len(rows):
+                    keep.tofile(path + '.tmp')
+                    os.replace(path + '.tmp', path)
+                    removed += len(rows) - len(keep)
+        return removed
+
+    def close(self):
+        with self.lock:
+            if self._raw_file is not None:
+                self._raw_file.close()
+                self._raw_file = None
+                self._raw_day = None
+
+class TimelineStore:
+    """
+    Emotion timelines for many patients under one directory
+
+    Each prediction is stored once as a compact record and folded into
+    minute, hour and day rollups as it arrives, so range queries read a
+    handful of pre-aggregated buckets instead of raw predictions. compact()
+    enforces retention: raw records for raw_retention_days, minute and hour
+    rollups for their retention periods, day rollups forever.
+
+    Rollup rows are only appended, never rewritten in place, so a resolution
+    must not be compacted to less than one of its own buckets.
+    """
+
+    def __init__(self, root, raw_retention_days=7, minute_retention_days=30, hour_retention_days=400):
+        self.root = root
+        self.retention = {
+            'raw': max(2, raw_retention_days),  # Recovery replays up to a day of raw records
+            'minute': minute_retention_days,
+            'hour': hour_retention_days,
+            'day': None
+        }
+        self._patients = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def patient(self, patient_id, create=True):
+        """The PatientTimeline for an id, opened on first use
+
+        With create=False a patient with nothing on disk yet gives None instead
+        of a new directory, so reads can't create timelines.
+        """
+        check_patient_id(patient_id)
+        with self._lock:
+            timeline = self._patients.get(patient_id)
+            if timeline is None:
+                path = os.path.join(self.root, patient_id)
+                if not create and not os.path.isdir(path):
+                    return None
+                timeline = self._patients[patient_id] = PatientTimeline(path)
+            return timeline
+
+    def append(self, patient_id, emotion, confidence, probabilities=None, t=None):
+        """Record one prediction for a patient (t defaults to now)"""
+        self.patient(patient_id).append(time.time() if t is None else t, emotion, confidence, probabilities)
+
+    def pick_resolution(self, start, end, now=None):
+        """Finest resolution that keeps a query to a few hundred buckets and is still retained"""
+        now = time.time() if now is None else now
+        span = end - start
+        for resolution, limit in (('minute', 6 * 3600), ('hour', 31 * 86400)):
+            retained = self.retention[resolution]
+            if span <= limit and (retained is None or start >= now - retained * 86400):
+                return resolution
+        return 'day'
+
+    def query(self, patient_id, start, end, resolution=None):
+        """Aggregate a patient's predictions over [start, end) from the rollups
+
+        Buckets are aligned to UTC minutes, hours or days, so the range is
+        widened to whole buckets. Returns a JSON-friendly dict.
+        """
+        if resolution is None:
+            resolution = self.pick_resolution(start, end)
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution {resolution!r}; use one of {', '.join(RESOLUTIONS)}")
+        seconds = RESOLUTIONS[resolution]
+        start = start // seconds * seconds
+
+        timeline = self.patient(patient_id, create=False)
+        if timeline is None:
+            rows, labels = np.zeros(0, dtype=ROLLUP_DTYPE), []
+        else:
+            rows = timeline.buckets(resolution, start, end)
+            labels = timeline.labels
+
+        def describe(count, confidence_sum, label_counts, probability_count, probability_sums):
+            if not count:
+                return {"count": 0, "dominant_emotion": "unknown", "average_confidence": 0.0,
+                        "distribution": {}, "mean_probabilities": {}}
+            # Averaged over the predictions that carried probabilities only
+            mean_probabilities = {labels[i]: float(p) / probability_count
+                                  for i, p in enumerate(probability_sums[:len(labels)])} if probability_count else {}
+            return {
+                "count": int(count),
+                "dominant_emotion": labels[int(np.argmax(label_counts))],
+                "average_confidence": float(confidence_sum / count),
+                "distribution": {labels[i]: 100.0 * float(n) / count
+                                 for i, n in enumerate(label_counts[:len(labels)]) if n},
+                "mean_probabilities": mean_probabilities
+            }
+
+        buckets = [dict(describe(row['count'], row['confidence_sum'], row['label_counts'],
+                                 row['probability_count'], row['probability_sums']), start=float(row['t']))
+                   for row in rows]
+        summary = describe(int(rows['count'].sum()), float(rows['confidence_sum'].sum()),
+                           rows['label_counts'].sum(axis=0), int(rows['probability_count'].sum()),
+                           rows['probability_sums'].sum(axis=0))
+        return {
+            "patient_id": patient_id,
+            "resolution": resolution,
+            "start": float(start),
+            "end": float(end),
+            "summary": summary,
+            "buckets": buckets
+        }
+
+    def compact(self, now=None):
+        """Apply retention to every patient on disk; returns what was removed"""
+        now = time.time() if now is None else now
+        cutoffs = {key: None if days is None else now - days * 86400 for key, days in self.retention.items()}
+        removed = {}
+        for patient_id in sorted(os.listdir(self.root)):
+            if os.path.isdir(os.path.join(self.root, patient_id)) and _PATIENT_ID.fullmatch(patient_id):
+                removed[patient_id] = self.patient(patient_id).compact(cutoffs)
+        return removed
+
+    def start_compaction(self, interval=3600):
+        """Run compact() every interval seconds on a daemon thread"""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.compact()
+                except Exception as e:
+                    print(f"⚠️  Timeline compaction failed: {e}")
+
+        thread = threading.Thread(target=loop, name="timeline-compaction")
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def stats(self):
+        with self._lock:
+            return {
+                "root": self.root,
+                "open_patients": len(self._patients),
+                "retention_days": dict(self.retention)
+            }
+
+    def close(self):
+        with self._lock:
+            for timeline in self._patients.values():
+                timeline.close()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Multi-process inference worker pool for the Emotion Detection API
+Fans feature extraction and prediction out to worker processes
+"""
+
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+# Per-process EmotionAPI, created once by the pool initializer
+_worker_api = None
+_worker_status = (False, "Worker not initialized")
+
+class PoolSaturated(Exception):
+    """Raised when every worker is busy and the wait queue is full"""
+
+def _init_worker(model_path, warm_up=True, mmap_mode='r', fast_path=True):
+    """Load the model once in each worker process, then warm up its pipeline"""
+    global _worker_api, _worker_status
+    # Imported here so the Flask module isn't imported twice in the parent
+    from emotion_api import EmotionAPI
+    _worker_api = EmotionAPI()
+    _worker_api.mmap_mode = mmap_mode
+    _worker_api.fast_path = fast_path
+    _worker_status = _worker_api.load_model(model_path)
+    if _worker_status[0] and warm_up:
+        ok, message, _ = _worker_api.warm_up()
+        if not ok:
+            _worker_status = (False, message)
+
+def _ping(hold=0.0):
+    """Report whether this worker loaded its model
+
+    Holding the worker briefly keeps one fast process from answering every
+    ping while the others are still loading.
+    """
+    time.sleep(hold)
+    return os.getpid(), _worker_status
+
+def _analyze(audio_data, sample_rate):
+    """Extract features and predict one clip in a worker"""
+    if not _worker_status[0]:
+        return {"error": _worker_status[1], "success": False}
+    return _worker_api.analyze(audio_data, sample_rate)
+
+def _analyze_batch(clips):
+    """Extract features and predict several clips in a worker"""
+    if not _worker_status[0]:
+        return [{"error": _worker_status[1], "success": False} for _ in clips]
+    return _worker_api.analyze_batch(clips)
+
+class InferenceWorkerPool:
+    """
+    Process pool where each worker holds its own EmotionAPI and model
+
+    At most workers + max_queue requests are admitted at once; anything beyond
+    that is rejected immediately with PoolSaturated so the server can answer
+    503 instead of letting requests pile up. Workers memory-map the model file
+    (mmap_mode='r'), so its arrays are shared through the page cache.
+    """
+
+    def __init__(self, model_path, workers=None, max_queue=None, retry_after=1, warm_up=True,
+                 mmap_mode='r', fast_path=True):
+        self.model_path = model_path
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = self.workers * 2 if max_queue is None else max_queue
+        self.retry_after = retry_after
+        self.warm_up = warm_up
+        self.mmap_mode = mmap_mode
+        self.fast_path = fast_path
+
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.ready_pids = set()  # Workers that answered start()
+
+        # spawn rather than fork: the parent runs Flask's request threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_path, warm_up, mmap_mode, fast_path)
+        )
+
+    def _submit(self, fn, *args):
+        """Submit a task if there is room, else raise PoolSaturated"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PoolSaturated(f"All {self.workers} workers busy and {self.max_queue} requests queued")
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def analyze(self, audio_data, sample_rate):
+        """Queue one clip; returns a future resolving to a result dict"""
+        return self._submit(_analyze, audio_data, sample_rate)
+
+    def analyze_batch(self, clips):
+        """Queue a list of (audio, sample_rate) clips as one task"""
+        return self._submit(_analyze_batch, clips)
+
+    def start(self, timeout=120):
+        """Start every worker and wait until each has loaded (and warmed up) the model
+
+        Returns (success, message) like EmotionAPI.load_model; on failure the
+        pool has already been shut down.
+        """
+        # Pings may land on any idle process, so keep pinging until every pid has answered
+        deadline = time.monotonic() + timeout
+        statuses = {}
+        try:
+            while len(statuses) < self.workers:
+                futures = [self._executor.submit(_ping, 0.05) for _ in range(self.workers)]
+                for future in futures:
+                    pid, status = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                    statuses[pid] = status
+                if any(not ok for ok, _ in statuses.values()):
+                    break
+                if len(statuses) < self.workers and time.monotonic() >= deadline:
+                    raise FutureTimeout()
+        except BrokenProcessPool as e:
+            self.shutdown()
+            return False, f"Worker process died while starting: {e}"
+        except FutureTimeout:
+            self.shutdown()
+            return False, f"Workers not ready after {timeout:g}s"
+        failed = [message for ok, message in statuses.values() if not ok]
+        if failed:
+            self.shutdown()
+            return False, f"Worker failed to load model: {failed[0]}"
+        self.ready_pids = set(statuses)
+        return True, f"{self.workers} workers ready"
+
+    def stats(self):
+        """Snapshot of pool occupancy and counters"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queued": max(0, self.in_flight - self.workers),
+                "completed": self.completed,
+                "rejected": self.rejected
+            }
+
+    def shutdown(self, wait=False):
+        """Stop the workers; with wait=True queued and running requests finish first"""
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)